@@ -0,0 +1,5 @@
+#!/usr/bin/env python3
+"""
+Package containing benchmark scripts, run from the repository root with
+`python3 -m benchmarks.<script name>`.
+"""
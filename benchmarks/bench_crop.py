@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmarks cropping pages to their text regions before OCR, per page:
+    * pixel reduction: share of page pixels outside text regions
+    * time saved: OCR time of the whole page minus OCR time of its regions
+      (including finding them)
+    * mean OCR confidence of both
+
+Usage: python3 -m benchmarks.bench_crop [IMAGE_OR_PDF_FILE]...
+    Uses test_files/images/* and test_files/pdfs/* if no file is given.
+"""
+import sys
+from glob import glob
+from time import perf_counter
+from functions.ocr_pages import recognize_page
+from functions.process_image import process_image_simple, text_regions
+from functions.render_pdf import iter_pdf_pages
+from functions.tesseract_config import config_tesseract
+from functions.tesseract_engine import get_engine
+
+
+def load_pages(files):
+    """Preprocesses pages of image and pdf files, so only OCR is timed."""
+    pages = []
+    for file_path in files:
+        if file_path.endswith('.pdf'):
+            pages += [('{} page {}'.format(file_path, page_no), process_image_simple(page))
+                      for page_no, page in enumerate(iter_pdf_pages(file_path), 1)]
+        else:
+            pages.append((file_path, process_image_simple(file_path)))
+    return (pages)
+
+
+def mean_confidence(conf):
+    """Returns mean confidence of a page ('-' if it has no words)."""
+    return (conf['mean'] if conf else '-')
+
+
+def main(files):
+    """OCRs each page whole and cropped to its text regions, and prints
+    pixel reduction and time saved per page and in total."""
+    args = {'cache': False, 'display_confidence': True}
+    options = config_tesseract(**args)
+    get_engine(options, **args)     # engine start up is not timed
+    pages = load_pages(files)
+    print('{} pages from {} files'.format(len(pages), len(files)))
+
+    total_full = total_cropped = 0
+    for label, page in pages:
+        start = perf_counter()
+        full_text, full_conf = recognize_page(page, options, crop=False, **args)
+        full_time = perf_counter() - start
+
+        start = perf_counter()
+        cropped_text, cropped_conf = recognize_page(page, options, crop=True, **args)
+        cropped_time = perf_counter() - start
+        total_full += full_time
+        total_cropped += cropped_time
+
+        regions = text_regions(page) or [(0, 0, page.shape[1], page.shape[0])]
+        pixels = sum((right - left) * (bottom - top) for left, top, right, bottom in regions)
+        print('{}: {} region(s), {:.0%} fewer pixels, {:.0f} ms -> {:.0f} ms ({:.0f} ms saved), '
+              'confidence {}% -> {}%'
+              .format(label, len(regions), 1 - pixels / page.size, full_time * 1000, cropped_time * 1000,
+                      (full_time - cropped_time) * 1000, mean_confidence(full_conf), mean_confidence(cropped_conf)))
+
+    if pages:
+        print('total: {:.0f} ms -> {:.0f} ms, {:.0f} ms saved per page'
+              .format(total_full * 1000, total_cropped * 1000, (total_full - total_cropped) * 1000 / len(pages)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob('test_files/images/*') + glob('test_files/pdfs/*.pdf')))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmarks OCR engines per page:
+    * subprocess: a `tesseract` process (and temporary image file) per page
+    * tesserocr: a persistent tesseract API handle fed in-memory pages
+
+Usage: python3 -m benchmarks.bench_engines [IMAGE_OR_PDF_FILE]...
+    Uses test_files/images/* and test_files/pdfs/* if no file is given.
+"""
+import sys
+from glob import glob
+from time import perf_counter
+from functions.process_image import process_image_simple
+from functions.render_pdf import iter_pdf_pages
+from functions.tesseract_config import config_tesseract
+from functions.tesseract_engine import ENGINES, tesseract_params, tesserocr
+
+
+def load_pages(files):
+    """Preprocesses pages of image and pdf files, so only OCR is timed."""
+    pages = []
+    for file_path in files:
+        if file_path.endswith('.pdf'):
+            pages += [process_image_simple(page) for page in iter_pdf_pages(file_path)]
+        else:
+            pages.append(process_image_simple(file_path))
+    return (pages)
+
+
+def main(files):
+    """OCRs all pages with each available engine and prints engine start up
+    time and average time per page."""
+    options = config_tesseract()
+    params = tesseract_params()
+    pages = load_pages(files)
+    print('{} pages from {} files'.format(len(pages), len(files)))
+
+    names = ['subprocess', 'tesserocr'] if tesserocr else ['subprocess']
+    if not tesserocr:
+        print("tesserocr is not installed, skipping 'tesserocr' engine")
+
+    for name in names:
+        start = perf_counter()
+        engine = ENGINES[name](options, **params)
+        init_time = (perf_counter() - start) * 1000
+
+        times = []
+        for page in pages:
+            start = perf_counter()
+            engine.image_to_string(page)
+            times.append((perf_counter() - start) * 1000)
+
+        print("{}: start up {:.1f} ms, {:.1f} ms/page"
+              .format(name, init_time, sum(times) / len(times)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob('test_files/images/*') + glob('test_files/pdfs/*.pdf')))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the handover of rendered pdf pages to preprocessing:
+    * jpeg: render RGB page, encode to JPEG in a BytesIO and decode it with
+      cv2.imdecode (the previous path of `ocr_pdf`)
+    * array: render grayscale page and pass it as a NumPy array (current path)
+
+Usage: python3 -m benchmarks.bench_pdf_decode [PDF_FILE]...
+    Uses test_files/pdfs/*.pdf if no PDF_FILE is given.
+"""
+import cv2
+import numpy as np
+import sys
+from glob import glob
+from io import BytesIO
+from pdf2image import convert_from_path
+from time import perf_counter
+from functions.process_image import process_image_simple
+from functions.render_pdf import pdf_page_count
+
+
+def jpeg_path(pdf_file_path, page_no):
+    """Renders a page and hands it over through a JPEG round trip."""
+    page = convert_from_path(pdf_file_path, first_page=page_no, last_page=page_no)[0]
+    with BytesIO() as img_stream:
+        page.save(img_stream, format="jpeg")
+        img_stream.seek(0)
+        image = cv2.imdecode(np.frombuffer(img_stream.read(), np.uint8), 1)
+    return (process_image_simple(image))
+
+
+def array_path(pdf_file_path, page_no):
+    """Renders a grayscale page and hands it over as a NumPy array."""
+    page = convert_from_path(pdf_file_path, first_page=page_no,
+                             last_page=page_no, grayscale=True)[0]
+    return (process_image_simple(np.asarray(page)))
+
+
+def time_page(func, pdf_file_path, page_no):
+    """Returns run time of `func` for a single page in milliseconds."""
+    start = perf_counter()
+    func(pdf_file_path, page_no)
+    return ((perf_counter() - start) * 1000)
+
+
+def main(pdf_files):
+    """Runs both handover paths on every page of `pdf_files` and prints
+    per pdf and overall average time per page."""
+    totals = {'jpeg': [], 'array': []}
+    for pdf_file_path in pdf_files:
+        page_count = pdf_page_count(pdf_file_path)
+        times = {'jpeg': [], 'array': []}
+        for page_no in range(1, page_count + 1):
+            times['jpeg'].append(time_page(jpeg_path, pdf_file_path, page_no))
+            times['array'].append(time_page(array_path, pdf_file_path, page_no))
+
+        jpeg_avg = sum(times['jpeg']) / page_count
+        array_avg = sum(times['array']) / page_count
+        print("{}: {} pages, jpeg {:.1f} ms/page, array {:.1f} ms/page, saved {:.1f} ms/page"
+              .format(pdf_file_path, page_count, jpeg_avg, array_avg, jpeg_avg - array_avg))
+        totals['jpeg'] += times['jpeg']
+        totals['array'] += times['array']
+
+    pages = len(totals['jpeg'])
+    if pages:
+        jpeg_avg = sum(totals['jpeg']) / pages
+        array_avg = sum(totals['array']) / pages
+        print("total: {} pages, saved {:.1f} ms/page ({:.1f}%)"
+              .format(pages, jpeg_avg - array_avg, 100 * (jpeg_avg - array_avg) / jpeg_avg))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob('test_files/pdfs/*.pdf')))
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite over test_files. For each input type (image, pdf), training
+data model (training_data/fast, best, legacy), output mode (txt, docx, pdf)
+and, for pdfs, rendering DPI (fixed or 'auto') measures:
+    * pages/sec of the whole path (render, preprocess, OCR and write)
+    * per page latency percentiles
+    * mean OCR confidence (as a proxy of accuracy, as test_files have no
+      ground truth text) and, for pdfs, rendered megapixels per page
+    * peak RSS of the OCR process (tesseract itself is included only with
+      the tesserocr engine, as the subprocess engine runs it in child
+      processes)
+
+Each case runs in a fresh process, so peak RSS is of that case only, with
+the OCR results cache off and engine start up excluded from timing. Pages
+are OCR'ed as by the ocr command without confidence (`image_to_string`),
+and confidence is measured by a separate, untimed OCR call per page, so
+throughput does not depend on it. Pages that fail to render are left out
+of all measurements, and counted as failed. Models without training data
+for the language (default tir, which all models have) are skipped.
+
+Results are written to a json file. If a baseline file exists, throughput
+of each case is compared to it and the suite fails if any case is slower
+than the baseline by more than the threshold. Throughput depends on the
+machine, so no baseline is committed: write one with --save-baseline on
+the machine the suite is run on. Without one the regression check is
+skipped.
+
+Usage: python3 -m benchmarks.bench_suite [--inputs image pdf]
+            [--models fast best legacy] [--modes txt docx pdf]
+            [--dpis DPI|auto ...] [--lang LANG] [--repeat N]
+            [--output FILE] [--baseline FILE] [--threshold FRACTION]
+            [--save-baseline]
+
+Exit status is 0 if no case regressed, 1 if any case regressed or failed
+and 2 on usage errors or an unreadable baseline. Skipped cases (and a
+missing baseline) do not fail the suite.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from glob import glob
+from time import perf_counter
+
+# input files of each input type
+INPUTS = {
+    'image': 'test_files/images/*',
+    'pdf': 'test_files/pdfs/*.pdf',
+}
+
+# training data folder and OCR engine mode of each model
+# (legacy models are for the legacy engine, --oem 0)
+MODELS = {
+    'fast': {'training_folder': 'training_data/fast/', 'oem': 1},
+    'best': {'training_folder': 'training_data/best/', 'oem': 1},
+    'legacy': {'training_folder': 'training_data/legacy/', 'oem': 0},
+}
+
+OUTPUT_MODES = ['txt', 'docx', 'pdf']
+
+# pdf rendering DPIs compared by default
+DPIS = ['200', 'auto']
+
+# per page latency percentiles to report
+PERCENTILES = (50, 90, 99)
+
+# language of test_files, for which all models have training data
+DEFAULT_LANG = 'tir'
+
+DEFAULT_OUTPUT = 'bench_results.json'
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+DEFAULT_THRESHOLD = 0.10
+
+
+def case_key(input_type, model, output_mode, dpi=None):
+    """Returns the key of a case in results."""
+    key = '{}/{}/{}'.format(input_type, model, output_mode)
+    return (key + '/{}'.format(dpi) if dpi else key)
+
+
+def missing_languages(model, lang):
+    """Returns languages of `lang` ('+' separated) without training data
+    in the folder of a model."""
+    folder = MODELS[model]['training_folder']
+    return ([language for language in lang.split('+')
+             if not os.path.isfile(os.path.join(folder, language + '.traineddata'))])
+
+
+def percentile(values, p):
+    """Returns the p-th percentile (nearest rank) of sorted values."""
+    return (values[min(len(values) - 1, int(len(values) * p / 100))])
+
+
+def peak_rss_mb():
+    """Returns peak resident set size of current process in MB."""
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1))
+
+
+def run_case(input_type, model, output_mode, repeat, **args):
+    """Runs a benchmark case. Called in a fresh worker process.
+
+    Args:
+        input_type (str): 'image' or 'pdf'.
+        model (str): key of MODELS.
+        output_mode (str): 'txt', 'docx' or 'pdf'.
+        repeat (int): no. of times to OCR all input files.
+        **args (dict): ocr params (lang, dpi ...) passed to all OCR functions.
+
+    Returns:
+        dict: measurements of the case.
+    """
+    from functions.journal import PageError
+    from functions.ocr_pages import ocr_page
+    from functions.output_to_docx import write_to_docx
+    from functions.output_to_pdf import write_to_pdf
+    from functions.output_to_txt import write_to_txt
+    from functions.render_pdf import iter_pdf_pages, pdf_page_count
+    from functions.tesseract_config import config_tesseract
+    from functions.tesseract_engine import engine_name, get_engine
+
+    args = dict(args, cache=False, jobs=1, display_confidence=False, **MODELS[model])
+    options = config_tesseract(**args)
+    writer = {'txt': write_to_txt, 'docx': write_to_docx, 'pdf': write_to_pdf}[output_mode]
+    files = sorted(glob(INPUTS[input_type]))
+
+    # engine start up is not part of per page latency
+    start = perf_counter()
+    get_engine(options, **args)
+    startup = perf_counter() - start
+
+    latencies = []
+    confidences = []
+    pixels = []         # pixels of rendered pdf pages
+    failed = 0          # no. of pages that failed to render
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_file_path = os.path.join(temp_dir, 'output.' + output_mode)
+        for _ in range(repeat):
+            for file_path in files:
+                if input_type == 'pdf':
+                    page_count = pdf_page_count(file_path)
+                    pages = iter_pdf_pages(file_path, page_count, **args)
+                else:
+                    page_count = 1
+                    pages = iter([file_path])
+
+                # one output file per input file, saved after its last page
+                output_document = None
+                for page_index in range(page_count):
+                    save = page_index == page_count - 1
+                    page_start = perf_counter()
+                    page = next(pages)
+                    if isinstance(page, PageError):
+                        # written empty (as by ocr command), but not measured
+                        failed += 1
+                        output_document = writer('', output_file_path, output_document, save=save)
+                        continue
+                    text, _ = ocr_page(page, options, **args)
+                    output_document = writer(text, output_file_path, output_document, save=save)
+                    latencies.append(perf_counter() - page_start)
+
+                    # (pages without words have no confidence)
+                    _, conf = ocr_page(page, options, **dict(args, display_confidence=True))
+                    if conf:
+                        confidences.append(conf['mean'])
+                    if input_type == 'pdf':
+                        pixels.append(page.size)
+    # time of measured pages only (no confidence calls and failed pages)
+    seconds = sum(latencies)
+
+    latencies.sort()
+    return ({
+        'engine': engine_name(**args),
+        'pages': len(latencies),
+        'failed_pages': failed,
+        'seconds': round(seconds, 3),
+        'pages_per_sec': round(len(latencies) / seconds, 3) if seconds else None,
+        'startup_ms': round(startup * 1000, 1),
+        'latency_ms': dict({'mean': round(sum(latencies) / len(latencies) * 1000, 1)},
+                           **{'p{}'.format(p): round(percentile(latencies, p) * 1000, 1)
+                              for p in PERCENTILES}) if latencies else {},
+        'confidence': round(sum(confidences) / len(confidences), 2) if confidences else None,
+        'megapixels': round(sum(pixels) / len(pixels) / 1e6, 2) if pixels else None,
+        'peak_rss_mb': peak_rss_mb(),
+        })
+
+
+def environment():
+    """Returns details of the machine and software the suite runs on."""
+    try:
+        import pytesseract
+        tesseract_version = str(pytesseract.get_tesseract_version())
+    except Exception:
+        tesseract_version = None
+    return ({
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'tesseract': tesseract_version,
+        })
+
+
+def compare(results, baseline, threshold):
+    """Compares throughput of each case to the baseline.
+
+    Args:
+        results (dict): cases of current run ({key: measurements}).
+        baseline (dict): cases of baseline run.
+        threshold (float): allowed fraction of throughput loss.
+
+    Returns:
+        list: keys of cases slower than baseline by more than threshold.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key, {}).get('pages_per_sec')
+        current = result.get('pages_per_sec')
+        if not base or current is None:
+            continue
+        change = current / base - 1
+        regressed = change < -threshold
+        print('{:<24} {:>8.3f} pages/s  baseline {:>8.3f}  {:+.1%}{}'
+              .format(key, current, base, change, '  REGRESSION' if regressed else ''))
+        if regressed:
+            regressions.append(key)
+    return (regressions)
+
+
+def display_result(key, result):
+    """Prints measurements of a case."""
+    if 'error' in result:
+        print('{:<24} error: {}'.format(key, result['error']))
+        return
+    if 'skipped' in result:
+        print('{:<24} skipped: {}'.format(key, result['skipped']))
+        return
+    latency = ', '.join('{} {} ms'.format(name, ms) for name, ms in result['latency_ms'].items())
+    pixels = ', {} MP/page'.format(result['megapixels']) if result.get('megapixels') else ''
+    failed = ' ({} failed)'.format(result['failed_pages']) if result.get('failed_pages') else ''
+    print('{:<24} {} pages{}, {} pages/s, latency {}, confidence {}%{}, peak RSS {} MB'
+          .format(key, result['pages'], failed, result['pages_per_sec'], latency,
+                  result['confidence'], pixels, result['peak_rss_mb']))
+
+
+def main(argv):
+    """Runs all selected cases, writes results and checks for regressions.
+
+    Returns:
+        int: exit status code.
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.bench_suite',
+                                     description='Benchmark OCR over test_files.')
+    parser.add_argument('--inputs', nargs='+', choices=list(INPUTS), default=list(INPUTS))
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--modes', nargs='+', choices=OUTPUT_MODES, default=OUTPUT_MODES)
+    parser.add_argument('--dpis', nargs='+', default=DPIS,
+                        help="pdf rendering DPIs, numbers or 'auto' (default {})".format(' '.join(DPIS)))
+    parser.add_argument('--lang', default=DEFAULT_LANG,
+                        help='tesseract language (default {})'.format(DEFAULT_LANG))
+    parser.add_argument('--repeat', type=int, default=1, help='no. of runs over input files (default 1)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help='results file (default {})'.format(DEFAULT_OUTPUT))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='baseline results file (default {})'.format(DEFAULT_BASELINE))
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed fraction of throughput loss (default {})'.format(DEFAULT_THRESHOLD))
+    parser.add_argument('--save-baseline', action='store_true', help='write results to baseline file too')
+    try:
+        bench_args = parser.parse_args(argv)
+    except SystemExit:
+        return (2)
+
+    dpis = [dpi if dpi == 'auto' else int(dpi) for dpi in bench_args.dpis if dpi == 'auto' or dpi.isdigit()]
+    if len(dpis) != len(bench_args.dpis):
+        print("DPIs must be numbers or 'auto': {}".format(' '.join(bench_args.dpis)))
+        return (2)
+
+    args = {'lang': bench_args.lang}
+    cases = {}
+    for input_type in bench_args.inputs:
+        for model in bench_args.models:
+            missing = missing_languages(model, bench_args.lang)
+            for output_mode in bench_args.modes:
+                # rendering DPI only applies to pdfs
+                for dpi in (dpis if input_type == 'pdf' else [None]):
+                    key = case_key(input_type, model, output_mode, dpi)
+                    if missing:
+                        cases[key] = {'skipped': 'no {} training data in {}'.format(
+                            ', '.join(missing), MODELS[model]['training_folder'])}
+                        display_result(key, cases[key])
+                        continue
+                    # a fresh process for each case, so peak RSS is of this case only
+                    with ProcessPoolExecutor(max_workers=1,
+                                             mp_context=multiprocessing.get_context('spawn')) as executor:
+                        try:
+                            cases[key] = executor.submit(run_case, input_type, model, output_mode,
+                                                         max(1, bench_args.repeat), dpi=dpi, **args).result()
+                        except Exception as e:
+                            cases[key] = {'error': '{}: {}'.format(type(e).__name__, e)}
+                    display_result(key, cases[key])
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'repeat': bench_args.repeat, 'lang': bench_args.lang, 'dpis': dpis},
+        'cases': cases,
+        }
+    with open(bench_args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print("Results written to '{}'".format(bench_args.output))
+
+    failed = [key for key, result in cases.items() if 'error' in result]
+
+    regressions = []
+    unreadable = False
+    if not os.path.exists(bench_args.baseline):
+        print("Skipping regression check: no baseline at '{}' (write one with --save-baseline)"
+              .format(bench_args.baseline))
+    else:
+        try:
+            with open(bench_args.baseline, 'r', encoding='utf-8') as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as e:
+            print("Could not read baseline '{}': {}".format(bench_args.baseline, e))
+            unreadable = True
+        else:
+            regressions = compare(cases, baseline.get('cases', {}), bench_args.threshold)
+
+    if bench_args.save_baseline:
+        with open(bench_args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print("Baseline written to '{}'".format(bench_args.baseline))
+
+    if regressions:
+        print('Throughput regressed by more than {:.0%}: {}'
+              .format(bench_args.threshold, ', '.join(regressions)))
+    if failed:
+        print('Failed cases: {}'.format(', '.join(failed)))
+    skipped = [key for key, result in cases.items() if 'skipped' in result]
+    if skipped:
+        print('Skipped cases: {}'.format(', '.join(skipped)))
+    if unreadable and not bench_args.save_baseline:
+        return (2)
+    return (1 if regressions or failed else 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
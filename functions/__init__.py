@@ -6,10 +6,18 @@ Attributes:
     defaults_dict (dict): dictionary of default input and output parameters
     tesseract_dict (dict): dictionary of default tesseract options and parameters
     output_dict (dict): dictionary of default params for writing to output files
+
+The dictionaries hold built-in defaults, updated at start up from the
+config file (see `config` module).
 """
-# TODO save defaults in text file(json form) for persistence
+import os
+
 # TODO store last 20 commands
 
+# per user cache directory (XDG base directory spec), so runs do not write
+# caches into the current directory
+CACHE_HOME = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'ethiopic-ocr')
+
 defaults_dict = {
     'input_dir_def_img': 'test_files/images/',      # default directory for image input files
     'input_dir_def_pdf': 'test_files/pdfs/',        # default directory for pdf input files
@@ -17,6 +25,18 @@ defaults_dict = {
     'output_modes': ['print', 'txt', 'docx', 'pdf'],    # available output types(modes)
     'output_mode_def': 'print',                     # default output type(mode)
     'image_extensions': ['png', 'jpeg', 'jpg'],         # valid image input files extension
+    'pdf_chunk_size_def': 10,                       # no. of pdf pages rendered at a time
+    'dpi_def': 200,                                 # pdf rendering DPI, or 'auto' to choose per page
+    'preprocess_def': 'simple',                     # preprocessing preset or stages
+    'cache_def': True,                              # use OCR results cache by default
+    'cache_dir_def': os.path.join(CACHE_HOME, 'ocr_cache', ''),   # directory of OCR results cache
+    'cache_size_def': 500,                          # OCR results cache size limit (in MB)
+    'pipeline_def': False,                          # use staged page pipeline by default
+    'crop_def': False,                              # OCR only text regions of pages by default
+    'page_store_def': False,                        # use rendered pdf page store by default
+    'page_store_dir_def': os.path.join(CACHE_HOME, 'page_store', ''),  # directory of rendered pdf page store
+    'page_store_size_def': 2000,                    # rendered pdf page store size limit (in MB)
+    'pipeline_depth_def': 4,                        # max. no. of pages waiting between pipeline stages
 }
 """defaults_dict (dict): dictionary of default input and output parameters"""
 
@@ -26,6 +46,9 @@ tesseract_dict = {
     'lang_def': 'amh',      # default language for OCR
     'psm_def' : 3,          # default page segmentation mode in tesseract
     'oem_def' : 1,          # default OCR engine mode for tesseract
+    'jobs_def' : 1,         # default no. of pages OCR'ed in parallel (worker processes)
+    'engine_def' : 'auto',  # default OCR engine ('auto', 'tesserocr' or 'subprocess')
+    'osd_dir_def' : None,   # directory of osd.traineddata (for 'orient' stage). None means tesseract's default dir
 }
 """tesseract_dict (dict): dictionary of default tesseract options and parameters"""
 
@@ -34,6 +57,12 @@ write_dict = {
     'font_path_def': 'fonts/AbyssinicaSIL-Regular.ttf', # default font path (for writing to pdf)
     'font_name_def': 'Abyssinica SIL',                  # default font name (for writing to pdf & MS word)
     'width_def' : 0,            # default line width (for writing to pdf). 0 means use all available width
-    'height_def' : 5             # default line height (for writing to pdf)
+    'height_def' : 5,            # default line height (for writing to pdf)
+    'txt_buffer_size_def' : 1024 * 1024,    # bytes of text buffered before writing (for writing to txt)
+    'segment_pages_def' : 0,    # pages per segment spilled to disk for joined docx. 0 means keep all in memory
 }
 """write_dict (dict): dictionary of default ouput file writing options and parameters"""
+
+# update defaults from config file (once, at start up)
+from .config import load_config     # noqa: E402 (needs the dictionaries above)
+load_config()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Module containing the non-interactive batch mode, which runs OCR jobs
+read from a manifest file (or standard input) in a single process.
+"""
+import argparse
+import json
+import sys
+from .ocr_image import ocr_image
+from .ocr_pdf import ocr_pdf
+from .parse_input_cmd import add_input_type_prefix, parse_ocr_cmd
+from .validate_input_cmd import validate_parsed_ocr_cmd
+from .watch_dir import watch_directory
+
+# exit status codes of batch mode
+EXIT_SUCCESS = 0        # all jobs succeeded
+EXIT_JOB_FAILED = 1     # at least one job failed
+EXIT_USAGE_ERROR = 2    # invalid arguments or unreadable manifest
+
+
+def parse_job(line):
+    """Reads an ocr command from a manifest line.
+
+    A manifest line is a json string containing an ocr command, as typed in
+    the interactive mode (e.g. "pdf a.pdf -o a.txt"), or a json object with
+    the command in its `command` key.
+
+    Args:
+        line (str): a line of the manifest.
+
+    Returns:
+        str: the ocr command, or None if line is not a valid job.
+    """
+    try:
+        job = json.loads(line)
+    except ValueError as e:
+        print('*** Manifest Error: invalid json:', e)
+        return (None)
+
+    command = job.get('command') if isinstance(job, dict) else job
+    if not isinstance(command, str) or not command.strip():
+        print('*** Manifest Error: job must be a command string or an object with a `command` string')
+        return (None)
+    return (command)
+
+
+def run_job(command):
+    """Parses, validates and runs an ocr command.
+
+    Args:
+        command (str): an ocr command (`image ...` or `pdf ...`, the prefix
+            can be omitted if the input file extension is given).
+
+    Returns:
+        bool: True if the job succeeded, else False.
+    """
+    line = add_input_type_prefix(command)
+    args = parse_ocr_cmd(line)
+    if not args:
+        return (False)
+
+    validated_args = validate_parsed_ocr_cmd(line, **args)
+    if not validated_args:
+        return (False)
+
+    ocr = ocr_image if validated_args.get('input_file_type') == 'image' else ocr_pdf
+    ocr = watch_directory if validated_args.get('watch') else ocr
+    try:
+        failed_pages = ocr(**validated_args)
+    except Exception as e:
+        print('*** Job Error: {}: {}'.format(type(e).__name__, e))
+        return (False)
+    # a job with pages left out of its output failed (they can be retried with --resume)
+    if failed_pages:
+        print('*** Job Error: {} page(s) failed and were left out'.format(failed_pages))
+        return (False)
+    return (True)
+
+
+def run_batch(argv):
+    """Runs all jobs in a manifest and returns an exit status code.
+
+    Args:
+        argv (list): command line arguments after `batch`.
+
+    Returns:
+        int: EXIT_SUCCESS if all jobs succeeded, EXIT_JOB_FAILED if any job
+            failed, or EXIT_USAGE_ERROR if arguments or manifest are invalid.
+    """
+    parser = argparse.ArgumentParser(
+        prog='ocr.py batch',
+        description='Run OCR jobs from a json lines manifest without the interactive prompt.')
+    parser.add_argument('manifest', nargs='?', default='-',
+                        help="manifest file with a job per line, '-' (default) for standard input")
+    parser.add_argument('--fail-fast', action='store_true', help='stop at first failed job')
+    try:
+        batch_args = parser.parse_args(argv)
+    except SystemExit:
+        return (EXIT_USAGE_ERROR)
+
+    try:
+        manifest = sys.stdin if batch_args.manifest == '-' else open(batch_args.manifest, 'r', encoding='utf-8')
+    except OSError as e:
+        print('*** Manifest Error: could not read manifest:', e)
+        return (EXIT_USAGE_ERROR)
+
+    succeeded = failed = 0
+    with manifest:
+        for line_no, line in enumerate(manifest, 1):
+            # skip empty and comment lines
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+
+            command = parse_job(line)
+            print('=== Job on line {}: {}'.format(line_no, command if command else line.strip()))
+            if command and run_job(command):
+                succeeded += 1
+            else:
+                failed += 1
+                print('*** Job on line {} failed'.format(line_no))
+                if batch_args.fail_fast:
+                    break
+
+    print('Batch finished: {} succeeded, {} failed'.format(succeeded, failed))
+    return (EXIT_JOB_FAILED if failed else EXIT_SUCCESS)
@@ -2,33 +2,73 @@
 """
 Module for functions related to tesseract OCR confidence.
 """
-import pytesseract as pts
-from pprint import pprint
-from statistics import mean, stdev
+import numpy as np
+from .profiler import timer
 
-def ocr_confidence(processed_image, options, **args):
+# words with confidence below mean - LOW_CONFIDENCE_K * stdev are low confidence words
+LOW_CONFIDENCE_K = 2
+
+# percentiles of word confidence levels to report
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def ocr_confidence(ocr_dict, **args):
     """Extracts OCR confidence summary from tesseract's dict return.
 
     Args:
-        processed_image (image): an image object preprocessed using OpenCV2.
-        options (dict): a dictionary to be used for tesseract config
+        ocr_dict (dict): output of tesseract's `image_to_data` as a dict
+            (only `text` and `conf` lists are used).
         **args (dict): a dictionary of params from user input for ocr command
 
     Returns:
-        int: average confidence level of OCR for all words in image.
+        dict: confidence summary of OCR for all words in image, with keys:
+            `mean`, `stdev`, `percentiles` ({percentile: confidence}),
+            `words` (no. of words), `threshold` (mean - k*stdev) and
+            `low_conf_words` (list of (word, confidence) below threshold).
+            None if no word was recognized (e.g. a blank or picture page),
+            so the page is left out of average confidence of files and jobs.
     """
-    # TODO extract text, replacing empty words with newline
-    ocr_dict = pts.image_to_data(processed_image, config=options, output_type=pts.Output.DICT)
+    with timer('confidence'):
+        # arrays of words (including empty strings) and confidence levels
+        text_array = np.asarray(ocr_dict['text'], dtype=str)
+        conf_array = np.asarray(ocr_dict['conf'], dtype=float)
+
+        # mask of non empty words (blocks, paragraphs and lines have empty text)
+        valid = (text_array != '') & (conf_array >= 0)
+        valid_conf = conf_array[valid]
+
+        if not valid_conf.size:
+            return (None)
 
-    # list of confidence level and words (including empty strings)
-    conf_list = ocr_dict['conf']
-    text_list = ocr_dict['text']
+        avg = valid_conf.mean()
+        std = valid_conf.std(ddof=1) if valid_conf.size > 1 else 0.0
+        percentiles = np.percentile(valid_conf, PERCENTILES)
 
-    # extract confidence list for non empty word strings
-    valid_index = [i for i, word in enumerate(text_list) if word]
-    valid_conf_list = [conf for i, conf in enumerate(conf_list)
-                       if i in valid_index]
+        # words with confidence far below average
+        threshold = avg - LOW_CONFIDENCE_K * std
+        low = valid_conf < threshold
+        low_conf_words = list(zip(text_array[valid][low].tolist(), valid_conf[low].tolist()))
 
-    # TODO if verbose: calc stdev and display words with conf < mean - k*stdev (k=1 or 2)
+        return ({
+            'mean': round(float(avg), 2),
+            'stdev': round(float(std), 2),
+            'percentiles': {p: round(float(c), 2) for p, c in zip(PERCENTILES, percentiles)},
+            'words': int(valid_conf.size),
+            'threshold': round(float(threshold), 2),
+            'low_conf_words': low_conf_words,
+            })
 
-    return(round(mean(valid_conf_list), 2))
+
+def display_confidence_summary(conf, label):
+    """Prints a detailed confidence summary of a page, for verbose output.
+
+    Args:
+        conf (dict): confidence summary returned by `ocr_confidence`.
+        label (str): name of page or image file the summary is for.
+    """
+    percentiles = ', '.join('p{} {}%'.format(p, c) for p, c in conf['percentiles'].items())
+    print('Confidence of {}: {} words, mean {}%, stdev {}, {}'
+          .format(label, conf['words'], conf['mean'], conf['stdev'], percentiles))
+    if conf['low_conf_words']:
+        words = ', '.join('{} ({}%)'.format(word, round(c, 2)) for word, c in conf['low_conf_words'])
+        print('  low confidence words (below {}%): {}'.format(conf['threshold'], words))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Module containing the persistent configuration of the app.
+
+Default parameters (`defaults_dict`, `tesseract_dict` and `write_dict`)
+start from the built-in defaults in `functions/__init__.py`, and are
+updated once at start up from the config file (`ocr_config.json`, or the
+file in `OCR_CONFIG` environment variable). Each value in the file is
+checked against `CONFIG_SCHEMA`, and invalid ones are reported and left
+at their built-in default. Defaults changed with the `default` command are
+saved to the config file, so they persist between runs.
+
+For each job, validated command params are merged over the defaults into
+an immutable `JobConfig`, which is passed on (to worker processes too) as
+the job's params, so the job does not depend on defaults changed while it
+runs.
+"""
+import json
+import os
+from collections.abc import Mapping
+from copy import deepcopy
+from . import defaults_dict, tesseract_dict, write_dict
+
+# path of config file
+CONFIG_PATH = os.environ.get('OCR_CONFIG', 'ocr_config.json')
+
+# default dicts by section name in config file
+SECTIONS = {
+    'defaults_dict': defaults_dict,
+    'tesseract_dict': tesseract_dict,
+    'write_dict': write_dict,
+}
+
+# built-in defaults, taken before the config file is loaded (to reset defaults)
+BUILT_IN = deepcopy(SECTIONS)
+
+
+def is_number(value):
+    """Checks if a value is an int (and not a bool)."""
+    return (isinstance(value, int) and not isinstance(value, bool))
+
+
+def at_least(minimum):
+    """Returns a (check, description) schema entry of numbers >= minimum."""
+    return ((lambda value: is_number(value) and value >= minimum, 'a number of at least {}'.format(minimum)))
+
+
+def one_of(*values):
+    """Returns a (check, description) schema entry of a set of values."""
+    return ((lambda value: value in values, 'one of {}'.format(', '.join(map(repr, values)))))
+
+
+STRING = (lambda value: isinstance(value, str) and value != '', 'a string')
+BOOL = (lambda value: isinstance(value, bool), 'true or false')
+DPI = (lambda value: value == 'auto' or (is_number(value) and 50 <= value <= 1200),
+       "'auto' or a number from 50 to 1200")
+
+CONFIG_SCHEMA = {
+    'defaults_dict': {
+        'input_dir_def_img': (STRING, None),
+        'input_dir_def_pdf': (STRING, None),
+        'output_dir_def': (STRING, None),
+        'output_mode_def': (one_of('print', 'txt', 'docx', 'pdf'), 'output_mode'),
+        'pdf_chunk_size_def': (at_least(1), 'pdf_chunk_size'),
+        'dpi_def': (DPI, 'dpi'),
+        'preprocess_def': (STRING, 'preprocess'),
+        'cache_def': (BOOL, 'cache'),
+        'cache_dir_def': (STRING, None),
+        'cache_size_def': (at_least(1), None),
+        'pipeline_def': (BOOL, 'pipeline'),
+        'crop_def': (BOOL, 'crop'),
+        'page_store_def': (BOOL, 'page_store'),
+        'page_store_dir_def': (STRING, None),
+        'page_store_size_def': (at_least(1), None),
+        'pipeline_depth_def': (at_least(1), 'pipeline_depth'),
+    },
+    'tesseract_dict': {
+        'training_dir_def': (STRING, 'training_folder'),
+        'lang_def': (one_of('amh', 'eng', 'tir'), 'lang'),
+        'psm_def': (one_of(*range(14)), 'psm'),
+        'oem_def': (one_of(*range(4)), 'oem'),
+        'jobs_def': (at_least(1), 'jobs'),
+        'engine_def': (one_of('auto', 'tesserocr', 'subprocess'), 'engine'),
+        'osd_dir_def': (STRING, None),
+    },
+    'write_dict': {
+        'font_path_def': (STRING, 'font_path'),
+        'font_name_def': (STRING, 'font_name'),
+        'width_def': (at_least(0), 'width'),
+        'height_def': (at_least(1), 'height'),
+        'txt_buffer_size_def': (at_least(0), None),
+        'segment_pages_def': (at_least(0), 'segment_pages'),
+    },
+}
+"""dict: {section: {param: ((check, description), job param)}} of params
+that can be set in config file. `job param` is the name of the param in a
+job's params that overrides the default (None if it has none)."""
+
+
+def check_config(config):
+    """Checks params of a config against `CONFIG_SCHEMA`.
+
+    Args:
+        config (dict): {section: {param: value}} as read from config file.
+
+    Returns:
+        dict: {section: {param: value}} of valid params. Invalid ones are
+            reported and left out.
+    """
+    valid = {}
+    if not isinstance(config, dict):
+        print("*** Config Error: '{}' must contain a json object".format(CONFIG_PATH))
+        return (valid)
+    for section, params in config.items():
+        schema = CONFIG_SCHEMA.get(section)
+        if schema is None or not isinstance(params, dict):
+            print("*** Config Error: unknown section '{}' in '{}' ignored".format(section, CONFIG_PATH))
+            continue
+        for param, value in params.items():
+            if param not in schema:
+                print("*** Config Error: unknown param '{}' in '{}' ignored".format(param, CONFIG_PATH))
+                continue
+            (check, description), _ = schema[param]
+            if not check(value):
+                print("*** Config Error: '{}' in '{}' must be {}, using default: {}"
+                      .format(param, CONFIG_PATH, description, json.dumps(value)))
+                continue
+            valid.setdefault(section, {})[param] = value
+    return (valid)
+
+
+def load_config():
+    """Loads the config file (once, at start up) and updates default dicts
+    with its valid params. Built-in defaults are used if there is none."""
+    try:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print("*** Config Error: could not read config file '{}', using built-in defaults: {}"
+              .format(CONFIG_PATH, e))
+        return
+    for section, params in check_config(config).items():
+        SECTIONS[section].update(params)
+
+
+def save_config():
+    """Saves defaults that differ from built-in defaults to the config file
+    (atomically, so a killed run never leaves a partial file). The file is
+    removed if all defaults are built-in ones."""
+    config = {}
+    for section, schema in CONFIG_SCHEMA.items():
+        changed = {param: SECTIONS[section][param] for param in schema
+                   if SECTIONS[section].get(param) != BUILT_IN[section].get(param)}
+        if changed:
+            config[section] = changed
+
+    try:
+        if not config:
+            if os.path.exists(CONFIG_PATH):
+                os.remove(CONFIG_PATH)
+            return
+        temp_path = '{}.{}.tmp'.format(CONFIG_PATH, os.getpid())
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(config, file, indent=4, ensure_ascii=False)
+            file.write('\n')
+        os.replace(temp_path, CONFIG_PATH)
+    except OSError as e:
+        print("*** Config Error: could not save defaults to '{}': {}".format(CONFIG_PATH, e))
+
+
+def reset_config():
+    """Resets default dicts to built-in defaults."""
+    for section, params in BUILT_IN.items():
+        SECTIONS[section].clear()
+        SECTIONS[section].update(deepcopy(params))
+
+
+class JobConfig(Mapping):
+    """
+    Immutable params of a job: validated command params merged over
+    defaults. Used as (and passed on like) the job's `**args` dictionary.
+    """
+
+    def __init__(self, params):
+        """
+        Args:
+            params (dict): params of the job.
+        """
+        self._params = dict(params)
+
+    def __getitem__(self, param):
+        return (self._params[param])
+
+    def __iter__(self):
+        return (iter(self._params))
+
+    def __len__(self):
+        return (len(self._params))
+
+    def __repr__(self):
+        return ('JobConfig({!r})'.format(self._params))
+
+
+def job_config(**args):
+    """Merges params of a job over current defaults.
+
+    Args:
+        **args (dict): validated params of a job. Params that are None are
+            taken from defaults.
+
+    Returns:
+        JobConfig: the job's params.
+    """
+    params = {}
+    for section, schema in CONFIG_SCHEMA.items():
+        for param, (_, job_param) in schema.items():
+            if job_param:
+                params[job_param] = SECTIONS[section].get(param)
+    params.update({param: value for param, value in args.items() if value is not None})
+    return (JobConfig(params))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Module containing a job journal, which records the pages of an output file
+as they are completed, so a run that dies part way can be resumed.
+
+The journal is an append-only json lines file beside the output file
+(`<output file>.journal.jsonl`). Its first line names the input files of
+the job, and each later line a page: its input file and page no., and
+either its OCR'ed text, confidence summary and output segment, or the
+error it failed with. Lines are flushed and synced to disk as they are
+written, so a run killed at any point (out of memory, a crashing poppler)
+keeps all pages completed so far.
+
+A run with `--resume` takes completed pages from the journal instead of
+OCR'ing them again, and tries failed (quarantined) pages again. The
+journal is removed once its output file is saved with no failed pages.
+"""
+import json
+import os
+
+# no. of times a page that failed is tried again before it is quarantined
+PAGE_RETRIES = 1
+
+
+class PageError(Exception):
+    """
+    Error of a page that could not be rendered or OCR'ed. Passed on in
+    place of the page (or its result), so other pages of the job go on.
+    """
+
+
+def retried(function, *fargs, **kwargs):
+    """Calls a function for a page, trying again up to `PAGE_RETRIES` times
+    if it fails.
+
+    Returns:
+        the function's return value, or a PageError if all tries failed.
+    """
+    for attempt in range(PAGE_RETRIES + 1):
+        try:
+            return (function(*fargs, **kwargs))
+        except Exception as e:
+            error = e
+    return (PageError('{}: {}'.format(type(error).__name__, error)))
+
+
+class JobJournal:
+    """
+    Journal of the pages of an output file.
+    """
+
+    def __init__(self, output_file_path, inputs, resume=False):
+        """Starts a journal, or loads the journal of a previous run of the
+        same job if resuming.
+
+        Args:
+            output_file_path (str): path (including file name) of output file.
+            inputs (list): input file paths of the job, used to check that
+                a resumed journal belongs to the same job.
+            resume (bool): if True, continue from journal of a previous run.
+        """
+        self.journal_path = output_file_path + '.journal.jsonl'
+        self.pages = {}     # {input file: {page no.: record}} of completed pages
+        self.failed = set()     # (input file, page no.) of pages failed in this run
+
+        if not (resume and self.load(inputs)):
+            with open(self.journal_path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'inputs': inputs}, ensure_ascii=False) + '\n')
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def load(self, inputs):
+        """Loads completed pages from journal of a previous run of the same job.
+
+        Returns:
+            bool: True if loaded, False if missing or from a different job.
+        """
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as file:
+                lines = file.readlines()
+        except OSError:
+            return (False)
+
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get('inputs') != inputs:
+            print("*** Resume Error: '{}' is from a different job, starting over".format(self.journal_path))
+            return (False)
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue    # last line of a killed run may be partial
+            pages = self.pages.setdefault(record.get('input'), {})
+            # a later record of a page (a retry) replaces earlier ones
+            if 'error' in record:
+                pages.pop(record.get('page'), None)
+            else:
+                pages[record.get('page')] = record
+        return (True)
+
+    def completed(self, input_file):
+        """Returns results of completed pages of an input file.
+
+        Returns:
+            dict: {page no.: (text, confidence summary)} of completed pages.
+        """
+        return ({page_no: (record.get('text'), record.get('conf'))
+                 for page_no, record in self.pages.get(input_file, {}).items()})
+
+    def append(self, record):
+        """Appends a record and syncs it to disk."""
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record_page(self, input_file, page_no, text, conf=None, segment=None):
+        """Records a completed page.
+
+        Args:
+            input_file (str): path of the input file of the page.
+            page_no (int): no. of the page in the input file (1 for images).
+            text (str): OCR'ed text of the page.
+            conf (dict): confidence summary of the page, or None.
+            segment (int): index of the output segment the page is written
+                to, or None if output is not written in segments.
+        """
+        record = {'input': input_file, 'page': page_no, 'text': text, 'conf': conf, 'segment': segment}
+        self.pages.setdefault(input_file, {})[page_no] = record
+        self.append(record)
+
+    def record_failure(self, input_file, page_no, error):
+        """Records a page that failed, quarantining it until a resumed run."""
+        self.failed.add((input_file, page_no))
+        self.append({'input': input_file, 'page': page_no, 'error': str(error)})
+
+    def close(self):
+        """Closes the journal once its output file is saved. It is removed,
+        unless pages failed, so they can be tried again with `--resume`."""
+        self.file.close()
+        if self.failed:
+            print("{} page(s) failed and were left out. Run again with --resume to retry them "
+                  "(journal '{}')".format(len(self.failed), self.journal_path))
+        else:
+            os.remove(self.journal_path)
+
+
+def open_journal(output_file_path, inputs, **args):
+    """Opens the journal of an output file.
+
+    Args:
+        output_file_path (str): path of output file, or None if output is
+            printed (and so is not journaled).
+        inputs (list): input file paths of the job.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        JobJournal: the journal, or None if output is printed.
+    """
+    if not output_file_path:
+        return (None)
+    journal = JobJournal(output_file_path, inputs, resume=args.get('resume'))
+    completed = sum(map(len, journal.pages.values()))
+    if completed:
+        print('Resuming after {} already completed pages'.format(completed))
+    return (journal)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Module containing an on-disk cache of OCR results.
+
+Results are keyed by a hash of the preprocessed page pixels, the tesseract
+config string, the OCR engine and the version (size and modification time)
+of the training data files used. Each result is stored as a json file containing the OCR'ed
+text and, if available, the words and their confidence levels. When the
+cache grows past its size limit, least recently used results are removed.
+"""
+import json
+import os
+from hashlib import blake2b
+from . import defaults_dict
+from .tesseract_config import tesseract_params
+from .tesseract_engine import engine_name
+
+# bytes written to cache by current process since last size check
+_written = 0
+
+
+def cache_enabled(**args):
+    """Checks if OCR results cache is to be used.
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        bool: value of `cache` arg if passed (--cache/--no-cache), else default.
+    """
+    cache = args.get('cache')
+    return (cache if cache is not None else defaults_dict.get('cache_def'))
+
+
+def training_data_version(**args):
+    """Returns a string identifying the version of training data files
+    used for OCR, from their size and modification time."""
+    params = tesseract_params(**args)
+    version = []
+    for lang in str(params.get('lang')).split('+'):
+        file_path = os.path.join(params.get('training_folder'), lang + '.traineddata')
+        try:
+            stat = os.stat(file_path)
+            version.append('{}:{}:{}'.format(lang, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            version.append(lang)
+    return (','.join(version))
+
+
+def page_key(processed_image, options, **args):
+    """Creates a cache key for a preprocessed page.
+
+    Args:
+        processed_image (ndarray): the preprocessed page passed to tesseract.
+        options (str): tesseract config string.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        str: hex digest identifying page pixels and tesseract configuration
+            (tesserocr and subprocess engines' output can differ).
+    """
+    key = blake2b(digest_size=20)
+    key.update(str((processed_image.shape, processed_image.dtype.str)).encode())
+    key.update(processed_image.tobytes())
+    key.update(options.encode())
+    key.update(engine_name(**args).encode())
+    key.update(training_data_version(**args).encode())
+    return (key.hexdigest())
+
+
+def cache_path(key):
+    """Returns path of the cache file for a key."""
+    return (os.path.join(defaults_dict.get('cache_dir_def'), key[:2], key + '.json'))
+
+
+def cache_get(key, need_data=False):
+    """Reads a cached OCR result and marks it as recently used.
+
+    Args:
+        key (str): cache key from `page_key`.
+        need_data (bool): if True, only a result with word confidence
+            levels is returned.
+
+    Returns:
+        dict: cached result with `text` and `data` (a dict with `text` and
+            `conf` lists of words, or None), or None if not cached.
+    """
+    file_path = cache_path(key)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            result = json.load(file)
+        os.utime(file_path)     # update access time for LRU eviction
+    except (OSError, ValueError):
+        return (None)
+
+    if need_data and not result.get('data'):
+        return (None)
+    return (result)
+
+
+def cache_put(key, text, ocr_dict=None):
+    """Stores an OCR result in the cache, then evicts least recently used
+    results if the cache size limit is passed.
+
+    Args:
+        key (str): cache key from `page_key`.
+        text (str): OCR'ed text of the page.
+        ocr_dict (dict): tesseract's `image_to_data` output, from which
+            words and their confidence levels are stored.
+    """
+    global _written
+
+    data = None
+    if ocr_dict:
+        data = {'text': ocr_dict['text'], 'conf': ocr_dict['conf']}
+
+    file_path = cache_path(key)
+    temp_path = '{}.{}.tmp'.format(file_path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'text': text, 'data': data}, file, ensure_ascii=False)
+        # rename is atomic, so readers never see a partially written result
+        os.replace(temp_path, file_path)
+        _written += os.path.getsize(file_path)
+    except OSError as e:
+        print('*** Cache Error: could not save OCR result:', e)
+        return
+
+    # check cache size after every 5% of size limit written
+    size_limit = defaults_dict.get('cache_size_def') * 1024 * 1024
+    if _written > size_limit // 20:
+        _written = 0
+        evict_cache(size_limit)
+
+
+def evict_cache(size_limit):
+    """Removes least recently used results until cache size is below 90%
+    of `size_limit`.
+
+    Results (and sub directories) removed meanwhile by other processes
+    evicting at the same time are skipped.
+
+    Args:
+        size_limit (int): cache size limit in bytes.
+    """
+    entries = []    # (last used time, size, path) of each cached result
+    total_size = 0
+    cache_dir = defaults_dict.get('cache_dir_def')
+    try:
+        sub_dirs = [sub_dir.path for sub_dir in os.scandir(cache_dir) if sub_dir.is_dir()]
+    except OSError:
+        return
+    for sub_dir in sub_dirs:
+        try:
+            with os.scandir(sub_dir) as sub_dir_entries:
+                for entry in sub_dir_entries:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+        except OSError:
+            continue
+
+    if total_size <= size_limit:
+        return
+
+    entries.sort()
+    for _, size, file_path in entries:
+        if total_size <= size_limit * 0.9:
+            break
+        try:
+            os.remove(file_path)
+            total_size -= size
+        except OSError:
+            pass
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
-import pytesseract as pts
 from os import path
 from statistics import mean
-from .confidence import ocr_confidence
-from .output_to_docx import write_to_docx
+from . import defaults_dict, write_dict
+from .confidence import display_confidence_summary
+from .journal import open_journal
+from .ocr_pages import ocr_executor, ocr_pages, release_executor, with_known_inputs
+from .output_segments import SegmentWriter
+from .output_to_docx import segmented_docx, write_to_docx
 from .output_to_pdf import write_to_pdf
 from .output_to_txt import write_to_txt
-from .process_image import process_image_simple, process_image_detailed
+from .pipeline import PagePipeline
+from .profiler import finish_profile, set_page, start_profile, stop_profile
+from .scan_dir import DirectoryScan
 from .tesseract_config import config_tesseract
 
 
@@ -21,10 +26,16 @@ def ocr_image(**args):
     Args:
         **args (dict): a keyword dictionary generated from parsed and
             validated user command line input.
+
+    Returns:
+        int: no. of images that failed and were left out of the output.
     """
-    input_images = args.get('input_files')
+    input_images = args.get('input_files')    # list, or a DirectoryScan of input directory
     input_directory = args.get('input_directory')
 
+    # images scanned in input directory are found lazily, as they are OCR'ed
+    scanned = isinstance(input_images, DirectoryScan)
+
     input_path_prefix = input_directory if input_directory else ''
     input_path_prefix += '/' if (input_path_prefix and input_path_prefix[-1] != '/')  else ''
 
@@ -38,9 +49,10 @@ def ocr_image(**args):
     join = args.get('join')
 
     # set output file from input images if join and output file not passed
+    # (from input directory name if images are scanned)
     if (join and not output_file and output_mode != 'print'):
         output_file = ''
-        for img in input_images:
+        for img in ([path.normpath(input_directory)] if scanned else input_images):
             img_end = path.splitext(img)[0]  # before extension
             img_end = path.split(img_end)[1]     # after last '/'
             output_file += img_end + '-'
@@ -49,101 +61,179 @@ def ocr_image(**args):
     # set output file path if output file
     output_file_path = output_path_prefix + output_file if output_file else None
 
-    output_document = None  # a docx Documnet object, or a pdf Object from FPDF, or a buffer
+    output_document = None  # a docx Documnet object, or a pdf Object from FPDF, or a TxtWriter
 
-    # sets environ variables and returns tesseract config string
+    # returns tesseract config string (including training data folder of the job)
     # TODO add parameters to args or create new dict
     options = config_tesseract(**args)
 
     display_confidence = args.get('display_confidence')   # display OCR confidence summary if True
+    verbose = args.get('verbose')   # display detailed confidence summary of each image if True
 
     confidence_dict = {}    # to store average confidenece for each image ({image_name: avg_conf})
-    for i, image in enumerate(input_images):
-        
-        # if not join create new output_doc for each image, else use one output_doc for all
-        # TODO check system strain when join is True
-        if not join:
-            output_document = None
-
-        image_file_path = input_path_prefix + image
-
-        # display image processing start
-        print("Processing image file no. {}: '{}'".format(i + 1, image_file_path))
-
-        # process image
-        # TODO add global variable for simple/detailed choice
-        processed_image = process_image_simple(image_file_path, **args)
-
-        # other formats image_to_[...] - 'data' with dict option, pdf, box ...
-        text = pts.image_to_string(processed_image, config=options)
-
-        # find and store average confidence for each image
-        if display_confidence:
-            current_image_conf = ocr_confidence(processed_image, options, **args)
-            confidence_dict[image_file_path] = current_image_conf
- 
-        # save output file if not join or this is last page
-        save = not join or (i == len(input_images) - 1)
-
-        # set output file path from input file name for each image.
-        # Used when join is False (if True output_file is already set or passed)
-        if not output_file and output_mode != 'print':
-            output_file_end = path.splitext(image_file_path)[0]  # before extension
-            output_file_end = path.split(output_file_end)[1]     # after last '/'
-            output_file_end += '-output.' + output_mode
-            output_file_path = output_path_prefix + output_file_end
-
-        # to be added after each page if join
-        footer = '\n\t\t\t\t\t--- Page {} ---\n\n'.format(i + 1) if join else ''
-
-        # base dict to pass to txt, docx or pdf writer functions
-        base_dict = {
-            'save': save,    # add common params here (font, layout ...)
-            'join': join,
-            'page_index': i,
-            'input_file_type': 'image'
-        }
-
-        # =============== OUTPUT based on output_mode ==============
-
-        if output_mode == 'print':
-            print("OUTPUT for image file: '{}':\n".format(image_file_path))
-            print(text + footer)
-
-        elif output_mode == 'txt':  # TODO move to separate function
-            params = base_dict  # add specific params here
-            text += footer
-            output_document = write_to_txt(text, output_file_path, output_document, **params)
-
-        elif output_mode == 'docx':
-            params = base_dict  # add specific params here
-            text += footer
-            output_document = write_to_docx(text, output_file_path, output_document, **params)
-
-        elif output_mode == 'pdf':
-            params = base_dict
-            text += footer
-            output_document = write_to_pdf(text, output_file_path, output_document, **params)
-
-        # display successful OCR summary
-        if save:
-            saved_to = 'stdout' if output_mode == 'print' else path.abspath(output_file_path)
-            total_pages = len(input_images)
-            if join and total_pages > 1:
-                info = "{} images".format(total_pages)
-            else:
-                info = "image '{}'".format(image_file_path)
 
-            # TODO move conf display to confidence/other separate function
-            conf_info = ''  # TODO for verbose display words with low conf
-            if display_confidence:
-                if join and total_pages > 1:  # display average of each image's average confidence
-                    avg_conf_list = confidence_dict.values()
-                    avg_conf = round(mean(avg_conf_list), 2)
-
-                else:       # display average confidence for each image
-                    avg_conf = current_image_conf
-                conf_info = ' with an average confidence of {}%'.format(avg_conf)
-
-            print("Successfuly OCR'ed {}{} and wrote to '{}'\n"
-                .format(info, conf_info, saved_to))
+    failed_images = 0   # no. of images that failed (of the job, and of current output file)
+    output_failed = 0
+
+    image_file_paths = (input_path_prefix + image for image in input_images)
+
+    # inputs of the job, to check that a resumed journal belongs to it
+    inputs = input_images.spec() if scanned else [input_path_prefix + image for image in input_images]
+
+    # if join, pages of docx output can be spilled to disk in segments (SegmentWriter).
+    # Segments are written anew by a resumed run, from images in the job journal
+    segment_pages = args.get('segment_pages') or write_dict.get('segment_pages_def')
+    if join and segment_pages and output_mode == 'docx':
+        output_document = segmented_docx(output_file_path, **args)
+
+    # journal of completed images of joined output file (an image output file
+    # is complete once written, so it needs none if not join)
+    journal = open_journal(output_file_path, inputs, **args) if join else None
+
+    def resumed(image_file_path):
+        """Returns result of an image completed by a resumed run, or None."""
+        return (journal.completed(image_file_path).get(1) if journal else None)
+
+    # time stages of each page if profile is set
+    start_profile(**args)
+
+    # pool of worker processes if more than one job, else None
+    executor = ocr_executor(**args)
+
+    # use staged pipeline overlapping rendering, preprocessing, OCR and writing if set
+    pipeline = args.get('pipeline')
+    pipeline = pipeline if pipeline is not None else defaults_dict.get('pipeline_def')
+    ocr_results = PagePipeline if pipeline else ocr_pages
+
+    # preprocess and OCR images (in parallel if executor), results are in input order
+    results = with_known_inputs(image_file_paths, resumed,
+                                lambda to_ocr: ocr_results(to_ocr, options, executor, **args))
+
+    try:
+        for i, (image_file_path, (text, current_image_conf), completed, last) in enumerate(results):
+
+            # if not join create new output_doc for each image, else use one output_doc for all
+            # (a joined pdf, or docx without segment_pages, holds all pages in memory until saved)
+            if not join:
+                output_document = None
+                output_failed = 0
+
+            # display image processing start, and record image in journal.
+            # A failed image is left out (quarantined), so other images go on
+            if completed:
+                print("Resumed image file no. {}: '{}' (from journal)".format(i + 1, image_file_path))
+            elif text is None:
+                print("*** OCR Error: image file no. {}: '{}' failed and was left out: {}"
+                      .format(i + 1, image_file_path, current_image_conf))
+                if journal:
+                    journal.record_failure(image_file_path, 1, current_image_conf)
+                text, current_image_conf = '', None
+                failed_images += 1
+                output_failed += 1
+            else:
+                print("Processing image file no. {}: '{}'".format(i + 1, image_file_path))
+                if journal:
+                    segment = (output_document.current_segment()
+                               if isinstance(output_document, SegmentWriter) else None)
+                    journal.record_page(image_file_path, 1, text, current_image_conf, segment)
+
+            # store average confidence for each image
+            if display_confidence and current_image_conf:
+                confidence_dict[image_file_path] = current_image_conf['mean']
+                if verbose:
+                    display_confidence_summary(current_image_conf, "image '{}'".format(image_file_path))
+
+            # save output file if not join or this is last page
+            save = not join or last
+
+            # set output file path from input file name for each image.
+            # Used when join is False (if True output_file is already set or passed)
+            if not output_file and output_mode != 'print':
+                output_file_end = path.splitext(image_file_path)[0]  # before extension
+                output_file_end = path.split(output_file_end)[1]     # after last '/'
+                if scanned:     # keep names of images in sub directories apart
+                    output_file_end = path.splitext(path.relpath(image_file_path, input_directory))[0].replace('/', '-')
+                output_file_end += '-output.' + output_mode
+                output_file_path = output_path_prefix + output_file_end
+
+            # to be added after each page if join
+            footer = '\n\t\t\t\t\t--- Page {} ---\n\n'.format(i + 1) if join else ''
+
+            # base dict to pass to txt, docx or pdf writer functions
+            base_dict = {
+                'save': save,    # add common params here (font, layout ...)
+                'join': join,
+                'page_index': i,
+                'font_path': args.get('font_path'),    # font and layout of job's config
+                'font_name': args.get('font_name'),
+                'w': args.get('width'),
+                'h': args.get('height'),
+                'input_file_type': 'image'
+            }
+
+            # writer stages are profiled for this image
+            set_page(image_file_path)
+
+            # =============== OUTPUT based on output_mode ==============
+
+            if output_mode == 'print':
+                print("OUTPUT for image file: '{}':\n".format(image_file_path))
+                print(text + footer)
+
+            elif output_mode == 'txt':  # TODO move to separate function
+                params = base_dict  # add specific params here
+                text += footer
+                output_document = write_to_txt(text, output_file_path, output_document, **params)
+
+            elif output_mode == 'docx':
+                params = base_dict  # add specific params here
+                text += footer
+                output_document = write_to_docx(text, output_file_path, output_document, **params)
+
+            elif output_mode == 'pdf':
+                params = base_dict
+                text += footer
+                output_document = write_to_pdf(text, output_file_path, output_document, **params)
+
+            # display successful OCR summary
+            if save:
+                saved_to = 'stdout' if output_mode == 'print' else path.abspath(output_file_path)
+                total_pages = i + 1
+                if join and total_pages > 1:
+                    info = "{} images".format(total_pages)
+                else:
+                    info = "image '{}'".format(image_file_path)
+
+                # TODO move conf display to confidence/other separate function
+                # (none if no image of the output has one, e.g. the image failed)
+                conf_info = ''
+                avg_conf = None
+                if display_confidence:
+                    if join and total_pages > 1:  # display average of each image's average confidence
+                        if confidence_dict:
+                            avg_conf = round(mean(confidence_dict.values()), 2)
+
+                    elif current_image_conf:     # display average confidence for each image
+                        avg_conf = current_image_conf['mean']
+                if avg_conf is not None:
+                    conf_info = ' with an average confidence of {}%'.format(avg_conf)
+
+                if output_failed:
+                    output_images = total_pages if join else 1
+                    print("OCR'ed {} of {} images ({} failed){} and wrote to '{}'\n"
+                          .format(output_images - output_failed, output_images, output_failed, conf_info, saved_to))
+                else:
+                    print("Successfuly OCR'ed {}{} and wrote to '{}'\n"
+                        .format(info, conf_info, saved_to))
+
+                # output file is complete, so its journal is no longer needed
+                if journal:
+                    journal.close()
+
+        # display (and dump) profile of all pages
+        finish_profile(**args)
+    finally:
+        stop_profile()
+        release_executor(executor)
+
+    return (failed_images)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Module containing functions to OCR pages (images or rendered pdf pages),
+either sequentially or in parallel using a pool of worker processes.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .confidence import ocr_confidence
+from .journal import PageError, retried
+from .ocr_cache import cache_enabled, cache_get, cache_put, page_key
+from .process_image import process_image, text_regions
+from .scan_dir import with_last
+from .profiler import current_page, merge_events, page_label, profile_enabled, profiled_call, timer
+from .tesseract_engine import engine_name, get_engine
+from . import defaults_dict, tesseract_dict
+
+# pool of worker processes kept running between jobs (by watch mode), or None
+warm_executor = None
+
+
+def ocr_page(page, options, **args):
+    """Preprocesses a single page and performs OCR on it.
+
+    Args:
+        page: a string path of an image file, or a rendered pdf page as a
+            NumPy array.
+        options (str): tesseract config string.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        tuple: OCR'ed text and confidence summary (a dict from `ocr_confidence`)
+            of the page. Confidence summary is None if `display_confidence`
+            is not set, or no word was recognized on the page.
+    """
+    # process image
+    processed_image = process_image(page, **args)
+
+    return (recognize_page(processed_image, options, **args))
+
+
+def try_ocr_page(page, options, **args):
+    """OCRs a page as `ocr_page`, trying again if it fails.
+
+    Returns:
+        tuple: result of `ocr_page`, or None and a PageError if the page
+            failed to render or OCR.
+    """
+    if isinstance(page, PageError):
+        return (None, page)
+    result = retried(ocr_page, page, options, **args)
+    return ((None, result) if isinstance(result, PageError) else result)
+
+
+def recognize_page(processed_image, options, **args):
+    """Performs OCR on a preprocessed page, or reads its result from cache.
+
+    If `crop` is set, only the text regions of the page are OCR'ed, and
+    their results merged in reading order.
+
+    Args:
+        processed_image (ndarray): a page preprocessed by `process_image`.
+        options (str): tesseract config string.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        tuple: OCR'ed text and confidence summary (or None) of the page.
+    """
+    crop = args.get('crop')
+    crop = crop if crop is not None else defaults_dict.get('crop_def')
+
+    regions = None
+    if crop:
+        with timer('text regions'):
+            regions = text_regions(processed_image)
+        if args.get('verbose'):
+            display_regions(regions, processed_image, args.get('page_label') or 'page')
+
+    if regions:
+        text, ocr_dict = recognize_regions(processed_image, regions, options, **args)
+    else:
+        text, ocr_dict = recognize_image(processed_image, options, **args)
+
+    conf = ocr_confidence(ocr_dict, **args) if args.get('display_confidence') else None
+    return (text, conf)
+
+
+def recognize_image(image, options, **args):
+    """Performs OCR on an image (a page or a region of it), or reads its
+    result from cache.
+
+    Args:
+        image (ndarray): a preprocessed page, or a region of it.
+        options (str): tesseract config string.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        tuple: OCR'ed text and `image_to_data` output (a dict, with at
+            least `text` and `conf` lists) of the image. The dict is None
+            if `display_confidence` is not set.
+    """
+    display_confidence = args.get('display_confidence')
+
+    # use cached result if same image was OCR'ed before with same config
+    cache_key = None
+    if cache_enabled(**args):
+        with timer('cache lookup'):
+            cache_key = page_key(image, options, **args)
+            cached = cache_get(cache_key, need_data=display_confidence)
+        if cached:
+            return (cached['text'], cached['data'] if display_confidence else None)
+
+    # OCR engine of current process (created once, then reused)
+    engine = get_engine(options, **args)
+
+    # if confidence is needed, get text and confidence from a single OCR pass
+    ocr_dict = None
+    if display_confidence:
+        with timer('tesseract'):
+            ocr_dict = engine.image_to_data(image)
+            text = data_to_text(ocr_dict)
+    else:
+        with timer('tesseract'):
+            text = engine.image_to_string(image)
+
+    if cache_key:
+        with timer('cache store'):
+            cache_put(cache_key, text, ocr_dict)
+
+    return (text, ocr_dict)
+
+
+def recognize_regions(image, regions, options, **args):
+    """Performs OCR on text regions of a page, and merges their results in
+    reading order.
+
+    Regions are OCR'ed in parallel threads if the engine runs tesseract as
+    a subprocess and pages are OCR'ed one at a time (with more jobs, worker
+    processes already keep all CPUs busy, and a tesserocr API handle can
+    not be shared between threads).
+
+    Args:
+        image (ndarray): a preprocessed page.
+        regions (list): boxes (left, top, right, bottom) of text regions
+            from `text_regions`, in reading order.
+        options (str): tesseract config string.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        tuple: OCR'ed text and `image_to_data` output (or None) of the
+            regions, as from `recognize_image`.
+    """
+    crops = [image[top:bottom, left:right] for left, top, right, bottom in regions]
+    jobs = args.get('jobs') or tesseract_dict.get('jobs_def')
+
+    if len(crops) > 1 and jobs == 1 and engine_name(**args) == 'subprocess':
+        # region timers record events for the page of the calling thread
+        profile, label = profile_enabled(), current_page()
+        with ThreadPoolExecutor(max_workers=min(len(crops), os.cpu_count() or 1)) as threads:
+            results = [merge_events(*result) for result in threads.map(
+                lambda crop: profiled_call(profile, label, recognize_image, crop, options, **args), crops)]
+    else:
+        results = [recognize_image(crop, options, **args) for crop in crops]
+
+    # text of regions as paragraphs, ending like text of a page
+    texts = [text.strip() for text, ocr_dict in results]
+    text = '\n\n'.join(text for text in texts if text)
+    text = text + '\n\n\f' if text else '\f'
+
+    ocr_dict = None
+    if args.get('display_confidence'):
+        ocr_dict = {'text': [word for _, data in results for word in data['text']],
+                    'conf': [conf for _, data in results for conf in data['conf']]}
+    return (text, ocr_dict)
+
+
+def display_regions(regions, image, label):
+    """Prints no. of text regions of a page and the share of its pixels
+    they cover, for verbose output."""
+    if not regions:
+        print('Text regions of {}: page not cropped'.format(label))
+        return
+    pixels = sum((right - left) * (bottom - top) for left, top, right, bottom in regions)
+    share = pixels / (image.shape[0] * image.shape[1])
+    print('Text regions of {}: {} region(s), {:.0%} of page pixels ({:.0%} fewer)'
+          .format(label, len(regions), share, 1 - share))
+
+
+def data_to_text(ocr_dict):
+    """Reconstructs OCR'ed text from tesseract's `image_to_data` output, in the
+    same layout as `image_to_string`: words of a line are separated by a
+    space, lines by a newline, and paragraphs (and blocks) by an empty line.
+
+    Args:
+        ocr_dict (dict): output of tesseract's `image_to_data` as a dict.
+
+    Returns:
+        str: the OCR'ed text.
+    """
+    parts = []
+    prev_line = prev_par = None
+    for block, par, line, word in zip(ocr_dict['block_num'], ocr_dict['par_num'],
+                                      ocr_dict['line_num'], ocr_dict['text']):
+        # skip entries for blocks, paragraphs and lines, and empty words
+        if not word or not word.strip():
+            continue
+
+        if (block, par, line) == prev_line:
+            parts.append(' ')
+        elif prev_line is not None:
+            # new line, and an empty line if also new paragraph
+            parts.append('\n\n' if (block, par) != prev_par else '\n')
+        prev_line, prev_par = (block, par, line), (block, par)
+        parts.append(word)
+
+    # end of last paragraph and page separator
+    if parts:
+        parts.append('\n\n')
+    parts.append('\f')
+
+    return (''.join(parts))
+
+
+def ocr_executor(**args):
+    """Creates a pool of worker processes for OCR if more than one job is
+    requested. If a warm pool is kept running (by watch mode), it is used
+    instead.
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        ProcessPoolExecutor: a pool of `jobs` worker processes, or None
+            if pages are to be OCR'ed sequentially.
+    """
+    if warm_executor:
+        return (warm_executor)
+    jobs = args.get('jobs') or tesseract_dict.get('jobs_def')
+    return (ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None)
+
+
+def release_executor(executor):
+    """Shuts down a pool of worker processes created by `ocr_executor`,
+    unless it is the warm pool, which is kept for later jobs."""
+    if executor and executor is not warm_executor:
+        executor.shutdown()
+
+
+def ocr_pages(pages, options, executor=None, **args):
+    """OCRs pages and yields results in the same order as `pages`.
+
+    If an executor is given, pages are OCR'ed in parallel by its worker
+    processes. Only a bounded window of pages (twice the no. of workers)
+    is submitted ahead of the page being yielded, so lazily rendered
+    pages are not all held in memory.
+
+    If profiling is on, each page is OCR'ed through `profiled_call`, so
+    stages timed in worker processes are recorded for the page. Each page
+    gets its label as `page_label` param, for verbose output of stages.
+
+    A page that fails is tried again, and if it still fails its result is
+    None and a PageError, so the other pages go on.
+
+    Args:
+        pages (iterable): image file paths or rendered pdf pages.
+        options (str): tesseract config string.
+        executor (ProcessPoolExecutor): pool of worker processes, or None
+            to OCR pages sequentially in current process.
+        **args (dict): dictionary of params from user input for ocr command,
+            and `pdf_pages` (see `page_label`) labeling pdf pages.
+
+    Yields:
+        tuple: OCR'ed text and confidence summary (or None) for each page,
+            or None and a PageError for a failed page.
+    """
+    profile = profile_enabled()
+    # labels pages, not passed on with params of each page
+    pdf_pages = args.pop('pdf_pages', None)
+
+    if executor is None:
+        for index, page in enumerate(pages):
+            label = page_label(page, index, pdf_pages)
+            if profile:
+                yield merge_events(*profiled_call(True, label, try_ocr_page, page, options,
+                                                  page_label=label, **args))
+            else:
+                yield try_ocr_page(page, options, page_label=label, **args)
+        return
+
+    def result(future):
+        return (merge_events(*future.result()) if profile else future.result())
+
+    window = 2 * (args.get('jobs') or tesseract_dict.get('jobs_def'))
+    pending = deque()
+    for index, page in enumerate(pages):
+        label = page_label(page, index, pdf_pages)
+        if profile:
+            pending.append(executor.submit(profiled_call, True, label, try_ocr_page, page, options,
+                                           page_label=label, **args))
+        else:
+            pending.append(executor.submit(try_ocr_page, page, options, page_label=label, **args))
+        if len(pending) >= window:
+            yield result(pending.popleft())
+
+    while pending:
+        yield result(pending.popleft())
+
+
+def with_known_pages(ocr_results, known_pages, keys):
+    """Yields results of pages in order, taking pages with a known result
+    (from a text layer or a resumed job's journal) from `known_pages` and
+    the others from `ocr_results`.
+
+    Args:
+        ocr_results (iterable): results of OCR'ed pages, in order.
+        known_pages (dict): {key: (text, confidence summary)} of pages with
+            a known result.
+        keys (iterable): keys of all pages (pdf page nos. or image indexes),
+            in order.
+
+    Yields:
+        tuple: text and confidence summary (or None) of each page.
+    """
+    ocr_results = iter(ocr_results)
+    for key in keys:
+        if key in known_pages:
+            yield known_pages[key]
+        else:
+            yield next(ocr_results)
+
+
+def with_known_inputs(inputs, known_result, ocr_results):
+    """Yields results of inputs (found lazily, e.g. scanned in input
+    directory) in order, taking inputs with a known result (from a resumed
+    job's journal) from `known_result` and OCR'ing the others.
+
+    Inputs are found as OCR takes them (on pipeline's thread if pipeline),
+    and are matched to OCR results in order through a deque.
+
+    Args:
+        inputs (iterable): inputs (image file paths), in order.
+        known_result (function): returns known result of an input, or None.
+        ocr_results (function): called with an iterable of inputs to OCR,
+            returns their results in order.
+
+    Yields:
+        tuple: input, its text and confidence summary (or None), True if
+            the result was known, and True if it is the last input.
+    """
+    found = deque()     # (input, known result or None) of inputs taken by OCR, in order
+
+    def to_ocr():
+        for page in inputs:
+            result = known_result(page)
+            found.append((page, result))
+            if result is None:
+                yield (page)
+
+    def in_order():
+        for ocr_result in ocr_results(to_ocr()):
+            while found[0][1] is not None:
+                yield (found.popleft() + (True,))
+            yield ((found.popleft()[0], ocr_result, False))
+        # inputs with known results after the last OCR'ed one
+        while found:
+            yield (found.popleft() + (True,))
+
+    for (page, result, known), last in with_last(in_order()):
+        yield ((page, result, known, last))
+
@@ -1,15 +1,21 @@
 #!/usr/bin/env python3
-import pytesseract as pts
-from io import BytesIO
-from pdf2image import convert_from_path
+from fpdf import FPDF
 from os import path
 from statistics import mean
-from .confidence import ocr_confidence
-from .process_image import process_image_simple, process_image_detailed
-from .output_to_docx import write_to_docx
+from . import defaults_dict, write_dict
+from .confidence import display_confidence_summary
+from .journal import open_journal
+from .ocr_pages import ocr_executor, ocr_pages, release_executor, with_known_pages
+from .output_segments import SegmentWriter
+from .output_to_docx import segmented_docx, write_to_docx
 from .output_to_pdf import write_to_pdf
-from .output_to_txt import write_to_txt
+from .output_to_txt import TxtWriter, write_to_txt
+from .pipeline import PagePipeline
+from .profiler import finish_profile, pdf_page_label, set_page, start_profile, stop_profile
+from .render_pdf import iter_pdf_pages, pdf_page_count
+from .scan_dir import DirectoryScan, with_last
 from .tesseract_config import config_tesseract
+from .text_layer import text_layer_pages
 
 
 def ocr_pdf(**args):
@@ -23,10 +29,16 @@ def ocr_pdf(**args):
     Args:
         **args (dict): a keyword dictionary generated from parsed and
             validated user command line input.
+
+    Returns:
+        int: no. of pages that failed and were left out of outputs.
     """
-    input_pdfs = args.get('input_files')
+    input_pdfs = args.get('input_files')    # list, or a DirectoryScan of input directory
     input_directory = args.get('input_directory')
 
+    # pdfs scanned in input directory are found lazily, as they are OCR'ed
+    scanned = isinstance(input_pdfs, DirectoryScan)
+
     input_path_prefix = input_directory if input_directory else ''
     input_path_prefix += '/' if (input_path_prefix and input_path_prefix[-1] != '/')  else ''
 
@@ -40,9 +52,10 @@ def ocr_pdf(**args):
     join = args.get('join')
 
     # set output file from input pdfs if join and output file not passed
+    # (from input directory name if pdfs are scanned)
     if (join and not output_file and output_mode != 'print'):
         output_file = ''
-        for in_pdf in input_pdfs:
+        for in_pdf in ([path.normpath(input_directory)] if scanned else input_pdfs):
             pdf_end = path.splitext(in_pdf)[0]  # before extension
             pdf_end = path.split(pdf_end)[1]     # after last '/'
             output_file += pdf_end + '-'
@@ -51,145 +64,255 @@ def ocr_pdf(**args):
     # set output file path if output file
     output_file_path = output_path_prefix + output_file if output_file else None
 
-    output_document = None  # a docx Documnet object or a pdf Object from FPDF
+    output_document = None  # a docx Documnet object, or a pdf Object from FPDF, or a TxtWriter
+
+    # inputs of the job, to check that a resumed journal belongs to it
+    inputs = input_pdfs.spec() if scanned else [input_path_prefix + input_pdf for input_pdf in input_pdfs]
+
+    # if join, pages of docx output can be spilled to disk in segments (SegmentWriter).
+    # Segments are written anew by a resumed run, from pages in the job journal
+    segment_pages = args.get('segment_pages') or write_dict.get('segment_pages_def')
+    if join and segment_pages and output_mode == 'docx':
+        output_document = segmented_docx(output_file_path, **args)
+
+    # journal of completed pages of the output file (of each pdf's output file if not join)
+    journal = open_journal(output_file_path, inputs, **args) if join else None
 
     # to count total pages
     total_pages = 0
 
-    # sets environ variables and returns tesseract config string
+    failed_pages = 0    # no. of pages that failed (of the job, and of current output file)
+    output_failed = 0
+
+    # returns tesseract config string (including training data folder of the job)
     # TODO add parameters to args or create new dict
     options = config_tesseract(**args)
 
     display_confidence = args.get('display_confidence')   # display OCR confidence summary if True
+    verbose = args.get('verbose')   # display detailed confidence summary of each page if True
 
     # to store average confidenece for each pdf ({pdf_file_path: {page_no: avg_conf}})
     # key: input pdf path, value: a dict with page no as key and average conf for each page as value
     confidence_dict = {}
-    for pdf_index, input_pdf in enumerate(input_pdfs):
-
-        # if not join create new output_doc for each pdf, else use one output_doc for all
-        # TODO check system strain when join is True
-        if not join:
-            output_document = None
-
-        pdf_file_path = input_path_prefix + input_pdf
-
-        # set output file path from input file name for each image.
-        # Used when join is False (if True output_file is already set or passed)
-        if not output_file and output_mode != 'print':
-            output_file_end = path.splitext(pdf_file_path)[0]  # before extension
-            output_file_end = path.split(output_file_end)[1]     # after last '/'
-            output_file_end += '-output.' + output_mode
-            output_file_path = output_path_prefix + output_file_end
-
-        # to check if this is last pdf for join. used to set save to True
-        last_pdf = pdf_index == len(input_pdfs) - 1
-
-        # display pdf processing start
-        print("Processing pdf file no. {}: '{}'".format(pdf_index + 1, pdf_file_path))
-
-        # read pdf
-        pages = convert_from_path(pdf_file_path)
 
-        # reset total_pages for not join
-        if not join:
-            total_pages = 0
-
-        # to store average confidenece for each page of current pdf ({page_no: avg_conf})
-        curr_pdf_conf_dict = {}
-
-        # iterate over each pdf's pages
-        for page_index, page in enumerate(pages):
-
-            # use BytesIO object, without saving to disk
-            with BytesIO() as img_stream:
-
-                # notify start of scan
-                print('Scanning page {}'.format(page_index + 1))
-
-                # specify format of file to save the bytes object
-                page.save(img_stream, format="jpeg")  # test different formats quality?
-                img_stream.seek(0)
-
-                """ # to write image to file and path image path to process_image
-                image_file_path = "temp/page_{}_image.jpg".format(page_index)
-                page.save(image_file_path, "jpeg") """
-                
-                # process image
-                # TODO add global variable for simple/detailed choice
-                processed_image = process_image_simple(img_stream, **args)
-
-            # other formats image_to_[...] - 'data' with dict option, pdf, box ...
-            text = pts.image_to_string(processed_image, config=options)
-
-            # find and store average confidence for each page
-            if display_confidence:
-                current_page_conf = ocr_confidence(processed_image, options, **args)
-                curr_pdf_conf_dict[page_index + 1] = current_page_conf
-
-            # save output if this is last page of current pdf and,
-            # not join or join and current pdf is last one in list of pdfs  
-            last_page = page_index == len(pages) - 1
-            save = last_page and (not join or last_pdf)
-
-            # to be added after each page
-            # page no. starts from 1 for each pdf file
-            footer = '\n\t\t\t\t\t--- Page {} ---\n\n'.format(page_index + 1)
-
-            # base dict to pass to txt, docx or pdf writer functions
-            base_dict = {
-                'save': save,    # add common params here (font, layout ...)
-                'join': join,
-                'pdf_index': pdf_index,
-                'page_index': page_index,
-                'input_file_type': 'pdf'
-            }
-
-            # =============== OUTPUT based on output_mode ==============
-
-            if output_mode == 'print':
-                if page_index == 0:
-                    print("OUTPUT for pdf file: '{}'".format(pdf_file_path))
-                print(text + footer)
-
-            elif output_mode == 'txt':
-                params = base_dict  # add specific params here
-                text += footer
-                output_document = write_to_txt(text, output_file_path, output_document, **params)
-
-            elif output_mode == 'docx':
-                params = base_dict  # add specific params here
-                text += footer
-                output_document = write_to_docx(text, output_file_path, output_document, **params)
-
-            elif output_mode == 'pdf':
-                params = base_dict  # add specific params here
-                text += footer
-                output_document = write_to_pdf(text, output_file_path, output_document, **params)
+    # time stages of each page if profile is set
+    start_profile(**args)
+
+    # pool of worker processes if more than one job, else None
+    executor = ocr_executor(**args)
+
+    # use staged pipeline overlapping rendering, preprocessing, OCR and writing if set
+    pipeline = args.get('pipeline')
+    pipeline = pipeline if pipeline is not None else defaults_dict.get('pipeline_def')
+    ocr_results = PagePipeline if pipeline else ocr_pages
+
+    try:
+        for pdf_index, (input_pdf, last_pdf) in enumerate(with_last(input_pdfs)):
+
+            # if not join create new output_doc for each pdf, else use one output_doc for all
+            # (a joined pdf, or docx without segment_pages, holds all pages in memory until saved)
+            if not join:
+                output_document = None
+
+            pdf_file_path = input_path_prefix + input_pdf
+
+            # set output file path from input file name for each image.
+            # Used when join is False (if True output_file is already set or passed)
+            if not output_file and output_mode != 'print':
+                output_file_end = path.splitext(pdf_file_path)[0]  # before extension
+                output_file_end = path.split(output_file_end)[1]     # after last '/'
+                if scanned:     # keep names of pdfs in sub directories apart
+                    output_file_end = path.splitext(input_pdf)[0].replace('/', '-')
+                output_file_end += '-output.' + output_mode
+                output_file_path = output_path_prefix + output_file_end
+                journal = open_journal(output_file_path, [pdf_file_path], **args)
+
+            # display pdf processing start
+            print("Processing pdf file no. {}: '{}'".format(pdf_index + 1, pdf_file_path))
+
+            # reset total_pages for not join
+            if not join:
+                total_pages = 0
+                output_failed = 0
+
+            page_count = pdf_page_count(pdf_file_path)
+            page_nos = range(1, page_count + 1)
+            if not page_count:
+                print("*** Input Error: pdf file '{}' has no pages and was left out".format(pdf_file_path))
+
+            # take pages completed by a resumed run from the journal
+            completed = journal.completed(pdf_file_path) if journal else {}
+
+            # take text of pages with an Ethiopic text layer from the pdf, unless force_ocr
+            text_pages = {} if args.get('force_ocr') else text_layer_pages(pdf_file_path, 1, page_count)
+            text_pages = {page_no: text for page_no, text in text_pages.items() if page_no not in completed}
+            if text_pages and verbose:
+                print('Using text layer of {} of {} pages'.format(len(text_pages), page_count))
+
+            # results of pages that need no OCR
+            known_pages = {page_no: (text, None) for page_no, text in text_pages.items()}
+            known_pages.update(completed)
+
+            # render other pages lazily in chunks
+            pages = iter_pdf_pages(pdf_file_path, page_count, skip_pages=known_pages, **args)
+
+            # to store average confidenece for each page of current pdf ({page_no: avg_conf})
+            curr_pdf_conf_dict = {}
+
+            # label pages OCR'ed with pdf file path and page no.
+            pdf_pages = (pdf_file_path, [page_no for page_no in page_nos if page_no not in known_pages])
+
+            # preprocess and OCR pages (in parallel if executor), results are in page order
+            results = with_known_pages(ocr_results(pages, options, executor, **dict(args, pdf_pages=pdf_pages)),
+                                       known_pages, page_nos)
+
+            # set by last page (a pdf without pages has none)
+            save = False
+
+            # iterate over each pdf's pages
+            for page_index, (text, current_page_conf) in enumerate(results):
+                page_no = page_index + 1
+
+                # notify end of scan, and record page in journal.
+                # A failed page is left out (quarantined), so other pages go on
+                if page_no in completed:
+                    print('Resumed page {} (from journal)'.format(page_no))
+                elif text is None:
+                    print('*** OCR Error: page {} failed and was left out: {}'.format(page_no, current_page_conf))
+                    if journal:
+                        journal.record_failure(pdf_file_path, page_no, current_page_conf)
+                    text, current_page_conf = '', None
+                    failed_pages += 1
+                    output_failed += 1
+                else:
+                    if page_no in text_pages:
+                        print('Extracted page {} (text layer)'.format(page_no))
+                    else:
+                        print('Scanned page {}'.format(page_no))
+                    if journal:
+                        segment = (output_document.current_segment()
+                                   if isinstance(output_document, SegmentWriter) else None)
+                        journal.record_page(pdf_file_path, page_no, text, current_page_conf, segment)
+
+                # store average confidence for each page
+                if display_confidence and current_page_conf:
+                    curr_pdf_conf_dict[page_index + 1] = current_page_conf['mean']
+                    if verbose:
+                        display_confidence_summary(current_page_conf, 'page {}'.format(page_index + 1))
+
+                # save output if this is last page of current pdf and,
+                # not join or join and current pdf is last one in list of pdfs  
+                last_page = page_index == page_count - 1
+                save = last_page and (not join or last_pdf)
+
+                # to be added after each page
+                # page no. starts from 1 for each pdf file
+                footer = '\n\t\t\t\t\t--- Page {} ---\n\n'.format(page_index + 1)
+
+                # base dict to pass to txt, docx or pdf writer functions
+                base_dict = {
+                    'save': save,    # add common params here (font, layout ...)
+                    'join': join,
+                    'pdf_index': pdf_index,
+                    'page_index': page_index,
+                    'font_path': args.get('font_path'),    # font and layout of job's config
+                    'font_name': args.get('font_name'),
+                    'w': args.get('width'),
+                    'h': args.get('height'),
+                    'input_file_type': 'pdf'
+                }
+
+                # writer stages are profiled for this page
+                set_page(pdf_page_label(pdf_file_path, page_index + 1))
+
+                # =============== OUTPUT based on output_mode ==============
+
+                if output_mode == 'print':
+                    if page_index == 0:
+                        print("OUTPUT for pdf file: '{}'".format(pdf_file_path))
+                    print(text + footer)
+
+                elif output_mode == 'txt':
+                    params = base_dict  # add specific params here
+                    text += footer
+                    output_document = write_to_txt(text, output_file_path, output_document, **params)
+
+                elif output_mode == 'docx':
+                    params = base_dict  # add specific params here
+                    text += footer
+                    output_document = write_to_docx(text, output_file_path, output_document, **params)
+
+                elif output_mode == 'pdf':
+                    params = base_dict  # add specific params here
+                    text += footer
+                    output_document = write_to_pdf(text, output_file_path, output_document, **params)
         
-        # add current pdf confidence dict to confidence dict
-        if display_confidence:
-            confidence_dict[pdf_file_path] = curr_pdf_conf_dict
-
-        total_pages += len(pages)
-        # if save display successful OCR summary
-        # TODO add more detail - path of pdfs, with page no. for each if join)
-        if save:
-            # TODO move conf display to confidence/other separate function
-            conf_info = ''
+            # a pdf without pages has no output of its own (if not join), and
+            # a joined output is still saved after the last pdf
+            if not page_count:
+                if join and last_pdf and total_pages:
+                    save_output(output_document, output_file_path)
+                    save = True
+                elif not join and journal:
+                    journal.close()
+
+            # add current pdf confidence dict to confidence dict
             if display_confidence:
-                if join:    # display average of each pdf's average confidence
-                    # TODO if verbose display avg_conf for each pdf too
-                    # find sum of avg_conf of pages for each pdf
-                    avg_conf_sum_list = [sum(p) for p in map(dict.values, confidence_dict.values())]
-                    # divide sum of avg_conf sum of each pdf by total pages
-                    avg_conf = round(sum(avg_conf_sum_list) / total_pages, 2)
-
-                else:       # display average confidence for each pdf
-                    avg_conf = round(mean(curr_pdf_conf_dict.values()), 2)
-
-                conf_info = " with an average confidence of {}%".format(avg_conf)
-
-            saved_to = 'stdout' if output_mode == 'print' else path.abspath(output_file_path)
-            print("Successfuly OCR'ed {} no. of pages{} and wrote to '{}'\n"
-                .format(total_pages, conf_info, saved_to))
+                confidence_dict[pdf_file_path] = curr_pdf_conf_dict
+
+            total_pages += page_count
+            # if save display successful OCR summary
+            # TODO add more detail - path of pdfs, with page no. for each if join)
+            if save:
+                # TODO move conf display to confidence/other separate function
+                conf_info = ''
+                # no. of pages of the output with confidence (text layer and
+                # failed pages have none)
+                conf_pages = sum(map(len, confidence_dict.values())) if join else len(curr_pdf_conf_dict)
+                if display_confidence and conf_pages:
+                    if join:    # display average of each pdf's average confidence
+                        # TODO if verbose display avg_conf for each pdf too
+                        # find sum of avg_conf of pages for each pdf
+                        avg_conf_sum_list = [sum(p) for p in map(dict.values, confidence_dict.values())]
+                        # divide sum of avg_conf sum of each pdf by no. of pages with confidence
+                        avg_conf = round(sum(avg_conf_sum_list) / conf_pages, 2)
+
+                    else:       # display average confidence for each pdf
+                        avg_conf = round(mean(curr_pdf_conf_dict.values()), 2)
+
+                    conf_info = " with an average confidence of {}%".format(avg_conf)
+
+                saved_to = 'stdout' if output_mode == 'print' else path.abspath(output_file_path)
+                if output_failed:
+                    print("OCR'ed {} of {} pages ({} failed){} and wrote to '{}'\n"
+                          .format(total_pages - output_failed, total_pages, output_failed, conf_info, saved_to))
+                else:
+                    print("Successfuly OCR'ed {} no. of pages{} and wrote to '{}'\n"
+                        .format(total_pages, conf_info, saved_to))
+
+                # output file is complete, so its journal is no longer needed
+                if journal:
+                    journal.close()
+
+        # display (and dump) profile of all pages
+        finish_profile(**args)
+    finally:
+        stop_profile()
+        release_executor(executor)
+
+    return (failed_pages)
+
+
+def save_output(output_document, output_file_path):
+    """Saves an output document (of any output mode) without adding a page
+    to it. Printed output (no document) has nothing to save."""
+    if output_document is None:
+        return
+    if isinstance(output_document, TxtWriter):
+        output_document.close()
+    elif isinstance(output_document, SegmentWriter):
+        output_document.save()
+    elif isinstance(output_document, FPDF):
+        output_document.output(output_file_path)
+    else:   # docx Document
+        output_document.save(output_file_path)
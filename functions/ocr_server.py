@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Module containing a local HTTP OCR service, backed by a pool of
+pre-warmed worker processes.
+
+Endpoints:
+    POST /ocr       body is an image or pdf file. Query parameters:
+                        type: 'image' or 'pdf' (default from Content-Type)
+                        mode: 'txt' (default), 'docx' or 'pdf' output
+                        confidence: '1' to include confidence levels
+                        lang: 'amh', 'tir' or 'eng'
+                        psm: page segmentation mode (0 - 13)
+                        oem: OCR engine mode (0 - 3)
+                    Responds with json containing `text`, `pages` (text and
+                    confidence, or error, of each page), `failed` (no. of
+                    pages that could not be OCR'ed), `confidence` and, for
+                    'docx' and 'pdf' modes, the base64 encoded output
+                    `document`. Invalid query parameters, uploads without
+                    a valid Content-Length and unreadable uploads are
+                    rejected with status 400.
+    GET /health     responds with json containing server status.
+
+Requests are accepted while a worker or a queue slot is free, otherwise
+they are rejected with status 503, so the service never buffers more than
+`workers + queue` uploads.
+"""
+import argparse
+import base64
+import cv2
+import json
+import numpy as np
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import mean
+from urllib.parse import parse_qs, urlparse
+from .ocr_pages import try_ocr_page
+from .output_to_docx import write_to_docx
+from .output_to_pdf import write_to_pdf
+from .render_pdf import iter_pdf_pages, pdf_page_count
+from .tesseract_config import config_tesseract
+from .tesseract_engine import get_engine
+
+# tesseract options that can be set with query parameters: {name: (type, valid values)}
+QUERY_OPTIONS = {
+    'lang': (str, ('amh', 'tir', 'eng')),
+    'psm': (int, range(14)),
+    'oem': (int, range(4)),
+}
+
+
+class UploadError(ValueError):
+    """
+    Error of an upload that can not be read as an image or pdf file.
+    """
+
+
+def query_options(query):
+    """Reads tesseract options from query parameters.
+
+    Args:
+        query (dict): query parameters of a request.
+
+    Returns:
+        dict: {name: value} of options set in the query, converted to their
+            types.
+
+    Raises:
+        ValueError: if an option has an invalid value.
+    """
+    options = {}
+    for name, (option_type, values) in QUERY_OPTIONS.items():
+        if not query.get(name):
+            continue
+        try:
+            value = option_type(query.get(name))
+        except ValueError:
+            value = None
+        if value not in values:
+            raise ValueError('{} must be one of {}'.format(name, ', '.join(map(str, values))))
+        options[name] = value
+    return (options)
+
+
+def warm_worker():
+    """Initializes a worker process: loads the default OCR engine, so the
+    first request does not pay its start up time."""
+    get_engine(config_tesseract())
+
+
+def ocr_upload(data, input_file_type, output_mode, **args):
+    """OCRs an uploaded image or pdf file. Runs in a worker process.
+
+    Args:
+        data (bytes): content of the uploaded file.
+        input_file_type (str): 'image' or 'pdf'.
+        output_mode (str): 'txt', 'docx' or 'pdf'.
+        **args (dict): ocr params (display_confidence, lang, psm, oem).
+
+    Returns:
+        dict: json serializable OCR result.
+
+    Raises:
+        UploadError: if the upload can not be read.
+    """
+    options = config_tesseract(**args)
+    args['input_file_type'] = input_file_type
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if input_file_type == 'pdf':
+            pdf_file_path = os.path.join(temp_dir, 'input.pdf')
+            with open(pdf_file_path, 'wb') as file:
+                file.write(data)
+            try:
+                page_count = pdf_page_count(pdf_file_path)
+            except Exception as e:
+                raise UploadError('could not read pdf: {}: {}'.format(type(e).__name__, e))
+            pages = iter_pdf_pages(pdf_file_path, page_count, **args)
+        else:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise UploadError('could not decode image')
+            pages = [image]
+
+        # a page that fails to render or OCR is reported, other pages go on
+        results = [try_ocr_page(page, options, **args) for page in pages]
+        texts = [text for text, _ in results if text is not None]
+
+        document = None
+        if output_mode in ['docx', 'pdf'] and texts:
+            output_file_path = os.path.join(temp_dir, 'output.' + output_mode)
+            writer = write_to_docx if output_mode == 'docx' else write_to_pdf
+            output_document = None
+            for page_index, text in enumerate(texts):
+                output_document = writer(text, output_file_path, output_document,
+                                         save=page_index == len(texts) - 1)
+            with open(output_file_path, 'rb') as file:
+                document = base64.b64encode(file.read()).decode('ascii')
+
+    pages = []
+    for page_no, (text, conf) in enumerate(results, 1):
+        if text is None:
+            pages.append({'page': page_no, 'error': str(conf)})
+        else:
+            pages.append({'page': page_no, 'text': text, 'confidence': conf})
+    confs = [conf['mean'] for text, conf in results if text is not None and conf]
+    return ({
+        'text': ''.join(texts),
+        'pages': pages,
+        'failed': len(results) - len(texts),
+        'confidence': round(mean(confs), 2) if confs else None,
+        'document': document,
+        })
+
+
+class OCRServer(ThreadingHTTPServer):
+    """
+    HTTP server holding the worker pool and the request slots.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, workers, queue_size, max_upload):
+        """Starts worker processes and binds server to address.
+
+        Args:
+            address (tuple): (host, port) to listen on.
+            workers (int): no. of worker processes.
+            queue_size (int): no. of requests waiting for a free worker.
+            max_upload (int): maximum upload size in bytes.
+        """
+        super().__init__(address, OCRRequestHandler)
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+        # start and warm up all workers now, instead of on first requests
+        for future in [self.executor.submit(warm_worker) for _ in range(workers)]:
+            future.result()
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.capacity = workers + queue_size
+        self.active = 0
+        self.max_upload = max_upload
+        self.lock = threading.Lock()
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles OCR and health check requests.
+    """
+
+    def send_json(self, status, content, headers=None):
+        """Sends a json response."""
+        body = json.dumps(content, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Responds to health checks."""
+        if urlparse(self.path).path != '/health':
+            self.send_json(404, {'error': 'not found'})
+            return
+        self.send_json(200, {'status': 'ok', 'active': self.server.active,
+                             'capacity': self.server.capacity})
+
+    def do_POST(self):
+        """Runs OCR on an uploaded file in a worker process."""
+        url = urlparse(self.path)
+        if url.path != '/ocr':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        # without a valid length the upload can not be read, so the
+        # connection is closed after responding
+        length = self.headers.get('Content-Length', '').strip()
+        if not length.isdigit():
+            self.send_json(400, {'error': 'missing or invalid Content-Length header'}, {'Connection': 'close'})
+            return
+        length = int(length)
+        if not length:
+            self.send_json(400, {'error': 'empty upload'})
+            return
+        if length > self.server.max_upload:
+            self.send_json(413, {'error': 'upload larger than {} bytes'.format(self.server.max_upload)})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        content_type = self.headers.get('Content-Type', '')
+        input_file_type = query.get('type') or ('pdf' if 'pdf' in content_type else 'image')
+        output_mode = query.get('mode', 'txt')
+        error = None
+        if input_file_type not in ['image', 'pdf'] or output_mode not in ['txt', 'docx', 'pdf']:
+            error = "type must be 'image' or 'pdf', and mode 'txt', 'docx' or 'pdf'"
+        else:
+            try:
+                options = query_options(query)
+            except ValueError as e:
+                error = str(e)
+        if error:
+            # read the upload, so the client is not cut off while sending it
+            self.rfile.read(length)
+            self.send_json(400, {'error': error})
+            return
+
+        # backpressure: reject request if all workers and queue slots are taken
+        if not self.server.slots.acquire(blocking=False):
+            self.send_json(503, {'error': 'server busy'}, {'Retry-After': '1'})
+            return
+
+        with self.server.lock:
+            self.server.active += 1
+        try:
+            data = self.rfile.read(length)
+            args = dict(options, display_confidence=query.get('confidence') in ['1', 'true', 'yes'])
+
+            future = self.server.executor.submit(ocr_upload, data, input_file_type, output_mode, **args)
+            result = future.result()
+        except UploadError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+        else:
+            self.send_json(200, result)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+            self.server.slots.release()
+
+
+def run_server(argv):
+    """Starts the OCR service and serves until interrupted.
+
+    Args:
+        argv (list): command line arguments after `serve`.
+
+    Returns:
+        int: exit status code.
+    """
+    parser = argparse.ArgumentParser(prog='ocr.py serve', description='Run a local HTTP OCR service.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default 8000)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='no. of OCR worker processes (default no. of CPUs)')
+    parser.add_argument('--queue', type=int, default=16,
+                        help='no. of requests waiting for a free worker before rejecting (default 16)')
+    parser.add_argument('--max-upload', type=int, default=100,
+                        help='maximum upload size in MB (default 100)')
+    try:
+        server_args = parser.parse_args(argv)
+    except SystemExit:
+        return (2)
+
+    server = OCRServer((server_args.host, server_args.port), max(1, server_args.workers),
+                       max(0, server_args.queue), server_args.max_upload * 1024 * 1024)
+    print('Serving OCR on http://{}:{}/ocr with {} workers'
+          .format(server_args.host, server_args.port, server_args.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+        server.executor.shutdown()
+    return (0)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Module containing a writer that spills pages of joined outputs to disk
+in segments, and assembles the output file from them once all pages are
+written.
+"""
+import json
+import os
+import shutil
+
+
+class SegmentWriter:
+    """
+    Stores OCR'ed pages of a joined output file in segment files of
+    `segment_pages` pages each, in a `<output file>.segments` directory.
+
+    Only the pages of the current segment are held in memory. On `save`
+    the output file is assembled from the segments by the `assemble`
+    function, and the segments directory is removed. A resumed run writes
+    segments anew, from pages in the job journal.
+    """
+
+    def __init__(self, output_file_path, assemble, segment_pages):
+        """Creates an (empty) segments directory.
+
+        Args:
+            output_file_path (str): path (including file name) of output file.
+            assemble (function): function called as `assemble(texts, output_file_path)`
+                with an iterator over text of all pages, to write the output file.
+            segment_pages (int): no. of pages in a segment.
+        """
+        self.output_file_path = output_file_path
+        self.assemble = assemble
+        self.segment_pages = segment_pages
+        self.segments_dir = output_file_path + '.segments'
+        self.pending = []       # texts of pages in current segment
+        self.segments = []      # file names of completed segments
+
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+        os.makedirs(self.segments_dir, exist_ok=True)
+
+    def write(self, text, save=False):
+        """Adds a page to current segment.
+
+        Args:
+            text (str): OCR'ed text of the page.
+            save (bool): if True, assemble the output file after this page.
+        """
+        self.pending.append(text)
+        if len(self.pending) >= self.segment_pages:
+            self.write_segment()
+
+        if save:
+            self.save()
+
+    def current_segment(self):
+        """Returns index of the segment the next page is written to."""
+        return (len(self.segments))
+
+    def write_segment(self):
+        """Writes pages of current segment to a segment file."""
+        if not self.pending:
+            return
+
+        segment_file = 'segment_{:05d}.jsonl'.format(len(self.segments))
+        with open(os.path.join(self.segments_dir, segment_file), 'w', encoding='utf-8') as file:
+            for text in self.pending:
+                file.write(json.dumps(text, ensure_ascii=False) + '\n')
+
+        self.segments.append(segment_file)
+        self.pending = []
+
+    def texts(self):
+        """Yields text of each stored page, reading one line at a time."""
+        for segment_file in self.segments:
+            with open(os.path.join(self.segments_dir, segment_file), 'r', encoding='utf-8') as file:
+                for line in file:
+                    yield json.loads(line)
+
+    def save(self):
+        """Writes the last segment, assembles the output file from all
+        segments and removes the segments directory."""
+        self.write_segment()
+        self.assemble(self.texts(), self.output_file_path)
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
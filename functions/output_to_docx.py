@@ -1,6 +1,14 @@
 #!/usr/bin/env python3
 import docx
+import os
+import re
+import zipfile
+from functools import partial
+from io import BytesIO
+from lxml import etree
 from . import write_dict
+from .output_segments import SegmentWriter
+from .profiler import timer
 
 
 def write_to_docx(text, output_file_path, document=None, **args):
@@ -9,23 +17,103 @@ def write_to_docx(text, output_file_path, document=None, **args):
     Args:
         text (str): output from OCR by tesseract.
         output_file_path (str): path (including file name) of output file.
-        document (Document): a Document object loaded from docx to add pages to.
-            If not provided a new one will be created.
+        document (Document|SegmentWriter): a Document object loaded from docx
+            to add pages to, or a SegmentWriter spilling pages to disk.
+            If not provided a new Document will be created.
         **args (dict): dictionary of parameters (font, layout ...)
             for formatting document.
 
     Retruns:
-        Document: a Document object with newly added page containing text.
+        Document|SegmentWriter: a Document object with newly added page containing
+            text, or the SegmentWriter the page is passed to.
 
     """
+    # pages are stored on disk and document is assembled on save
+    if isinstance(document, SegmentWriter):
+        with timer('writer'):
+            document.write(text)
+        if args.get('save'):
+            with timer('writer save'):
+                document.save()
+        return (document)
+
     # TODO - check if saving document after treshold no. of pages speeds up process
-    document = document if document else docx.Document()
-    par = document.add_paragraph().add_run(text)
-    par.font.name = args.get('font_name', write_dict.get('font_name_def'))
+    with timer('writer'):
+        document = document if document else docx.Document()
+        # form feed (tesseract's page separator) is not allowed in docx xml
+        par = document.add_paragraph().add_run(text.replace('\f', ''))
+        par.font.name = args.get('font_name') or write_dict.get('font_name_def')
 
     if args.get('save'):
-        document.save(output_file_path)
+        with timer('writer save'):
+            document.save(output_file_path)
 
     # TODO - handle other args for MSword formatiing
 
     return (document)
+
+
+def assemble_docx(texts, output_file_path, **args):
+    """Writes a MS word document with a paragraph for each page text, same
+    as `write_to_docx`. Paragraphs are streamed one at a time into the
+    document's xml, so memory use does not grow with the no. of pages.
+
+    Args:
+        texts (iterable): OCR'ed text of each page.
+        output_file_path (str): path (including file name) of output file.
+        **args (dict): dictionary of parameters (font ...) for formatting
+            document, as for `write_to_docx`.
+    """
+    font_name = args.get('font_name') or write_dict.get('font_name_def')
+
+    # an empty document used as template, and to create paragraphs
+    document = docx.Document()
+    template = BytesIO()
+    document.save(template)
+
+    temp_file_path = output_file_path + '.tmp'
+    with zipfile.ZipFile(template) as template_zip, \
+         zipfile.ZipFile(temp_file_path, 'w', zipfile.ZIP_DEFLATED) as output_zip:
+        for item in template_zip.infolist():
+            content = template_zip.read(item.filename)
+            if item.filename != 'word/document.xml':
+                output_zip.writestr(item, content)
+                continue
+
+            # paragraphs go before section properties at the end of body
+            xml = content.decode('utf-8')
+            split = xml.rfind('<w:sectPr')
+            with output_zip.open(item, 'w') as part:
+                part.write(xml[:split].encode('utf-8'))
+                for text in texts:
+                    paragraph = document.add_paragraph()
+                    paragraph.add_run(text.replace('\f', '')).font.name = font_name
+                    part.write(paragraph_xml(paragraph._p).encode('utf-8'))
+                    # remove paragraph from template document once written
+                    paragraph._p.getparent().remove(paragraph._p)
+                part.write(xml[split:].encode('utf-8'))
+
+    os.replace(temp_file_path, output_file_path)
+
+
+def paragraph_xml(element):
+    """Serializes a paragraph element, without the namespace declarations
+    already made in the document's root element."""
+    xml = etree.tostring(element, encoding='unicode')
+    tag_end = xml.index('>')
+    return (re.sub(r' xmlns:\w+="[^"]*"', '', xml[:tag_end]) + xml[tag_end:])
+
+
+def segmented_docx(output_file_path, **args):
+    """Creates a SegmentWriter for a joined MS word output file.
+
+    Args:
+        output_file_path (str): path (including file name) of output file.
+        **args (dict): dictionary of params from user input for ocr command
+            (font of the document too).
+
+    Returns:
+        SegmentWriter: writer to pass to `write_to_docx` as document.
+    """
+    return (SegmentWriter(output_file_path, partial(assemble_docx, **args),
+                          args.get('segment_pages') or write_dict.get('segment_pages_def')))
@@ -1,33 +1,78 @@
 #!/usr/bin/env python3
-import docx
+import os
+from . import write_dict
+from .profiler import timer
 
 
-def write_to_txt(text, output_file_path, output_document, **args):
+class TxtWriter:
+    """
+    Writes text to a plain text file through a single open file handle.
+
+    Text is buffered and written to a temporary file next to the output file
+    once the buffer passes `buffer_size` bytes. On `close` the temporary file
+    is renamed to the output file, so an output file is either complete or
+    not created at all.
+    """
+
+    def __init__(self, output_file_path, buffer_size=None):
+        """Opens a temporary file for the output file.
+
+        Args:
+            output_file_path (str): path (including file name) of output file.
+            buffer_size (int): no. of bytes to buffer before writing to file.
+        """
+        self.output_file_path = output_file_path
+        self.temp_file_path = output_file_path + '.tmp'
+        self.buffer_size = buffer_size if buffer_size is not None else write_dict.get('txt_buffer_size_def')
+        self.buffer = []
+        self.buffered = 0
+        self.file = open(self.temp_file_path, 'wb')
+
+    def write(self, text):
+        """Adds text to buffer, and flushes buffer if it passes `buffer_size`."""
+        data = text.encode('utf-8')
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes buffered text to the temporary file."""
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+        self.file.flush()
+
+    def close(self):
+        """Writes remaining text and renames temporary file to output file."""
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temp_file_path, self.output_file_path)
+
+
+def write_to_txt(text, output_file_path, output_document=None, **args):
     """Writes OCR'ed text to plain text file.
 
     Args:
         text (str): output from OCR by tesseract.
         output_file_path (str): path (including file name) of output file.
-        output_document (str): buffer to store text from inputs
+        output_document (TxtWriter): writer of the output file to add text to.
+            If not provided a new one will be created.
         **args (dict): dictionary of parameters for formatting output text.
 
+    Returns:
+        TxtWriter: the writer of the output file (closed if `save` is set).
     """
-    # TODO check if buffer size passes treshold and write to file
-
-    join = args.get('join')
-    pdf_index = args.get('pdf_index')
-    page_index = args.get('page_index')
-    input_file_type = args.get('input_file_type')
-
-    # if join: truncate for 1st page of 1st pdf, then append
-    # if not join: truncate for 1st page of each pdf, then append
-    if join and input_file_type == 'pdf':
-        write_mode = 'w' if pdf_index == 0 and page_index == 0 else 'a'
-    else:
-        write_mode = 'w' if page_index == 0 else 'a'
+    with timer('writer'):
+        writer = output_document if output_document else TxtWriter(output_file_path, args.get('buffer_size'))
+        writer.write(text)
 
-    with open(output_file_path, write_mode, encoding='utf-8') as file:
-        file.write(text)
+    # write remaining text and move complete file to output path
+    if args.get('save'):
+        with timer('writer save'):
+            writer.close()
 
     # TODO handle other args for output formatting
-    return (output_document)
\ No newline at end of file
+    return (writer)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Module containing an on-disk store of rendered pdf pages.
+
+Rendered (grayscale) pages of a pdf are appended as raw uint8 pixels to a
+single file per document, named by a hash of the document's content. A
+json index beside it maps each page no. and DPI to the offset and shape of
+the page's pixels, and keeps the DPIs chosen for pages by auto DPI. Later
+runs of the same document (with other tesseract or preprocessing settings)
+read pages from the store instead of rendering them again with poppler.
+
+Stored pages are passed around as `StoredPage` references and memory-mapped
+where they are processed, so the main process and worker processes read
+pixels straight from the OS page cache without copying them between
+processes. When the store grows past its size limit, least recently used
+documents are removed.
+"""
+import fcntl
+import json
+import os
+import numpy as np
+from contextlib import contextmanager
+from hashlib import blake2b
+from . import defaults_dict
+
+# bytes of a pdf file read at a time when hashing it
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def store_enabled(**args):
+    """Checks if rendered page store is to be used.
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        bool: value of `page_store` arg if passed (--page-store/--no-page-store),
+            else default.
+    """
+    page_store = args.get('page_store')
+    return (page_store if page_store is not None else defaults_dict.get('page_store_def'))
+
+
+def document_hash(pdf_file_path):
+    """Returns a hex digest of the content of a pdf file."""
+    key = blake2b(digest_size=20)
+    with open(pdf_file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            key.update(chunk)
+    return (key.hexdigest())
+
+
+class StoredPage:
+    """
+    Reference to a rendered page in a page store file. Small to pickle, so
+    it is sent to worker processes instead of the page's pixels.
+    """
+
+    def __init__(self, file_path, offset, shape):
+        """
+        Args:
+            file_path (str): path of the store file of the document.
+            offset (int): offset of the page's pixels in the file.
+            shape (tuple): shape of the page's pixel array.
+        """
+        self.file_path = file_path
+        self.offset = offset
+        self.shape = tuple(shape)
+
+    def load(self):
+        """Memory-maps pixels of the page (read only, no copy).
+
+        Returns:
+            ndarray: the page as a uint8 array.
+        """
+        return (np.memmap(self.file_path, dtype=np.uint8, mode='r', offset=self.offset, shape=self.shape))
+
+
+class PageStore:
+    """
+    Rendered pages of a pdf document in the page store.
+    """
+
+    def __init__(self, pdf_file_path):
+        """Opens the store of a document, reading its index if the document
+        was stored before.
+
+        Args:
+            pdf_file_path (str): path of the pdf file.
+        """
+        self.key = document_hash(pdf_file_path)
+        self.store_dir = defaults_dict.get('page_store_dir_def')
+        self.pages_path = os.path.join(self.store_dir, self.key + '.pages')
+        self.index_path = os.path.join(self.store_dir, self.key + '.json')
+        self.index = self.read_index()
+        self.written = 0    # bytes of pages stored since last size check
+
+        # mark document as recently used, for LRU eviction
+        if self.index['pages']:
+            try:
+                os.utime(self.index_path)
+            except OSError:
+                pass
+
+    def read_index(self):
+        """Reads the index of the document's pages.
+
+        Returns:
+            dict: `pages` ({'page no.@DPI': [offset, *shape]}) and
+                `auto_dpis` ({'page no.': DPI}). Empty if not stored.
+        """
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            index = {}
+        # pages are only valid if their pixels are in the store file
+        try:
+            file_size = os.path.getsize(self.pages_path)
+        except OSError:
+            file_size = 0
+        pages = {key: entry for key, entry in index.get('pages', {}).items()
+                 if entry[0] + int(np.prod(entry[1:])) <= file_size}
+        return ({'pages': pages, 'auto_dpis': index.get('auto_dpis', {})})
+
+    def write_index(self):
+        """Writes the index atomically (readers never see a partial index)."""
+        temp_path = '{}.{}.tmp'.format(self.index_path, os.getpid())
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.index, file)
+        os.replace(temp_path, self.index_path)
+
+    def get(self, page_no, dpi):
+        """Returns a reference to a stored page, or None if the page is not
+        stored at that DPI."""
+        entry = self.index['pages'].get('{}@{}'.format(page_no, dpi))
+        if entry is None:
+            return (None)
+        return (StoredPage(self.pages_path, entry[0], entry[1:]))
+
+    def auto_dpis(self, page_nos):
+        """Returns DPIs chosen by auto DPI for pages, or None if any of the
+        pages has none stored."""
+        dpis = [self.index['auto_dpis'].get(str(page_no)) for page_no in page_nos]
+        return (None if None in dpis else dpis)
+
+    def put_auto_dpis(self, page_nos, dpis):
+        """Stores DPIs chosen by auto DPI for pages."""
+        with self.locked():
+            self.index['auto_dpis'].update({str(page_no): dpi for page_no, dpi in zip(page_nos, dpis)})
+            self.write_index()
+
+    def put(self, page_nos, pages, dpi):
+        """Appends rendered pages to the store file and adds them to the index.
+
+        Args:
+            page_nos (list): numbers of the pages.
+            pages (list): the rendered pages as uint8 arrays.
+            dpi (int): DPI the pages were rendered at.
+
+        Returns:
+            list: `StoredPage` references of the pages.
+        """
+        stored = []
+        with self.locked() as file:
+            for page_no, page in zip(page_nos, pages):
+                page = np.ascontiguousarray(page, dtype=np.uint8)
+                offset = file.seek(0, os.SEEK_END)
+                file.write(page.data)
+                self.index['pages']['{}@{}'.format(page_no, dpi)] = [offset] + list(page.shape)
+                stored.append(StoredPage(self.pages_path, offset, page.shape))
+                self.written += page.nbytes
+            file.flush()
+            self.write_index()
+
+        # check store size after every 5% of size limit written
+        size_limit = defaults_dict.get('page_store_size_def') * 1024 * 1024
+        if self.written > size_limit // 20:
+            self.written = 0
+            evict_store(size_limit, keep=self.key)
+        return (stored)
+
+    @contextmanager
+    def locked(self):
+        """Opens the store file for appending with an exclusive lock, so
+        concurrent runs do not interleave pages. The index is re-read once
+        locked, to keep pages stored by other runs.
+
+        Yields:
+            file: the store file.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(self.pages_path, 'ab') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                index = self.read_index()
+                index['pages'].update(self.index['pages'])
+                index['auto_dpis'].update(self.index['auto_dpis'])
+                self.index = index
+                yield file
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def evict_store(size_limit, keep=None):
+    """Removes least recently used documents until store size is below 90%
+    of `size_limit`.
+
+    Documents removed meanwhile by other processes evicting at the same
+    time are skipped.
+
+    Args:
+        size_limit (int): store size limit in bytes.
+        keep (str): key of a document not to remove (the one in use).
+    """
+    documents = []  # (last used time, size, key) of each stored document
+    total_size = 0
+    store_dir = defaults_dict.get('page_store_dir_def')
+    try:
+        entries = list(os.scandir(store_dir))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.name.endswith('.pages'):
+            continue
+        key = entry.name[:-len('.pages')]
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            continue
+        try:
+            used = os.stat(os.path.join(store_dir, key + '.json')).st_mtime
+        except OSError:
+            used = 0
+        documents.append((used, size, key))
+        total_size += size
+
+    if total_size <= size_limit:
+        return
+
+    documents.sort()
+    for _, size, key in documents:
+        if total_size <= size_limit * 0.9:
+            break
+        if key == keep:
+            continue
+        # (either file may be removed by another process meanwhile)
+        for extension in ('.json', '.pages'):
+            try:
+                os.remove(os.path.join(store_dir, key + extension))
+            except OSError:
+                pass
+        total_size -= size
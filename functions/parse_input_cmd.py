@@ -18,6 +18,30 @@ class ArgumentParser(argparse.ArgumentParser):
             raise(Exception(message))
 
 
+def add_input_type_prefix(line):
+    """Adds `image` or `pdf` prefix to an ocr command line not starting with
+    one, depending on the extension of the first input file.
+
+    Args:
+        line (str): command line user input
+
+    Returns:
+        str: the command line, prefixed with input type if it was found.
+    """
+    if line and split(line)[0] not in ['image', 'pdf']:
+        file_ext = ''
+        for i in split(line):
+            if not i.startswith('-'):
+                file_ext = i.split('.')[-1]
+                break
+        if (file_ext in defaults_dict.get('image_extensions')):
+            line = 'image ' + line
+        elif (file_ext == 'pdf'):
+            line = 'pdf ' + line
+
+    return (line)
+
+
 def parse_ocr_cmd(line):
     """Parses user input from command line for ocr commands (`image` and `pdf`) and creates a keyword dictionary.
     
@@ -44,6 +68,20 @@ def parse_ocr_cmd(line):
 
     parser.add_argument('-s', '--source-directory', dest='input_directory', nargs=1, required=False, metavar='input_directory')
 
+    parser.add_argument('-r', '--recursive', action='store_true', help='also OCR files in sub directories of input directory')
+
+    parser.add_argument('--include', dest='include', nargs='+', required=False, metavar='include', help='OCR only files of input directory matching a glob pattern')
+
+    parser.add_argument('--exclude', dest='exclude', nargs='+', required=False, metavar='exclude', help='skip files and sub directories of input directory matching a glob pattern')
+
+    parser.add_argument('--min-size', dest='min_size', type=int, required=False, nargs=1, metavar='min_size', help='skip files of input directory smaller than min_size KB')
+
+    parser.add_argument('--max-size', dest='max_size', type=int, required=False, nargs=1, metavar='max_size', help='skip files of input directory larger than max_size KB')
+
+    parser.add_argument('--newer', dest='newer', required=False, nargs=1, metavar='newer', help='OCR only files of input directory modified after a date (YYYY-MM-DD[THH:MM])')
+
+    parser.add_argument('--older', dest='older', required=False, nargs=1, metavar='older', help='OCR only files of input directory modified before a date (YYYY-MM-DD[THH:MM])')
+
     parser.add_argument('output_file', nargs='?')
     parser.add_argument('-o', '--output-file', dest='output_file', nargs=1, required=False, metavar='outptut_file')
 
@@ -57,6 +95,38 @@ def parse_ocr_cmd(line):
 
     parser.add_argument('-c', '--confidence', dest='display_confidence', action='store_true', help='display average OCR confidence level')
 
+    parser.add_argument('--segment-pages', dest='segment_pages', type=int, required=False, nargs=1, metavar='segment_pages', help='spill joined docx output to disk every segment_pages pages')
+
+    parser.add_argument('--resume', action='store_true', help='continue a failed run from its job journal')
+
+    parser.add_argument('--watch', action='store_true', help='keep OCR\'ing files added to input directory until stopped')
+
+    parser.add_argument('--profile', action='store_true', help='display time taken by each stage of OCR')
+
+    parser.add_argument('--profile-output', dest='profile_output', required=False, nargs=1, metavar='profile_output', help='write profile to a json file')
+
+    parser.add_argument('--profile-format', dest='profile_format', choices=['json', 'trace'], required=False, nargs=1, metavar='profile_format', help="format of profile output: 'json' or 'trace' (Chrome trace format)")
+
+    parser.add_argument('--pipeline', dest='pipeline', action='store_const', const=True, default=None, help='overlap rendering, preprocessing, OCR and writing of pages')
+
+    parser.add_argument('--crop', dest='crop', action='store_const', const=True, default=None, help='OCR only text regions of pages')
+
+    parser.add_argument('--page-store', dest='page_store', action='store_const', const=True, default=None, help='read rendered pdf pages from (and store them in) page store')
+
+    parser.add_argument('--no-page-store', dest='page_store', action='store_const', const=False, help='do not use page store')
+
+    parser.add_argument('--cache', dest='cache', action='store_const', const=True, default=None, help='use cached OCR results')
+
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=False, help='do not use cached OCR results')
+
+    parser.add_argument('--force-ocr', dest='force_ocr', action='store_true', help='OCR pdf pages even if they have a text layer')
+
+    parser.add_argument('-p', '--preprocess', dest='preprocess', required=False, nargs=1, metavar='preprocess', help='preprocessing preset, or comma separated preprocessing stages')
+
+    parser.add_argument('--dpi', dest='dpi', required=False, nargs=1, metavar='dpi', help="pdf rendering DPI, or 'auto' to choose it for each page")
+
+    parser.add_argument('-J', '--jobs', dest='jobs', type=int, required=False, nargs=1, metavar='jobs', help='no. of pages to OCR in parallel')
+
     # TODO - add arguments for additional tesseract options and output formatting
 
     try:
@@ -86,6 +156,8 @@ def parse_default_cmd(line):
         add_help=False  # so that -h flag doesn't display argparse help
         )
 
+    parser.add_argument('-rs', '--reset', action='store_true', help='reset all defaults to built-in values')
+
     parser.add_argument('-ii', '--in-dir-image', dest='input_directory_img', required=False, nargs=1, metavar='input_dir_default_img', help='Set default input directory for images')
 
     parser.add_argument('-ip', '--in-dir-pdf', dest='input_directory_pdf', required=False, nargs=1, metavar='input_dir_default_pdf', help='Set default input directory for pdfs')
@@ -94,6 +166,24 @@ def parse_default_cmd(line):
 
     parser.add_argument('-m', '--output-mode', dest='output_mode', choices=defaults_dict.get('output_modes'), required=False, nargs=1, metavar='output_mode_default', help='Set default output mode (file type)')
 
+    parser.add_argument('-pp', '--preprocess', dest='preprocess', required=False, nargs=1, metavar='preprocess_default', help='Set default preprocessing preset or stages')
+
+    parser.add_argument('-dp', '--dpi', dest='dpi', required=False, nargs=1, metavar='dpi_default', help="Set default pdf rendering DPI, or 'auto'")
+
+    parser.add_argument('-pc', '--pdf-chunk', dest='pdf_chunk_size', required=False, type=int, nargs=1, metavar='pdf_chunk_size_default', help='Set default no. of pdf pages rendered at a time')
+
+    parser.add_argument('-ca', '--cache', dest='cache', required=False, nargs=1, choices=['on', 'off'], metavar='cache_default', help='Set default use of OCR results cache')
+
+    parser.add_argument('-pl', '--pipeline', dest='pipeline', required=False, nargs=1, choices=['on', 'off'], metavar='pipeline_default', help='Set default use of staged page pipeline')
+
+    parser.add_argument('-cr', '--crop', dest='crop', required=False, nargs=1, choices=['on', 'off'], metavar='crop_default', help='Set default cropping of pages to text regions')
+
+    parser.add_argument('-ps', '--page-store', dest='page_store', required=False, nargs=1, choices=['on', 'off'], metavar='page_store_default', help='Set default use of rendered pdf page store')
+
+    parser.add_argument('-ss', '--store-size', dest='page_store_size', required=False, type=int, nargs=1, metavar='page_store_size_default', help='Set rendered pdf page store size limit in MB')
+
+    parser.add_argument('-cs', '--cache-size', dest='cache_size', required=False, type=int, nargs=1, metavar='cache_size_default', help='Set OCR results cache size limit in MB')
+
     parser.add_argument('-td', '--training-dir', dest='training_dir', required=False, nargs=1, metavar='training_dir_default', help='Set default tesseract training data directory')
 
     parser.add_argument('-tl', '--lang', dest='lang', required=False, nargs=1, choices=['amh', 'eng', 'tir'], metavar='language_default', help='Set default tesseract OCR language')
@@ -102,6 +192,10 @@ def parse_default_cmd(line):
 
     parser.add_argument('-to', '--oem', dest='oem', required=False, nargs=1, type=int, choices=list(range(4)), metavar='oem_default', help='Set default tesseract OCR engine mode')
 
+    parser.add_argument('-tj', '--jobs', dest='jobs', required=False, nargs=1, type=int, metavar='jobs_default', help='Set default no. of pages to OCR in parallel')
+
+    parser.add_argument('-te', '--engine', dest='engine', required=False, nargs=1, choices=['auto', 'tesserocr', 'subprocess'], metavar='engine_default', help='Set default OCR engine')
+
     parser.add_argument('-fp', '--font-path', dest='font_path', required=False, nargs=1, metavar='font_path_default', help='Set default font path, to be used for writing output to pdf')
 
     parser.add_argument('-fn', '--font-name', dest='font_name', required=False, nargs=1, metavar='font_name_default', help='Set default font name, to be used for writing output to pdf and MS word')
@@ -110,6 +204,10 @@ def parse_default_cmd(line):
 
     parser.add_argument('-h', '--height', dest='height', required=False, type=int, nargs=1, metavar='line_height_default', help='Set default line height for writing output to pdf')
 
+    parser.add_argument('-sp', '--segment-pages', dest='segment_pages', required=False, type=int, nargs=1, metavar='segment_pages_default', help='Set default no. of pages per segment spilled to disk for joined docx outputs')
+
+    parser.add_argument('-bs', '--buffer-size', dest='buffer_size', required=False, type=int, nargs=1, metavar='buffer_size_default', help='Set default no. of bytes buffered before writing output to txt')
+
     # TODO - add arguments for additional tesseract options and output formatting
 
     try:
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Module containing a staged page pipeline, which overlaps rendering,
+preprocessing, OCR and writing of pages.
+
+Stages run concurrently in an asyncio event loop on a background thread
+and are connected by bounded queues:
+
+    rasterize -> preprocess -> recognize -> write
+
+Blocking work of each stage (poppler rendering, OpenCV, tesseract) runs in
+executor threads, or in the worker processes for recognition if more than
+one job is requested. The write stage is the consumer of the pipeline, in
+the calling thread.
+
+Without worker processes, tesseract is called from two threads: the
+recognition thread, and the preprocessing thread if the `orient` stage is
+used. The `orient` stage has an OSD engine of its own (`get_osd_engine`),
+so the recognition thread's engine is not shared (each tesserocr engine
+also takes a lock around its API handle).
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from .journal import PageError, retried
+from .ocr_pages import recognize_page
+from .process_image import process_image
+from .profiler import merge_events, page_label, profile_enabled, profiled_call
+from . import defaults_dict, tesseract_dict
+
+# marks the end of pages in a queue
+_DONE = object()
+
+
+class PipelineStopped(Exception):
+    """Raised in the pipeline when its consumer stopped reading results."""
+
+
+class PagePipeline:
+    """
+    Iterable of OCR results of pages, produced by a staged pipeline.
+
+    Results are yielded in page order, as (text, confidence summary) tuples
+    same as `ocr_pages` (None and a PageError for a page that failed to
+    render, preprocess or OCR). At most `pipeline_depth` items wait in each
+    queue between stages, so rendered pages are not all held in memory.
+    """
+
+    def __init__(self, pages, options, executor=None, **args):
+        """Sets up the pipeline. Stages start when iteration starts.
+
+        Args:
+            pages (iterable): image file paths or rendered pdf pages.
+            options (str): tesseract config string.
+            executor (ProcessPoolExecutor): pool of worker processes for
+                recognition, or None to recognize in a background thread.
+            **args (dict): dictionary of params from user input for ocr command,
+                and `pdf_pages` (see `page_label`) labeling pdf pages.
+        """
+        self.pages = pages
+        self.options = options
+        self.executor = executor
+        # labels pages, not passed on with params of each page
+        self.pdf_pages = args.pop('pdf_pages', None)
+        self.args = args
+        self.verbose = args.get('verbose')
+        self.depth = args.get('pipeline_depth') or defaults_dict.get('pipeline_depth_def')
+        self.output = queue.Queue(maxsize=self.depth)   # recognize -> write (consumer)
+        self.queues = {}        # asyncio queues between stages, by name of receiving stage
+        self.stop = threading.Event()
+
+    def __iter__(self):
+        """Runs pipeline stages in a background thread and yields results."""
+        thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = self.output.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                if self.verbose:
+                    self.display_depths()
+                yield item
+        finally:
+            # stop stages if consumer stopped early (error or closed generator)
+            self.stop.set()
+            thread.join()
+
+    def display_depths(self):
+        """Prints no. of items waiting in each stage's input queue."""
+        depths = ['{} {}'.format(name, q.qsize()) for name, q in self.queues.items()]
+        depths.append('write {}'.format(self.output.qsize()))
+        print('Pipeline queue depths: {}'.format(', '.join(depths)))
+
+    def put_output(self, item):
+        """Puts an item in output queue, waiting while it is full.
+
+        Returns:
+            bool: False if the consumer stopped before item could be put.
+        """
+        while not self.stop.is_set():
+            try:
+                self.output.put(item, timeout=0.1)
+                return (True)
+            except queue.Full:
+                continue
+        return (False)
+
+    async def run(self):
+        """Runs all stages until all pages are written, a stage fails or
+        the consumer stops."""
+        loop = asyncio.get_running_loop()
+        args = self.args
+        # stages of each page are called through `profiled_call`, so their
+        # timers record events for the page in executor threads and processes
+        profile = profile_enabled()
+
+        # one thread each for rendering, preprocessing and output handover
+        stage_threads = ThreadPoolExecutor(max_workers=3)
+        # recognition in worker processes, else in a single background thread
+        # (the `orient` stage uses an engine of its own, see module docstring)
+        recognize_threads = None if self.executor else ThreadPoolExecutor(max_workers=1)
+        recognize_executor = self.executor or recognize_threads
+
+        raw_pages = asyncio.Queue(self.depth)           # rasterize -> preprocess
+        processed_pages = asyncio.Queue(self.depth)     # preprocess -> recognize
+        # recognize -> write (in page order). Deep enough to keep all workers busy
+        jobs = args.get('jobs') or tesseract_dict.get('jobs_def')
+        recognitions = asyncio.Queue(max(self.depth, 2 * jobs))
+        self.queues = {'preprocess': raw_pages, 'recognize': processed_pages, 'collect': recognitions}
+
+        async def rasterize():
+            pages = iter(self.pages)
+            while True:
+                # pdf pages are rendered lazily when the pages iterator advances
+                page = await loop.run_in_executor(stage_threads, next, pages, _DONE)
+                await raw_pages.put(page)
+                if page is _DONE:
+                    return
+
+        async def preprocess():
+            index = 0
+            while True:
+                page = await raw_pages.get()
+                if page is _DONE:
+                    await processed_pages.put(_DONE)
+                    return
+                label = page_label(page, index, self.pdf_pages)
+                # a page that failed to render is passed on as its PageError
+                processed_image = page if isinstance(page, PageError) else merge_events(
+                    *await loop.run_in_executor(stage_threads, partial(
+                        profiled_call, profile, label, retried, process_image, page, page_label=label, **args)))
+                await processed_pages.put((label, processed_image))
+                index += 1
+
+        async def recognize():
+            while True:
+                item = await processed_pages.get()
+                if item is _DONE:
+                    await recognitions.put(_DONE)
+                    return
+                label, processed_image = item
+                if isinstance(processed_image, PageError):
+                    failed = loop.create_future()
+                    failed.set_result((processed_image, []))
+                    await recognitions.put(failed)
+                    continue
+                # queue running recognition in page order, without waiting for it
+                await recognitions.put(loop.run_in_executor(recognize_executor, partial(
+                    profiled_call, profile, label, retried, recognize_page, processed_image, self.options,
+                    page_label=label, **args)))
+
+        async def collect():
+            while True:
+                recognition = await recognitions.get()
+                if recognition is _DONE:
+                    break
+                result = merge_events(*await recognition)
+                if isinstance(result, PageError):
+                    result = (None, result)
+                if not await loop.run_in_executor(stage_threads, self.put_output, result):
+                    raise PipelineStopped()
+            await loop.run_in_executor(stage_threads, self.put_output, _DONE)
+
+        tasks = [asyncio.ensure_future(stage()) for stage in (rasterize, preprocess, recognize, collect)]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                error = task.exception()
+                if error and not isinstance(error, PipelineStopped):
+                    await loop.run_in_executor(stage_threads, self.put_output, error)
+                    break
+        finally:
+            stage_threads.shutdown(wait=False)
+            if recognize_threads:
+                recognize_threads.shutdown(wait=True)
@@ -1,74 +1,106 @@
 #!/usr/bin/env python3
+"""
+Module containing image preprocessing done before OCR.
+
+Preprocessing is a pipeline of stages run on NumPy arrays in memory. Each
+stage is a function taking an image (and the job's params) and returning
+the processed image. Stages of a job are selected by its `preprocess`
+param: a preset name from `PREPROCESS_PRESETS`, or a comma separated list
+of stage names from `PREPROCESS_STAGES` (e.g. 'gray,deskew,otsu'). Each
+stage is timed under its name when profiling.
+
+The `orient` stage finds pages turned by 90 or 180 degrees as well as
+skewed ones, and corrects both with a single rotation of the page. Quarter
+turns and skew are found from ink profiles, and upside down pages with one
+tesseract orientation detection (OSD) call per page.
+
+`text_regions` finds blocks of text on a processed page, so margins,
+specks and pictures can be cropped away before OCR.
+"""
 import cv2
 import numpy as np
-import tempfile
-from PIL import Image
+from itertools import combinations
+from . import defaults_dict
+from .page_store import StoredPage
+from .profiler import timer
+from .tesseract_engine import get_osd_engine
 
+# min. width of images scaled up by `resize` stage
+IMAGE_SIZE = 1800
+BINARY_THREHOLD = 180
 
-def process_image_simple(input_file, **args):
-    """Performs image preprocessing before passing image to tesseract.
-    
-    Args:
-        input_file: a string path of image file to be processed for
-            image input files, or image as a bytes array for pdf input files.
-        **args (dict): dictionary of parameters
+# max. skew angle (in degrees) corrected by `deskew` stage, and width of
+# the downsampled copy skew is estimated on
+MAX_SKEW = 15
+SKEW_SAMPLE_WIDTH = 800
 
-    Returns:
-        MatLike: the processed image as a MatLike Object of OpenCV2.
-    
-    """
-    
-    input_file_type = args.get('input_file_type')
+# max. no. of ink pixels projected for each candidate skew angle
+SKEW_SAMPLE_PIXELS = 30000
+
+# a page is taken as turned sideways if its column profile is sharper than
+# its row profile by this factor
+SIDEWAYS_RATIO = 1.1
 
-    # TODO - check if loading images using buffer improves efficency
-    # load image based on input file type
-    if input_file_type == 'image':
-        image = cv2.imread(input_file)
-    elif input_file_type == 'pdf':
-        image = cv2.imdecode(np.frombuffer(input_file.read(), np.uint8), 1)
+# min. confidence of tesseract's orientation detection to turn a page
+ORIENT_MIN_CONF = 2.0
 
-    # cv2.imshow("orginal", image)
-    # cv2.waitKey(0)
+# cv2.rotate codes of counterclockwise quarter turns
+QUARTER_TURNS = {
+    90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_CLOCKWISE,
+}
 
-    # convert image to grayscale (black & white)
-    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    # cv2.imwrite("temp/gray.jpg", gray_image)
 
-    thresh, im_bw = cv2.threshold(gray_image, 210, 230, cv2.THRESH_BINARY)
-    # cv2.imwrite("temp/bw_image.jpg", im_bw)
+def to_grayscale(image, **args):
+    """Converts a BGR image to grayscale (black & white)."""
+    return (cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image)
 
-    # TODO Check if adding smoothening and border validation here increase accuracy
 
+def resize(image, **args):
+    """Scales up an image by an integer factor so its width is at least
+    `IMAGE_SIZE` pixels."""
+    factor = max(1, int(IMAGE_SIZE / image.shape[1]))
+    if factor == 1:
+        return (image)
+    return (cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC))
+
+
+def fixed_threshold(image, **args):
+    """Binarizes an image with a fixed threshold."""
+    thresh, im_bw = cv2.threshold(image, 210, 230, cv2.THRESH_BINARY)
     return (im_bw)
 
 
-# TODO - set image size and treshold dynamically based on user input
-IMAGE_SIZE = 1800
-BINARY_THREHOLD = 180
+def otsu_threshold(image, **args):
+    """Binarizes an image with a threshold chosen by Otsu's method."""
+    thresh, im_bw = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return (im_bw)
+
+
+def adaptive_threshold(image, **args):
+    """Binarizes an image with a threshold computed for each pixel from
+    the mean of its neighbourhood, for unevenly lit scans."""
+    return (cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 41, 3))
 
-def set_image_dpi(file_path):
-    im = Image.open(file_path)
-    length_x, width_y = im.size
-    factor = max(1, int(IMAGE_SIZE / length_x))
-    size = factor * length_x, factor * width_y
-    # size = (1800, 1800)
-    im_resized = im.resize(size, Image.LANCZOS)
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-    temp_filename = temp_file.name
-    im_resized.save(temp_filename, dpi=(300, 300))
-    return temp_filename
-
-def image_smoothening(img):
+
+def denoise(image, **args):
+    """Removes salt and pepper noise with a 3x3 median filter."""
+    return (cv2.medianBlur(image, 3))
+
+
+def image_smoothening(img, **args):
     ret1, th1 = cv2.threshold(img, BINARY_THREHOLD, 255, cv2.THRESH_BINARY)
     ret2, th2 = cv2.threshold(th1, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     blur = cv2.GaussianBlur(th2, (1, 1), 0)
     ret3, th3 = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return th3
 
-def remove_noise_and_smooth(file_name):
-    img = cv2.imread(file_name, 0)
-    filtered = cv2.adaptiveThreshold(img.astype(np.uint8), 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 41,
-                                     3)
+
+def remove_noise_and_smooth(img, **args):
+    """Combines an adaptive threshold of an image with its smoothened
+    binarization."""
+    filtered = adaptive_threshold(img)
     kernel = np.ones((1, 1), np.uint8)
     opening = cv2.morphologyEx(filtered, cv2.MORPH_OPEN, kernel)
     closing = cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel)
@@ -76,8 +108,358 @@ def remove_noise_and_smooth(file_name):
     or_image = cv2.bitwise_or(img, closing)
     return or_image
 
-def process_image_detailed(file_path):
-    # TODO : Implement using opencv and check inputs for helper funcs
-    temp_filename = set_image_dpi(file_path)
-    im_new = remove_noise_and_smooth(temp_filename)
-    return im_new
+
+def ink_sample(image):
+    """Returns a binarized copy of a page downsampled to at most
+    `SKEW_SAMPLE_WIDTH` pixels wide, with ink (dark) pixels set."""
+    scale = min(1.0, SKEW_SAMPLE_WIDTH / image.shape[1])
+    sample = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+    thresh, ink = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return (ink)
+
+
+def ink_pixels(ink):
+    """Returns row and column coordinates of (at most `SKEW_SAMPLE_PIXELS`)
+    ink pixels of a binarized sample, or None if it has too little ink."""
+    ys, xs = np.nonzero(ink)
+    if ys.size < 100:
+        return (None)
+    step = -(-ys.size // SKEW_SAMPLE_PIXELS)     # ceil division
+    return (ys[::step], xs[::step])
+
+
+def profile_skew(ys, xs):
+    """Finds the skew angle whose row projection profile of ink pixels is
+    sharpest.
+
+    Ink pixels are projected on rows for each candidate angle at once, and
+    the angle with highest sum of squared row counts (as lines fall on
+    fewest rows) is chosen: first in 1 degree steps, then in 0.1 degree
+    steps around it.
+
+    Args:
+        ys (ndarray): row coordinates of ink pixels.
+        xs (ndarray): column coordinates of ink pixels.
+
+    Returns:
+        tuple: skew in degrees (positive if lines descend to the right) and
+            sharpness score of its profile.
+    """
+    def best_angle(angles):
+        # row of each ink pixel when lines of each angle are made horizontal
+        slopes = np.tan(np.radians(angles))[:, None]
+        rows = np.rint(ys[None, :] - xs[None, :] * slopes).astype(np.int64)
+        rows -= rows.min()
+        height = rows.max() + 1
+        # histogram of rows for all angles in one bincount
+        counts = np.bincount((rows + np.arange(len(angles))[:, None] * height).ravel(),
+                             minlength=len(angles) * height).reshape(len(angles), height)
+        scores = (counts.astype(np.float64) ** 2).sum(axis=1)
+        best = int(np.argmax(scores))
+        return (angles[best], scores[best])
+
+    coarse, score = best_angle(np.arange(-MAX_SKEW, MAX_SKEW + 1, 1.0))
+    angle, score = best_angle(np.arange(coarse - 1, coarse + 1.05, 0.1))
+    # (adding 0.0 turns a rounded -0.0 into 0.0)
+    return (round(float(angle), 1) + 0.0, float(score))
+
+
+def estimate_skew(image):
+    """Estimates skew angle of text lines with a projection profile of a
+    downsampled copy of a page.
+
+    Args:
+        image (ndarray): a grayscale page.
+
+    Returns:
+        float: skew in degrees (positive if lines descend to the right).
+    """
+    pixels = ink_pixels(ink_sample(image))
+    return (profile_skew(*pixels)[0] if pixels else 0.0)
+
+
+def turn(image, quarter_turn):
+    """Turns an image counterclockwise by a multiple of 90 degrees (no
+    resampling)."""
+    return (cv2.rotate(image, QUARTER_TURNS[quarter_turn]) if quarter_turn else image)
+
+
+def estimate_sideways(image):
+    """Checks if text lines of a page run vertically, and estimates their
+    skew, by comparing sharpness of row profiles of a downsampled copy of
+    the page as is and turned by 90 degrees.
+
+    Args:
+        image (ndarray): a grayscale page.
+
+    Returns:
+        tuple: quarter turn (0 or 90 degrees) making lines horizontal, and
+            skew in degrees of the page after that turn.
+    """
+    ink = ink_sample(image)
+    upright, sideways = ink_pixels(ink), ink_pixels(turn(ink, 90))
+    if not upright:
+        return (0, 0.0)
+    skew, score = profile_skew(*upright)
+    sideways_skew, sideways_score = profile_skew(*sideways)
+    if sideways_score > SIDEWAYS_RATIO * score:
+        return (90, sideways_skew)
+    return (0, skew)
+
+
+def is_upside_down(image, **args):
+    """Checks if a page with horizontal text lines is upside down, with a
+    single orientation detection (OSD) call of tesseract.
+
+    Args:
+        image (ndarray): a grayscale page with horizontal text lines.
+        **args (dict): dictionary of params from user input for ocr command,
+            for the OSD engine.
+
+    Returns:
+        bool: True if tesseract is confident the page is turned by 180
+            degrees (False for blank pages, or if OSD is not available).
+    """
+    if ink_pixels(ink_sample(image)) is None:
+        return (False)
+    engine = get_osd_engine(**args)
+    osd = engine.image_to_osd(image) if engine else None
+    if args.get('verbose') and osd is None:
+        print('Orientation of {} not detected by tesseract'.format(args.get('page_label') or 'page'))
+    return (bool(osd) and osd['rotate'] == 180 and osd['orientation_conf'] >= ORIENT_MIN_CONF)
+
+
+def rotate(image, angle):
+    """Rotates an image counterclockwise by angle (in degrees) about its
+    center, filling uncovered corners with white."""
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return (cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                           borderMode=cv2.BORDER_CONSTANT, borderValue=255))
+
+
+def deskew(image, **args):
+    """Rotates an image so its text lines are horizontal."""
+    angle = estimate_skew(image)
+    if args.get('verbose'):
+        print('Skew of {}: {} degrees'.format(args.get('page_label') or 'page', angle))
+    if abs(angle) < 0.1:
+        return (image)
+    return (rotate(image, angle))
+
+
+def orient(image, **args):
+    """Turns an image upright (correcting pages turned by 90, 180 or 270
+    degrees) and rotates it so its text lines are horizontal.
+
+    Quarter turns are exact (no resampling), so the page is resampled at
+    most once, for the skew.
+    """
+    quarter_turn, angle = estimate_sideways(image)
+    image = turn(image, quarter_turn)
+    if abs(angle) >= 0.1:
+        image = rotate(image, angle)
+    if is_upside_down(image, **args):
+        quarter_turn = (quarter_turn + 180) % 360
+        image = turn(image, 180)
+    if args.get('verbose'):
+        print('Orientation of {}: turned {} degrees, skew {} degrees'
+              .format(args.get('page_label') or 'page', quarter_turn, angle))
+    return (image)
+
+
+# preprocessing stages by name
+PREPROCESS_STAGES = {
+    'gray': to_grayscale,
+    'resize': resize,
+    'threshold': fixed_threshold,
+    'otsu': otsu_threshold,
+    'adaptive': adaptive_threshold,
+    'denoise': denoise,
+    'smooth': remove_noise_and_smooth,
+    'deskew': deskew,
+    'orient': orient,
+}
+
+# named pipelines of preprocessing stages
+PREPROCESS_PRESETS = {
+    'simple': ['gray', 'threshold'],
+    'otsu': ['gray', 'otsu'],
+    'adaptive': ['gray', 'adaptive'],
+    'clean': ['gray', 'deskew', 'denoise', 'otsu'],
+    'scan': ['gray', 'orient', 'denoise', 'otsu'],
+    'detailed': ['gray', 'resize', 'smooth'],
+}
+
+
+def preprocess_stages(preprocess):
+    """Resolves a `preprocess` param into a list of stage names.
+
+    Args:
+        preprocess (str): a preset name, or comma separated stage names.
+
+    Returns:
+        list: names of stages, or None if a stage name is not known.
+    """
+    if preprocess in PREPROCESS_PRESETS:
+        return (PREPROCESS_PRESETS[preprocess])
+    stages = [stage.strip() for stage in preprocess.split(',') if stage.strip()]
+    if not stages or any(stage not in PREPROCESS_STAGES for stage in stages):
+        return (None)
+    # stages work on grayscale images
+    return (stages if stages[0] == 'gray' else ['gray'] + stages)
+
+
+def process_image(input_file, **args):
+    """Performs image preprocessing before passing image to tesseract.
+
+    Args:
+        input_file: a string path of image file to be processed for
+            image input files, or image as a NumPy array (grayscale or BGR)
+            or a `StoredPage` reference to it in the page store for pdf
+            input files.
+        **args (dict): dictionary of parameters. `preprocess` selects the
+            preprocessing stages (default from `preprocess_def`).
+
+    Returns:
+        ndarray: the processed (grayscale) image.
+    """
+    # load image from path, or use already decoded pixels (rendered pdf pages)
+    if isinstance(input_file, np.ndarray):
+        image = input_file
+    elif isinstance(input_file, StoredPage):
+        with timer('page store read'):
+            image = input_file.load()
+    else:
+        with timer('image decode'):
+            image = cv2.imread(input_file)
+
+    preprocess = args.get('preprocess') or defaults_dict.get('preprocess_def')
+    for stage in preprocess_stages(preprocess):
+        with timer(stage):
+            image = PREPROCESS_STAGES[stage](image, **args)
+
+    return (image)
+
+
+def process_image_simple(input_file, **args):
+    """Performs preprocessing of the 'simple' preset (grayscale and fixed
+    threshold) on an image."""
+    return (process_image(input_file, **dict(args, preprocess='simple')))
+
+
+# min. no. of glyph sized components to estimate glyph height from
+MIN_GLYPHS = 20
+
+def glyph_height(image):
+    """Estimates height of glyphs on a page, as the median height of
+    connected components of dark pixels that are glyph sized.
+
+    Args:
+        image (ndarray): a grayscale page.
+
+    Returns:
+        float: glyph height in pixels, or None if the page has too few glyphs.
+    """
+    # dark glyphs on light background become foreground components
+    thresh, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return (ink_glyph_height(binary))
+
+
+def ink_glyph_height(ink):
+    """Estimates glyph height (as `glyph_height`) on a binarized page with
+    ink pixels set."""
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+
+    # ignore specks, and lines, rules and pictures (much wider or taller than a glyph)
+    glyphs = (heights >= 3) & (heights <= ink.shape[0] // 10) & (widths <= 3 * heights)
+    if np.count_nonzero(glyphs) < MIN_GLYPHS:
+        return (None)
+    return (float(np.median(heights[glyphs])))
+
+
+# min. fraction of ink pixels in a text block (emptier blocks are specks
+# spread by dilation), and max. fraction of a page text blocks may cover
+# for the page to be cropped to them
+MIN_REGION_DENSITY = 0.05
+MAX_REGION_COVERAGE = 0.9
+
+
+def merge_boxes(boxes):
+    """Merges overlapping boxes (left, top, right, bottom) until no two
+    boxes overlap."""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i, j in combinations(range(len(boxes)), 2):
+            a, b = boxes[i], boxes[j]
+            if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                del boxes[j]
+                merged = True
+                break
+    return (boxes)
+
+
+def reading_order(boxes):
+    """Sorts boxes in reading order: rows of vertically overlapping boxes
+    from top to bottom, and boxes of a row (e.g. columns) left to right."""
+    rows = []   # [bottom of row, boxes of row]
+    for box in sorted(boxes, key=lambda box: box[1]):
+        if rows and box[1] < rows[-1][0]:
+            rows[-1][0] = max(rows[-1][0], box[3])
+            rows[-1][1].append(box)
+        else:
+            rows.append([box[3], [box]])
+    return ([box for bottom, row in rows for box in sorted(row)])
+
+
+def text_regions(image):
+    """Finds blocks of text on a page.
+
+    Ink of a downsampled copy of the page is dilated by twice the glyph
+    height, so glyphs, words and lines of a block join into one connected
+    component, while blocks separated by wider gaps (columns, margins)
+    stay apart. Components with too little ink or lower than two glyphs
+    (specks, rules) are dropped, and overlapping ones merged.
+
+    Args:
+        image (ndarray): a grayscale (processed) page.
+
+    Returns:
+        list: boxes (left, top, right, bottom) of text blocks in pixels of
+            the page, in reading order. None if no blocks are found, or
+            they cover most of the page (so cropping would not help).
+    """
+    ink = ink_sample(image)
+    height = ink_glyph_height(ink)
+    if height is None:
+        return (None)
+
+    size = 2 * int(height) + 1
+    blocks = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_RECT, (size, size)))
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(blocks, connectivity=8)
+    boxes = []
+    for left, top, width, block_height, area in stats[1:]:
+        if block_height < 2 * height:
+            continue
+        if np.count_nonzero(ink[top:top + block_height, left:left + width]) < \
+                MIN_REGION_DENSITY * width * block_height:
+            continue
+        boxes.append((left, top, left + width, top + block_height))
+    boxes = merge_boxes(boxes)
+
+    covered = sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+    if not boxes or covered > MAX_REGION_COVERAGE * ink.size:
+        return (None)
+
+    # boxes in pixels of the page
+    scale = image.shape[1] / ink.shape[1]
+    boxes = [(int(left * scale), int(top * scale),
+              min(image.shape[1], int(np.ceil(right * scale))), min(image.shape[0], int(np.ceil(bottom * scale))))
+             for left, top, right, bottom in boxes]
+    return (reading_order(boxes))
+
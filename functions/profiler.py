@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Module containing timers for profiling the stages of OCR'ing a page.
+
+When profiling is on, each timed stage (pdf render, image decode,
+threshold, tesseract call, confidence pass, writer ...) records an event
+with its start time, duration, process, thread and the page it was done
+for. Timers are monotonic (`time.perf_counter`), which is system wide on
+Linux, so events recorded in worker processes can be merged with those of
+the main process.
+
+At the end of a job, events are summarized per page and per stage, and
+can be dumped as json or in Chrome trace format (chrome://tracing, Perfetto).
+
+Recorded events are kept per process, so one job at a time can be profiled
+in a process: a job started (e.g. in another thread) while another job is
+profiled is not profiled itself, and does not turn off or clear the
+profile of the other job. Stages of other jobs running in the process at
+the same time may still be recorded in the profile. Pages are labeled from
+their job's params (`pdf_pages`), so labels are per job.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+# percentiles of stage durations to report
+PERCENTILES = (50, 95)
+
+_enabled = False
+_owner = None                   # thread ident of the job being profiled
+_owner_lock = threading.Lock()
+_events = []                    # events recorded by the current process
+_started = None                 # start time of profiled job
+_local = threading.local()      # page label and event list of the current thread
+
+
+def profile_enabled():
+    """Returns True if profiling is on in the current process (or for the
+    `profiled_call` the current thread is in)."""
+    enabled = getattr(_local, 'enabled', None)
+    return (enabled if enabled is not None else _enabled)
+
+
+def profiling_job():
+    """Returns True if the job of the current thread is being profiled."""
+    return (_owner == threading.get_ident())
+
+
+def start_profile(**args):
+    """Turns profiling on for the job of the current thread, if `profile`
+    is set, and clears recorded events.
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+    """
+    global _enabled, _owner, _started
+    if not args.get('profile'):
+        return
+    with _owner_lock:
+        if _owner is not None and not profiling_job():
+            print('*** Profile Error: another job is being profiled in this process, not profiling this one')
+            return
+        _owner = threading.get_ident()
+    _enabled = True
+    _events.clear()
+    _started = perf_counter()
+
+
+def stop_profile():
+    """Turns profiling off, if the job of the current thread is profiled."""
+    global _enabled, _owner
+    with _owner_lock:
+        if profiling_job():
+            _enabled = False
+            _owner = None
+
+
+def page_label(page, index, pdf_pages=None):
+    """Returns a label for a page.
+
+    Args:
+        page: an image file path, or a rendered pdf page.
+        index (int): index of the page among pages being OCR'ed.
+        pdf_pages (tuple): path of the pdf file and numbers of its pages
+            OCR'ed, in order (the `pdf_pages` param of the job), or None
+            for images.
+
+    Returns:
+        str: the image file path, or the pdf file path and page no.
+    """
+    if isinstance(page, str):
+        return (page)
+    if not pdf_pages:
+        return ('page {}'.format(index + 1))
+    pdf_file_path, page_nos = pdf_pages
+    return (pdf_page_label(pdf_file_path, page_nos[index]))
+
+
+def pdf_page_label(pdf_file_path, page_no):
+    """Returns a label for a page of a pdf file."""
+    return ('{} page {}'.format(pdf_file_path, page_no))
+
+
+def set_page(label):
+    """Sets the page timers of the current thread record events for."""
+    _local.page = label
+
+
+def current_page():
+    """Returns the page timers of the current thread record events for."""
+    return (getattr(_local, 'page', None))
+
+
+@contextmanager
+def timer(stage, page=True):
+    """Times a stage of OCR'ing the current page of the thread.
+
+    Args:
+        stage (str): name of the stage.
+        page (bool): if False, the stage is not done for a single page
+            (like rendering a window of pdf pages) and is not recorded
+            for the current page.
+    """
+    if not profile_enabled():
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        end = perf_counter()
+        events = getattr(_local, 'events', None)
+        (events if events is not None else _events).append({
+            'stage': stage,
+            'page': getattr(_local, 'page', None) if page else None,
+            'start': start,
+            'duration': end - start,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            })
+
+
+def profiled_call(enabled, label, function, *fargs, **kwargs):
+    """Calls a function for a page, in a worker process or thread, and
+    returns the events its timers recorded.
+
+    Args:
+        enabled (bool): if profiling is on in the calling process.
+        label (str): label of the page.
+        function (function): the function to call with `fargs` and `kwargs`.
+
+    Returns:
+        tuple: return value of the function, and list of recorded events.
+    """
+    _local.enabled, _local.page, _local.events = enabled, label, []
+    try:
+        return (function(*fargs, **kwargs), _local.events)
+    finally:
+        _local.enabled = _local.page = _local.events = None
+
+
+def merge_events(result, events):
+    """Adds events recorded by a `profiled_call` to events of the current
+    process (or of the `profiled_call` the current thread is in), and
+    returns the return value of the called function."""
+    thread_events = getattr(_local, 'events', None)
+    (thread_events if thread_events is not None else _events).extend(events)
+    return (result)
+
+
+def summarize():
+    """Summarizes recorded events.
+
+    Returns:
+        dict: `wall_time` of the job, `stages` ({stage: {calls, total,
+            mean, p50, p95}} in seconds) and `pages` ({page: {stage:
+            seconds}}). Stages not done for a single page (like rendering
+            a window of pdf pages) are not included in `pages`.
+    """
+    durations = {}      # {stage: [duration]}
+    pages = {}          # {page: {stage: total duration}}
+    for event in _events:
+        durations.setdefault(event['stage'], []).append(event['duration'])
+        if event['page'] is not None:
+            page = pages.setdefault(event['page'], {})
+            page[event['stage']] = page.get(event['stage'], 0) + event['duration']
+
+    stages = {}
+    for stage, stage_durations in durations.items():
+        stage_durations.sort()
+        stages[stage] = {'calls': len(stage_durations),
+                         'total': sum(stage_durations),
+                         'mean': sum(stage_durations) / len(stage_durations)}
+        for p in PERCENTILES:
+            index = min(len(stage_durations) - 1, int(len(stage_durations) * p / 100))
+            stages[stage]['p{}'.format(p)] = stage_durations[index]
+
+    return ({'wall_time': perf_counter() - _started, 'stages': stages, 'pages': pages})
+
+
+def display_profile(summary):
+    """Prints per page and aggregate time of each stage.
+
+    Args:
+        summary (dict): summary of events returned by `summarize`.
+    """
+    print('\n================== Profile ==================\n')
+    for page, stages in summary['pages'].items():
+        times = ', '.join('{} {:.1f} ms'.format(stage, t * 1000) for stage, t in stages.items())
+        print('{}: {}'.format(page, times))
+
+    print('\n{:<16}{:>7}{:>11}{:>11}{:>11}{:>11}{:>8}'
+          .format('stage', 'calls', 'total s', 'mean ms', 'p50 ms', 'p95 ms', 'share'))
+    # share of stage time in wall time (can pass 100% if stages run in parallel)
+    wall_time = summary['wall_time'] or 1
+    for stage, s in summary['stages'].items():
+        print('{:<16}{:>7}{:>11.3f}{:>11.1f}{:>11.1f}{:>11.1f}{:>7.0%}'
+              .format(stage, s['calls'], s['total'], s['mean'] * 1000,
+                      s['p50'] * 1000, s['p95'] * 1000, s['total'] / wall_time))
+    print('\nWall time: {:.3f} s, {} pages\n'.format(summary['wall_time'], len(summary['pages'])))
+
+
+def chrome_trace():
+    """Returns recorded events in Chrome trace event format."""
+    return ({'traceEvents': [{
+        'name': event['stage'],
+        'cat': 'ocr',
+        'ph': 'X',      # complete event (with duration)
+        'ts': round((event['start'] - _started) * 1e6, 1),
+        'dur': round(event['duration'] * 1e6, 1),
+        'pid': event['pid'],
+        'tid': event['tid'],
+        'args': {'page': event['page']},
+        } for event in _events], 'displayTimeUnit': 'ms'})
+
+
+def finish_profile(**args):
+    """Displays profile of the job and dumps it to `profile_output` if
+    set, then turns profiling off.
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+            `profile_format` is 'json' (summary and events) or 'trace'
+            (Chrome trace format).
+    """
+    if not (_enabled and profiling_job()):
+        return
+
+    summary = summarize()
+    display_profile(summary)
+
+    output_file_path = args.get('profile_output')
+    if output_file_path:
+        if args.get('profile_format') == 'trace':
+            content = chrome_trace()
+        else:
+            events = [dict(event, start=event['start'] - _started) for event in _events]
+            content = dict(summary, events=events)
+        try:
+            with open(output_file_path, 'w', encoding='utf-8') as file:
+                json.dump(content, file, ensure_ascii=False, indent=1)
+            print("Profile written to '{}'\n".format(os.path.abspath(output_file_path)))
+        except OSError as e:
+            print('*** Profile Error: could not write profile:', e)
+
+    stop_profile()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Module containing functions for rendering pdf pages into images.
+
+Pages are rendered at a fixed DPI, or with `dpi` 'auto' at a DPI chosen for
+each page: the resolution of its embedded scan image if it has one, else the
+DPI at which its glyphs (estimated from a low resolution probe render) are
+about `AUTO_GLYPH_HEIGHT` pixels high, the size tesseract's models are most
+accurate on. Either is limited to `AUTO_DPI_MIN` - `AUTO_DPI_MAX`, so small
+fonts are not under-rendered and high resolution scans are downscaled.
+
+If the page store is on, rendered pages (and chosen auto DPIs) are kept in
+it, and pages already stored are read from it instead of being rendered.
+"""
+import numpy as np
+import subprocess
+from itertools import groupby
+from pdf2image import convert_from_path, pdfinfo_from_path
+from . import defaults_dict
+from .journal import PageError
+from .page_store import PageStore, StoredPage, store_enabled
+from .process_image import glyph_height
+from .profiler import timer
+
+# range of DPIs chosen by auto DPI, and DPI step they are rounded to
+AUTO_DPI_MIN = 150
+AUTO_DPI_MAX = 400
+AUTO_DPI_STEP = 25
+
+# target glyph height (in pixels), and DPI of probe renders used to estimate it
+AUTO_GLYPH_HEIGHT = 32
+PROBE_DPI = 72
+
+
+def pdf_page_count(pdf_file_path):
+    """Reads the number of pages of a pdf file without rendering it.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+
+    Returns:
+        int: total number of pages in the pdf file.
+    """
+    return (int(pdfinfo_from_path(pdf_file_path).get('Pages', 0)))
+
+
+def embedded_image_dpis(pdf_file_path, first_page, last_page):
+    """Reads resolution of the largest image embedded in each page, using
+    poppler's `pdfimages`.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+        first_page (int): number of the first page to read.
+        last_page (int): number of the last page to read.
+
+    Returns:
+        dict: {page no.: resolution (smaller of x and y ppi)} of pages
+            with images. Empty if `pdfimages` is not available.
+    """
+    try:
+        output = subprocess.run(
+            ['pdfimages', '-list', '-f', str(first_page), '-l', str(last_page), pdf_file_path],
+            capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return ({})
+
+    largest = {}    # {page no.: (pixel area, ppi)} of largest image of page
+    # columns: page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+    for line in output.splitlines()[2:]:
+        columns = line.split()
+        try:
+            page_no, width, height = int(columns[0]), int(columns[3]), int(columns[4])
+            ppi = min(int(columns[12]), int(columns[13]))
+        except (IndexError, ValueError):
+            continue
+        if ppi > 0 and width * height > largest.get(page_no, (0, 0))[0]:
+            largest[page_no] = (width * height, ppi)
+
+    return ({page_no: ppi for page_no, (_, ppi) in largest.items()})
+
+
+def clamp_dpi(dpi):
+    """Rounds a DPI to `AUTO_DPI_STEP` and limits it to auto DPI range."""
+    dpi = int(round(dpi / AUTO_DPI_STEP)) * AUTO_DPI_STEP
+    return (min(AUTO_DPI_MAX, max(AUTO_DPI_MIN, dpi)))
+
+
+def auto_dpis(pdf_file_path, page_nos):
+    """Chooses rendering DPI of pages: resolution of embedded scan image of
+    a page, or DPI at which its glyphs are `AUTO_GLYPH_HEIGHT` pixels high.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+        page_nos (list): numbers of the pages, in ascending order.
+
+    Returns:
+        list: DPI of each page in page_nos.
+    """
+    dpis = {page_no: clamp_dpi(ppi) for page_no, ppi in
+            embedded_image_dpis(pdf_file_path, page_nos[0], page_nos[-1]).items()}
+
+    # estimate glyph height of pages without images from a probe render
+    probe_pages = [page_no for page_no in page_nos if page_no not in dpis]
+    if probe_pages:
+        with timer('dpi probe', page=False):
+            probes = convert_from_path(pdf_file_path, dpi=PROBE_DPI, first_page=probe_pages[0],
+                                       last_page=probe_pages[-1], grayscale=True)
+            for page_no, probe in zip(range(probe_pages[0], probe_pages[-1] + 1), probes):
+                if page_no in dpis:
+                    continue
+                height = glyph_height(np.asarray(probe))
+                # pages without text are rendered at lowest DPI
+                dpis[page_no] = clamp_dpi(PROBE_DPI * AUTO_GLYPH_HEIGHT / height) if height else AUTO_DPI_MIN
+
+    return ([dpis[page_no] for page_no in page_nos])
+
+
+def open_page_store(pdf_file_path, **args):
+    """Opens the page store of a pdf file if the page store is on.
+
+    Returns:
+        PageStore: store of the pdf's pages, or None if the store is off
+            or can not be read.
+    """
+    if not store_enabled(**args):
+        return (None)
+    try:
+        with timer('page store open', page=False):
+            return (PageStore(pdf_file_path))
+    except OSError as e:
+        print("*** Page Store Error: could not open page store of '{}': {}".format(pdf_file_path, e))
+        return (None)
+
+
+def iter_pdf_pages(pdf_file_path, page_count=None, first_page=1, skip_pages=(), **args):
+    """Renders pages of a pdf file in windows of `pdf_chunk_size` pages and
+    yields them one by one, so that at most one window of rendered pages
+    is held in memory at a time.
+
+    Pages are rendered directly to grayscale by poppler and handed over as
+    NumPy arrays, so no image encoding/decoding is needed before preprocessing.
+    If the page store is on, pages are handed over as `StoredPage` references
+    instead, read from the store if stored by an earlier run, else stored
+    once rendered.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+        page_count (int): total number of pages in the pdf file. Read from
+            the pdf file if not provided.
+        first_page (int): number of the first page to render (starting from 1).
+        skip_pages (set): numbers of pages not to render (pages with a text layer).
+        **args (dict): dictionary of parameters. `pdf_chunk_size` sets the
+            number of pages rendered at a time, `dpi` the rendering DPI (a
+            number, or 'auto' to choose it for each page) and `page_store`
+            the use of the page store.
+
+    Yields:
+        ndarray|StoredPage|PageError: a rendered pdf page as a 2D (grayscale)
+            uint8 array, a reference to it in the page store, or the error
+            of a page that failed to render.
+    """
+    chunk_size = args.get('pdf_chunk_size') or defaults_dict.get('pdf_chunk_size_def')
+    chunk_size = max(1, chunk_size)
+    page_count = page_count if page_count is not None else pdf_page_count(pdf_file_path)
+    dpi = args.get('dpi') or defaults_dict.get('dpi_def')
+    store = open_page_store(pdf_file_path, **args)
+
+    for chunk_first_page in range(first_page, page_count + 1, chunk_size):
+        chunk_last_page = min(chunk_first_page + chunk_size - 1, page_count)
+        page_nos = [page_no for page_no in range(chunk_first_page, chunk_last_page + 1)
+                    if page_no not in skip_pages]
+        if not page_nos:
+            continue
+        if dpi == 'auto':
+            dpis = store.auto_dpis(page_nos) if store else None
+            if dpis is None:
+                dpis = auto_dpis(pdf_file_path, page_nos)
+                store = store_auto_dpis(store, page_nos, dpis)
+        else:
+            dpis = [dpi] * len(page_nos)
+
+        # pages already in page store are not rendered
+        pages = {}      # {page no.: rendered page or StoredPage}
+        if store:
+            pages = {page_no: store.get(page_no, page_dpi) for page_no, page_dpi in zip(page_nos, dpis)}
+            pages = {page_no: page for page_no, page in pages.items() if page}
+        to_render = [(page_no, page_dpi) for page_no, page_dpi in zip(page_nos, dpis) if page_no not in pages]
+
+        # render each run of consecutive pages with the same DPI at once
+        # (pages of a run have the same DPI, and page no. minus index)
+        for (run_dpi, _), run in groupby(enumerate(to_render), key=lambda item: (item[1][1], item[1][0] - item[0])):
+            run = [page_no for _, (page_no, _) in run]
+            if dpi == 'auto' and args.get('verbose'):
+                pages_info = 'page {}'.format(run[0]) if len(run) == 1 else 'pages {}-{}'.format(run[0], run[-1])
+                print('Rendering {} at {} DPI'.format(pages_info, run_dpi))
+            rendered = dict(zip(run, render_run(pdf_file_path, run, run_dpi)))
+            good = [page_no for page_no in run if not isinstance(rendered[page_no], PageError)]
+            if store and good:
+                stored, store = store_pages(store, good, [rendered[page_no] for page_no in good], run_dpi)
+                rendered.update(zip(good, stored))
+            pages.update(rendered)
+
+        # pop pages from window, so a page is released once consumed
+        for page_no in page_nos:
+            page = pages.pop(page_no)
+            # rendered pages are PIL images, unless stored (or failed)
+            if not isinstance(page, (np.ndarray, StoredPage, PageError)):
+                with timer('pdf to array', page=False):
+                    page = np.asarray(page)
+            yield page
+
+
+def render_run(pdf_file_path, run, dpi):
+    """Renders a run of consecutive pages at once. If rendering fails (e.g.
+    poppler crashes on a bad page), renders the pages one by one, so only
+    pages that fail on their own are lost.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+        run (list): numbers of consecutive pages.
+        dpi (int): rendering DPI.
+
+    Returns:
+        list: rendered pages (PIL images), with a PageError in place of each
+            page that failed to render.
+    """
+    try:
+        with timer('pdf render', page=False):
+            pages = convert_from_path(pdf_file_path, dpi=dpi, first_page=run[0],
+                                      last_page=run[-1], grayscale=True)
+        if len(pages) == len(run):
+            return (pages)
+        error = 'rendered {} of {} pages'.format(len(pages), len(run))
+    except Exception as e:
+        error = '{}: {}'.format(type(e).__name__, e)
+
+    if len(run) == 1:
+        return ([PageError('could not render page {}: {}'.format(run[0], error))])
+    return ([page for page_no in run for page in render_run(pdf_file_path, [page_no], dpi)])
+
+
+def store_pages(store, page_nos, pages, dpi):
+    """Stores rendered pages in the page store.
+
+    Args:
+        store (PageStore): page store of the pdf.
+        page_nos (list): numbers of the pages.
+        pages (list): the rendered pages (PIL images).
+        dpi (int): DPI the pages were rendered at.
+
+    Returns:
+        tuple: `StoredPage` references of the pages (or the pages as arrays
+            if they could not be stored), and the store (None if it failed,
+            so later pages are not stored).
+    """
+    with timer('pdf to array', page=False):
+        pages = [np.asarray(page) for page in pages]
+    try:
+        with timer('page store write', page=False):
+            return (store.put(page_nos, pages, dpi), store)
+    except OSError as e:
+        print('*** Page Store Error: could not store rendered pages, continuing without page store:', e)
+        return (pages, None)
+
+
+def store_auto_dpis(store, page_nos, dpis):
+    """Stores DPIs chosen by auto DPI in the page store (if any).
+
+    Returns:
+        PageStore: the store, or None if it failed.
+    """
+    if not store:
+        return (None)
+    try:
+        store.put_auto_dpis(page_nos, dpis)
+        return (store)
+    except OSError as e:
+        print('*** Page Store Error: could not store rendered pages, continuing without page store:', e)
+        return (None)
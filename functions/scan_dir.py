@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Module containing lazy enumeration of input files in an input directory.
+
+A `DirectoryScan` walks the directory with `os.scandir` each time it is
+iterated, and yields matching files as they are found, so OCR of the first
+files starts without listing (or even reading) the whole directory tree.
+Files are matched by input file type, and optionally by include/exclude
+glob patterns, size and modification time. Sub directories are scanned
+with `recursive`, after the files of their parent directory. Entries of
+each directory are taken in name order, so pages of joined outputs keep
+the order of their file names (only a directory's entries are read before
+its first file is yielded, not the whole tree).
+
+Validation looks for the first file with `first`, and the scan it started
+goes on from there when the job iterates the `DirectoryScan`, so the
+directory is listed only once.
+"""
+import os
+from fnmatch import fnmatch
+from . import defaults_dict
+
+
+def glob_match(relative_path, patterns):
+    """Checks if a path (relative to input directory) matches any glob
+    pattern. Patterns with a '/' are matched against the relative path,
+    others against the file (or directory) name only."""
+    name = relative_path.rsplit('/', 1)[-1]
+    return (any(fnmatch(relative_path if '/' in pattern else name, pattern) for pattern in patterns))
+
+
+class DirectoryScan:
+    """
+    Lazily scanned files of an input directory.
+    """
+
+    def __init__(self, input_directory, input_file_type, recursive=False, include=None, exclude=None,
+                 min_size=None, max_size=None, newer=None, older=None):
+        """
+        Args:
+            input_directory (str): directory to scan.
+            input_file_type (str): 'image' or 'pdf'.
+            recursive (bool): if True, also scan sub directories.
+            include (list): glob patterns, files must match one of them.
+            exclude (list): glob patterns, files and sub directories
+                matching one of them are skipped.
+            min_size (int): minimum file size in bytes, or None.
+            max_size (int): maximum file size in bytes, or None.
+            newer (float): files must be modified after this timestamp.
+            older (float): files must be modified before this timestamp.
+        """
+        self.input_directory = input_directory
+        self.input_file_type = input_file_type
+        self.recursive = recursive
+        self.include = include or []
+        self.exclude = exclude or []
+        self.min_size = min_size
+        self.max_size = max_size
+        self.newer = newer
+        self.older = older
+        self.started = None     # first file and iterator of a scan started by `first`
+
+    def spec(self):
+        """Returns a json serializable description of the scan, which
+        identifies a job's inputs (e.g. in its journal)."""
+        return ({'directory': self.input_directory, 'type': self.input_file_type,
+                 'recursive': self.recursive, 'include': self.include, 'exclude': self.exclude,
+                 'min_size': self.min_size, 'max_size': self.max_size,
+                 'newer': self.newer, 'older': self.older})
+
+    def matches(self, entry, relative_path):
+        """Checks if a directory entry of a file passes all filters."""
+        extension = entry.name.split('.')[-1]
+        if self.input_file_type == 'pdf':
+            if extension != 'pdf':
+                return (False)
+        elif extension not in defaults_dict.get('image_extensions'):
+            return (False)
+        if self.include and not glob_match(relative_path, self.include):
+            return (False)
+        if self.exclude and glob_match(relative_path, self.exclude):
+            return (False)
+
+        # stat only if needed (entries from scandir cache it)
+        if self.min_size is None and self.max_size is None and self.newer is None and self.older is None:
+            return (True)
+        try:
+            stat = entry.stat()
+        except OSError:
+            return (False)
+        return ((self.min_size is None or stat.st_size >= self.min_size) and
+                (self.max_size is None or stat.st_size <= self.max_size) and
+                (self.newer is None or stat.st_mtime > self.newer) and
+                (self.older is None or stat.st_mtime < self.older))
+
+    def __getstate__(self):
+        """Pickles the scan (passed to worker processes with job params)
+        without a started scan."""
+        return (dict(self.__dict__, started=None))
+
+    def first(self):
+        """Starts scanning and returns the first matching file. The scan
+        goes on from it when the DirectoryScan is next iterated.
+
+        Returns:
+            str: path of the first matching file, relative to input
+                directory, or None if there is none.
+        """
+        scan = self.scan()
+        first = next(scan, None)
+        self.started = (first, scan) if first is not None else None
+        return (first)
+
+    def __iter__(self):
+        """Yields paths of matching files, relative to input directory,
+        going on with a scan started by `first` if there is one."""
+        started, self.started = self.started, None
+        if started is None:
+            yield from self.scan()
+            return
+        first, scan = started
+        yield (first)
+        yield from scan
+
+    def scan(self):
+        """Scans the directory (depth first, files of a directory before
+        its sub directories) and yields paths of matching files, relative
+        to input directory."""
+        directories = ['']     # stack of sub directories to scan, relative to input directory
+        while directories:
+            relative_dir = directories.pop()
+            try:
+                with os.scandir(os.path.join(self.input_directory, relative_dir)) as entries:
+                    entries = sorted(entries, key=lambda entry: entry.name)
+            except OSError as e:
+                print("*** Input Error: could not scan directory '{}': {}"
+                      .format(os.path.join(self.input_directory, relative_dir), e))
+                continue
+
+            sub_directories = []
+            for entry in entries:
+                relative_path = relative_dir + entry.name
+                try:
+                    if entry.is_file():
+                        if self.matches(entry, relative_path):
+                            yield (relative_path)
+                    elif self.recursive and entry.is_dir(follow_symlinks=False):
+                        if not glob_match(relative_path, self.exclude):
+                            sub_directories.append(relative_path + '/')
+                except OSError:
+                    continue
+            # scan sub directories in name order, first one first
+            directories.extend(reversed(sub_directories))
+
+
+def with_last(iterable):
+    """Yields items of an iterable with a flag set for the last one, looking
+    only one item ahead (so lazily scanned inputs are not read up front).
+
+    Yields:
+        tuple: item and True if it is the last item, else False.
+    """
+    iterator = iter(iterable)
+    try:
+        item = next(iterator)
+    except StopIteration:
+        return
+    for next_item in iterator:
+        yield (item, False)
+        item = next_item
+    yield (item, True)
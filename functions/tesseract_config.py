@@ -1,34 +1,64 @@
 #!/usr/bin/env python3
-from os import environ
+from functools import lru_cache
+from shlex import quote
 from . import tesseract_dict
 
+# tesseract config variables passed with every OCR call
+TESSERACT_VARIABLES = {
+    'load_system_dawg': 'false',
+    'load_freq_dawg': 'false',
+    'textord_space_size_is_variable': '1',
+}
+"""dict: tesseract config variables (`-c name=value`) used for OCR"""
+
+
+def tesseract_params(**args):
+    """Resolves tesseract parameters from args, falling back to defaults.
 
-def config_tesseract(**args):
-    """Creates a string containing options to pass to tesseract based on args.
-    
     Args:
         **args (dict): dictionary containing custom parameters
 
     Returns:
-        str: A string to be used for tesseract configuration.
+        dict: training data folder, language, page segmentation mode
+            and OCR engine mode to be used by tesseract.
     """
-
     training_folder = args.get('training_folder')  # TODO check if it contains training data
 
-    # TRAINING DATA directory (if not provieded uses tesseracts default dir)
-    environ['TESSDATA_PREFIX'] = training_folder if training_folder else tesseract_dict.get('training_dir_def')
-
-
     # config tesseract options
     # TODO add config params to **args from calling function & handle here
-    lang = args.get('lang', tesseract_dict.get('lang_def'))
-    psm = args.get('psm', tesseract_dict.get('psm_def'))        # page segmentation mode (1 & 3 for full page). refer doc.
-    oem = args.get('oem', tesseract_dict.get('oem_def'))        # OCR engine mode. refer doc
-    options = """
-    -l {} --psm {} --oem {}
-    -c load_system_dawg=false
-    -c load_freq_dawg=false
-    -c textord_space_size_is_variable=1
-    """.format(lang, psm, oem)
-
-    return options
\ No newline at end of file
+    return ({
+        # TRAINING DATA directory (if not provieded uses tesseracts default dir)
+        'training_folder': training_folder if training_folder else tesseract_dict.get('training_dir_def'),
+        'lang': args.get('lang', tesseract_dict.get('lang_def')),
+        'psm': args.get('psm', tesseract_dict.get('psm_def')),  # page segmentation mode (1 & 3 for full page). refer doc.
+        'oem': args.get('oem', tesseract_dict.get('oem_def')),  # OCR engine mode. refer doc
+    })
+
+
+@lru_cache(maxsize=None)
+def tesseract_options(training_folder, lang, psm, oem):
+    """Creates (once for each combination) a string containing options to
+    pass to tesseract. The training data folder is passed as an option of
+    the call (not through `TESSDATA_PREFIX` environment variable), so jobs
+    using different training data can run at the same time."""
+    return ("""
+    {}-l {} --psm {} --oem {}
+    {}
+    """.format('--tessdata-dir {} '.format(quote(training_folder)) if training_folder else '',
+               lang, psm, oem,
+               '\n    '.join('-c {}={}'.format(name, value)
+                             for name, value in TESSERACT_VARIABLES.items())))
+
+
+def config_tesseract(**args):
+    """Creates a string containing options to pass to tesseract based on args.
+    
+    Args:
+        **args (dict): dictionary containing custom parameters
+
+    Returns:
+        str: A string to be used for tesseract configuration.
+    """
+    params = tesseract_params(**args)
+    return (tesseract_options(params.get('training_folder'), params.get('lang'),
+                              params.get('psm'), params.get('oem')))
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Module containing tesseract OCR engines (backends) and a per process
+engine cache.
+
+Two backends are available:
+    * 'tesserocr': keeps a long lived, initialized tesseract API handle
+      (traineddata loaded once) and feeds it pages as in-memory buffers.
+      Needs the optional `tesserocr` package.
+    * 'subprocess': runs the `tesseract` command through pytesseract for
+      every call (one process and temporary image file per call).
+
+With the 'auto' engine, 'tesserocr' is used if installed, else 'subprocess'.
+
+Engines are keyed by their tesseract options, which include the training
+data folder and language, so jobs with different models (e.g. 'fast' and
+'best' training data) get their own engines, and can run side by side in
+threads or processes.
+
+Orientation and script detection (OSD, used by the `orient` preprocessing
+stage) has engines of its own (see `get_osd_engine`), which load tesseract's
+`osd.traineddata` and are not shared with OCR.
+"""
+import numpy as np
+import pytesseract as pts
+import threading
+from os import path
+from shlex import quote
+from .tesseract_config import TESSERACT_VARIABLES, tesseract_params
+from . import tesseract_dict
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# header of tesseract's tsv output (not included in tesserocr's tsv text)
+TSV_HEADER = '\t'.join(['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                        'left', 'top', 'width', 'height', 'conf', 'text'])
+
+# engines created in current process ({(engine arg, options, training folder): engine})
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class SubprocessEngine:
+    """
+    OCR engine running the tesseract command line program through pytesseract.
+    """
+    name = 'subprocess'
+
+    def __init__(self, options, **params):
+        """Initializes engine with a tesseract config string.
+
+        Args:
+            options (str): tesseract config string.
+            **params (dict): tesseract parameters (unused, set in `options`).
+        """
+        self.options = options
+
+    def image_to_string(self, image):
+        """Returns OCR'ed text of an image."""
+        return (pts.image_to_string(image, config=self.options))
+
+    def image_to_data(self, image):
+        """Returns tesseract's `image_to_data` output of an image as a dict."""
+        return (pts.image_to_data(image, config=self.options, output_type=pts.Output.DICT))
+
+    def image_to_osd(self, image):
+        """Detects orientation of an image (engine of `get_osd_engine`).
+
+        Returns:
+            dict: `rotate` (degrees turning the image upright) and
+                `orientation_conf`, or None if tesseract could not detect
+                it (too few characters, or no osd training data).
+        """
+        try:
+            osd = pts.image_to_osd(image, config=self.options, output_type=pts.Output.DICT)
+        except pts.TesseractError:
+            return (None)
+        return ({'rotate': osd['rotate'], 'orientation_conf': osd['orientation_conf']})
+
+
+class TesserocrEngine:
+    """
+    OCR engine keeping an initialized tesseract API handle, with training
+    data loaded once, for all OCR calls in the current process. Calls
+    from different threads take turns using the handle.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, options, **params):
+        """Initializes tesseract API.
+
+        Args:
+            options (str): tesseract config string (unused, set from `params`).
+            **params (dict): tesseract parameters from `tesseract_params`.
+        """
+        # without a training folder (OSD engines) tesseract's default is used
+        folder = params.get('training_folder')
+        self.api = tesserocr.PyTessBaseAPI(
+            **({'path': path.join(folder, '')} if folder else {}),
+            lang=params.get('lang'),
+            psm=params.get('psm'),
+            oem=params.get('oem'),
+            variables=TESSERACT_VARIABLES)
+        self.lock = threading.Lock()
+
+    def set_image(self, image):
+        """Passes pixels of a grayscale image (2D uint8 array) to tesseract."""
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        self.api.SetImageBytes(image.tobytes(), width, height,
+                               bytes_per_pixel, width * bytes_per_pixel)
+
+    def image_to_string(self, image):
+        """Returns OCR'ed text of an image."""
+        with self.lock:
+            self.set_image(image)
+            text = self.api.GetUTF8Text()
+        # add page separator, as the tesseract command does
+        return (text + '\f')
+
+    def image_to_data(self, image):
+        """Returns tesseract's `image_to_data` output of an image as a dict."""
+        with self.lock:
+            self.set_image(image)
+            tsv = TSV_HEADER + '\n' + self.api.GetTSVText(0)
+        return (pts.pytesseract.file_to_dict(tsv, '\t', -1))
+
+    def image_to_osd(self, image):
+        """Detects orientation of an image (engine of `get_osd_engine`).
+
+        Returns:
+            dict: `rotate` (degrees turning the image upright) and
+                `orientation_conf`, or None if tesseract could not detect it.
+        """
+        with self.lock:
+            self.set_image(image)
+            osd = self.api.DetectOrientationScript()
+        if not osd:
+            return (None)
+        # orient_deg is the (counterclockwise) orientation of the page
+        return ({'rotate': (360 - osd['orient_deg']) % 360, 'orientation_conf': osd['orient_conf']})
+
+
+ENGINES = {engine.name: engine for engine in (SubprocessEngine, TesserocrEngine)}
+"""dict: available OCR engine classes by name"""
+
+
+def engine_name(**args):
+    """Resolves the name of the OCR engine to use from args or defaults.
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        str: 'tesserocr' or 'subprocess'.
+    """
+    name = args.get('engine') or tesseract_dict.get('engine_def')
+    if name == 'auto':
+        name = 'tesserocr' if tesserocr else 'subprocess'
+    elif name == 'tesserocr' and not tesserocr:
+        print("*** Engine Error: tesserocr is not installed, using 'subprocess' engine")
+        name = 'subprocess'
+    return (name)
+
+
+def get_engine(options, **args):
+    """Returns an OCR engine for the given tesseract configuration. Engines
+    are created once per process and reused for all later calls.
+
+    Args:
+        options (str): tesseract config string from `config_tesseract`.
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        SubprocessEngine|TesserocrEngine: an initialized OCR engine.
+    """
+    params = tesseract_params(**args)
+    key = (args.get('engine'), options, params.get('training_folder'))
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = ENGINES[engine_name(**args)](options, **params)
+        return (_engines[key])
+
+
+def get_osd_engine(**args):
+    """Returns an engine detecting orientation of pages (tesseract's OSD,
+    page segmentation mode 0), created once per process. It loads
+    `osd.traineddata` from the `osd_dir_def` folder (tesseract's default
+    training data folder if not set).
+
+    Args:
+        **args (dict): dictionary of params from user input for ocr command.
+
+    Returns:
+        SubprocessEngine|TesserocrEngine: an initialized OSD engine, or None
+            if tesseract could not load osd training data.
+    """
+    folder = tesseract_dict.get('osd_dir_def')
+    name = engine_name(**args)
+    key = ('osd', name, folder)
+    with _engines_lock:
+        if key not in _engines:
+            options = '{}--psm 0'.format('--tessdata-dir {} '.format(quote(folder)) if folder else '')
+            try:
+                _engines[key] = ENGINES[name](options, training_folder=folder, lang='osd', psm=0, oem=0)
+            except RuntimeError as e:
+                print('*** Engine Error: orientation detection is not available: {}'.format(e))
+                _engines[key] = None
+        return (_engines[key])
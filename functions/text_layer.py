@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Module containing functions to read the text layer of pdf pages, so pages
+of born-digital pdfs (or already OCR'ed scans) need not be rendered and
+OCR'ed.
+
+Text is extracted with poppler's `pdftotext`, which is installed along
+with the `pdfinfo` and `pdftoppm` tools pdf2image uses. A page is taken
+from its text layer only if it has enough Ethiopic characters, so pages
+with no text, or with text of broken font encodings, are still OCR'ed.
+"""
+import re
+import subprocess
+from .profiler import timer
+
+# min. no. of Ethiopic characters for a page's text layer to be used
+MIN_ETHIOPIC_CHARS = 20
+
+# min. fraction of letters of the text layer that must be Ethiopic
+MIN_ETHIOPIC_RATIO = 0.5
+
+# Ethiopic, Ethiopic Supplement, Ethiopic Extended and Extended-A blocks
+ETHIOPIC = re.compile('[\u1200-\u139f\u2d80-\u2ddf\uab00-\uab2f]')
+LETTER = re.compile(r'[^\W\d_]')
+
+
+def pdf_text(pdf_file_path, first_page, last_page):
+    """Extracts text of pdf pages with `pdftotext`.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+        first_page (int): number of the first page.
+        last_page (int): number of the last page.
+
+    Returns:
+        list: text of each page from first_page to last_page, or None if
+            `pdftotext` is not available or fails.
+    """
+    try:
+        output = subprocess.run(
+            ['pdftotext', '-enc', 'UTF-8', '-f', str(first_page), '-l', str(last_page), pdf_file_path, '-'],
+            capture_output=True, check=True).stdout.decode('utf-8', errors='replace')
+    except (OSError, subprocess.CalledProcessError):
+        return (None)
+
+    # pages are separated (and ended) by form feeds
+    texts = output.split('\f')
+    return ((texts + [''] * (last_page - first_page + 1))[:last_page - first_page + 1])
+
+
+def is_ethiopic_text(text):
+    """Checks if text of a page is mostly Ethiopic, with enough characters
+    to be a page of text."""
+    ethiopic = len(ETHIOPIC.findall(text))
+    if ethiopic < MIN_ETHIOPIC_CHARS:
+        return (False)
+    return (ethiopic >= MIN_ETHIOPIC_RATIO * len(LETTER.findall(text)))
+
+
+def text_layer_pages(pdf_file_path, first_page, last_page):
+    """Finds pages with an Ethiopic text layer.
+
+    Args:
+        pdf_file_path (str): path of the pdf file.
+        first_page (int): number of the first page.
+        last_page (int): number of the last page.
+
+    Returns:
+        dict: {page no.: text} of pages with an Ethiopic text layer. Text
+            is laid out as OCR'ed text: paragraphs separated by an empty
+            line and ending with a form feed.
+    """
+    if first_page > last_page:
+        return ({})
+
+    with timer('text layer', page=False):
+        texts = pdf_text(pdf_file_path, first_page, last_page)
+    if texts is None:
+        print("*** Text Layer Error: could not read text of '{}' with pdftotext, OCR'ing all pages"
+              .format(pdf_file_path))
+        return ({})
+
+    pages = {}
+    for page_no, text in enumerate(texts, first_page):
+        if is_ethiopic_text(text):
+            pages[page_no] = text.strip('\n') + '\n\n\f'
+    return (pages)
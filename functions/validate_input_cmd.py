@@ -2,9 +2,88 @@
 """
 Contains a function to validate parsed user input.
 """
+from datetime import datetime
 from os import listdir, path
 from pprint import pprint
 from . import defaults_dict, tesseract_dict, write_dict
+from .process_image import PREPROCESS_PRESETS, PREPROCESS_STAGES, preprocess_stages
+from .config import job_config
+from .scan_dir import DirectoryScan
+
+
+# range of fixed pdf rendering DPIs
+DPI_RANGE = (50, 1200)
+
+
+def validate_dpi(dpi):
+    """Validates a pdf rendering DPI.
+
+    Args:
+        dpi (str): 'auto' or a number.
+
+    Returns:
+        int|str: the DPI as int, or 'auto'. None if invalid.
+    """
+    if dpi == 'auto':
+        return (dpi)
+    if not dpi.isdigit() or not DPI_RANGE[0] <= int(dpi) <= DPI_RANGE[1]:
+        print("*** Input Error: DPI must be 'auto' or a number from {} to {}: '{}'"
+              .format(DPI_RANGE[0], DPI_RANGE[1], dpi))
+        return (None)
+    return (int(dpi))
+
+
+def validate_preprocess(preprocess):
+    """Validates preprocessing stages of a job.
+
+    Args:
+        preprocess (str): a preset name, or comma separated stage names.
+
+    Returns:
+        str: the preprocess param. None if invalid.
+    """
+    if preprocess_stages(preprocess) is None:
+        print("*** Input Error: preprocess must be a preset ({}) or comma separated stages ({}): '{}'"
+              .format('|'.join(PREPROCESS_PRESETS), ','.join(PREPROCESS_STAGES), preprocess))
+        return (None)
+    return (preprocess)
+
+
+def validate_scan_filters(**args):
+    """Validates filters of files scanned in input directory (-s).
+
+    Args:
+        **args (dict): input parsed into dict using argparse.
+
+    Returns:
+        dict: keyword args of `DirectoryScan` (recursive, include, exclude,
+            min_size, max_size, newer and older). None if invalid.
+    """
+    filters = {'recursive': args.get('recursive'),
+               'include': args.get('include'),
+               'exclude': args.get('exclude')}
+
+    # sizes are passed in KB
+    for size_arg in ['min_size', 'max_size']:
+        size = args.get(size_arg)   # list or None. checked for type=int by argparse
+        size = size[0] if size else None
+        if size is not None and size < 0:
+            print("*** Input Error: file size must not be negative: '{}'".format(size))
+            return (None)
+        filters[size_arg] = size * 1024 if size is not None else None
+
+    # dates are passed as YYYY-MM-DD[THH:MM] (local time)
+    for date_arg in ['newer', 'older']:
+        date = args.get(date_arg)   # list or None
+        date = date[0] if date else None
+        if date is not None:
+            try:
+                date = datetime.fromisoformat(date).timestamp()
+            except ValueError:
+                print("*** Input Error: date must be in YYYY-MM-DD[THH:MM] format: '{}'".format(date))
+                return (None)
+        filters[date_arg] = date
+    return (filters)
 
 
 # TODO break up function into parts based on what it validates
@@ -25,7 +104,8 @@ def validate_parsed_ocr_cmd(line, **args):
         **args (dict): input parsed into dict using argparse.
 
     Returns:
-        dict: If successful a validated keyword dictionary, else None.
+        JobConfig: If successful the job's validated params merged over
+            defaults (an immutable keyword dictionary), else None.
 
     Raises:
     """
@@ -54,6 +134,31 @@ def validate_parsed_ocr_cmd(line, **args):
         print('*** Argument Error: neither input file/s or input directory passed')
         return (None)
 
+    # watch mode OCRs files added to input directory, each to its own output file
+    watch = args.get('watch')
+    if watch and (input_file or input_files):
+        print('*** Argument Error: --watch can only be used with an input directory, not input file/s')
+        return (None)
+    if watch and (args.get('output_file') or args.get('join')):
+        print('*** Argument Error: --watch writes an output file for each input file, '
+              'so can not be used with -o or -j')
+        return (None)
+
+    # input directory scan filters can not be used with input file/s, nor
+    # with watch mode (which OCRs every file added to input directory)
+    filters = validate_scan_filters(**args)
+    if filters is None:
+        return (None)
+    filtered = any(value is not None and value is not False for value in filters.values())
+    if filtered and (input_file or input_files):
+        print('*** Argument Error: -r, --include, --exclude, --min-size, --max-size, --newer and --older '
+              'can only be used with an input directory, not input file/s')
+        return (None)
+    if filtered and watch:
+        print('*** Argument Error: -r, --include, --exclude, --min-size, --max-size, --newer and --older '
+              'can not be used with --watch, which OCRs every file added to input directory')
+        return (None)
+
     # If input_file/s contain path, input_directory must be None
     # TODO if only part of input_files contain path
     if input_directory and (
@@ -157,14 +262,13 @@ def validate_parsed_ocr_cmd(line, **args):
             return (None)
 
     # Check if files with input_file_type exist in input_directory
-    if not inputs:  # use files in input_directory
-        files_in_dir = listdir(input_directory)
-        if input_file_type == 'pdf':
-            inputs = [f for f in files_in_dir if f.split('.')[-1] == 'pdf']
-        elif input_file_type == 'image':
-            inputs = [f for f in files_in_dir if f.split('.')[-1] in IMAGE_EXTENSIONS]
-        if not inputs:
-            print("*** Input Error: no '{}' file in '{}'".format(input_file_type, input_directory))
+    # files in input_directory are scanned lazily as they are OCR'ed, so only
+    # the first one is looked for here, and the job goes on with the same
+    # scan (watch mode waits for them)
+    if not inputs and not watch:
+        inputs = DirectoryScan(input_directory, input_file_type, **filters)
+        if inputs.first() is None:
+            print("*** Input Error: no matching '{}' file in '{}'".format(input_file_type, input_directory))
             return (None)
 
     # if $ in output file or directory expand it from shell vars
@@ -192,6 +296,76 @@ def validate_parsed_ocr_cmd(line, **args):
     # get display_confidence level
     display_confidence = args.get('display_confidence')
 
+    # no. of pages per segment spilled to disk for joined docx outputs
+    segment_pages = args.get('segment_pages')   # list or None. checked for type=int by argparse
+    segment_pages = segment_pages[0] if segment_pages else None
+    if segment_pages is not None and segment_pages < 1:
+        print("*** Input Error: segment pages must be a positive number: '{}'".format(segment_pages))
+        return (None)
+    # FPDF keeps all pages of a pdf in memory until it is written, so segments would not bound it
+    if segment_pages is not None and output_mode != 'docx':
+        print("*** Input Error: --segment-pages is only supported for 'docx' output mode")
+        return (None)
+
+    # resume a failed run from the job journal of its output file
+    resume = args.get('resume')
+    if resume and output_mode == 'print':
+        print('*** Argument Error: --resume can only be used with an output file (txt, docx or pdf mode)')
+        return (None)
+
+    # profile stages of OCR, and file to write profile to
+    profile = args.get('profile')
+    profile_output = args.get('profile_output')     # list or None
+    profile_output = profile_output[0] if profile_output else None
+    profile_format = args.get('profile_format')     # list or None. checked for valid values by argparse
+    profile_format = profile_format[0] if profile_format else 'json'
+    if (profile_output or args.get('profile_format')) and not profile:
+        print('*** Argument Error: --profile-output and --profile-format can only be used with --profile')
+        return (None)
+    if profile_output:
+        if '$' in profile_output:
+            profile_output = path.expandvars(profile_output)
+        profile_dir = path.split(profile_output)[0]
+        if profile_dir and not path.isdir(profile_dir):
+            print("*** Input Error: profile output directory '{}' does not exist".format(profile_dir))
+            return (None)
+
+    # use staged page pipeline: True (--pipeline) or None (default)
+    pipeline = args.get('pipeline')
+
+    # OCR only text regions of pages: True (--crop) or None (default)
+    crop = args.get('crop')
+
+    # use page store: True (--page-store), False (--no-page-store) or None (default)
+    page_store = args.get('page_store')
+
+    # use OCR results cache: True (--cache), False (--no-cache) or None (default)
+    cache = args.get('cache')
+
+    # OCR pdf pages even if they have a text layer
+    force_ocr = args.get('force_ocr')
+
+    # preprocessing preset or stages, or None (default)
+    preprocess = args.get('preprocess')     # list or None
+    if preprocess:
+        preprocess = validate_preprocess(preprocess[0])
+        if preprocess is None:
+            return (None)
+
+    # pdf rendering DPI: a number, 'auto' or None (default)
+    dpi = args.get('dpi')       # list or None
+    if dpi:
+        dpi = validate_dpi(dpi[0])
+        if dpi is None:
+            return (None)
+
+    # no. of pages to OCR in parallel
+    jobs = args.get('jobs')     # list or None. checked for type=int by argparse
+    jobs = jobs[0] if jobs else tesseract_dict.get('jobs_def')
+    if jobs < 1:
+        print("*** Input Error: no. of jobs must be a positive number: '{}'".format(jobs))
+        return (None)
+
     # TODO check if output_file already exist in output_dir,
     # and prompt for deletion/overwriting confirmation from user
 
@@ -205,13 +379,28 @@ def validate_parsed_ocr_cmd(line, **args):
         'output_file': output_file,
         'output_mode': output_mode,
         'verbose': verbose,
-        'display_confidence': display_confidence
+        'display_confidence': display_confidence,
+        'jobs': jobs,
+        'dpi': dpi,
+        'preprocess': preprocess,
+        'force_ocr': force_ocr,
+        'cache': cache,
+        'segment_pages': segment_pages,
+        'resume': resume,
+        'watch': watch,
+        'pipeline': pipeline,
+        'crop': crop,
+        'page_store': page_store,
+        'profile': profile,
+        'profile_output': profile_output,
+        'profile_format': profile_format
         }
 
     """
     BY NOW: (changed attrs in args)
         input_file_type: image|pdf
-        inputs: list of input files (from input_file/s or input_directory)
+        inputs: list of input files (from input_file/s), or a DirectoryScan
+            of input_directory (files are scanned lazily as they are OCR'ed)
         input_directory: None if path in inputs (passed or default)
 
         output_mode: From -m/output_file, or default
@@ -219,8 +408,10 @@ def validate_parsed_ocr_cmd(line, **args):
         output_dir: None if path in output_file (passed or default)
 
         join: set to True if output_file. (else unaltered)
+
+    Params that are None are taken from defaults into the job's immutable config.
     """
-    return (result)
+    return (job_config(**result))
 
 
 def validate_parsed_defalt_cmd(line, **args):
@@ -278,6 +469,55 @@ def validate_parsed_defalt_cmd(line, **args):
     if output_mode:
         output_mode = output_mode[0]
 
+    pdf_chunk_size = args.get('pdf_chunk_size')    # checked for type=int by argparse
+    if pdf_chunk_size:
+        pdf_chunk_size = pdf_chunk_size[0]
+        if pdf_chunk_size < 1:
+            print("*** Input Error: pdf chunk size must be a positive number: '{}'".format(pdf_chunk_size))
+            return (None)
+
+    dpi = args.get('dpi')
+    if dpi:
+        dpi = validate_dpi(dpi[0])
+        if dpi is None:
+            return (None)
+
+    preprocess = args.get('preprocess')
+    if preprocess:
+        preprocess = validate_preprocess(preprocess[0])
+        if preprocess is None:
+            return (None)
+
+    cache = args.get('cache')   # checked for valid values by argparse
+    if cache:
+        cache = cache[0] == 'on'
+
+    pipeline = args.get('pipeline')     # checked for valid values by argparse
+    if pipeline:
+        pipeline = pipeline[0] == 'on'
+
+    crop = args.get('crop')     # checked for valid values by argparse
+    if crop:
+        crop = crop[0] == 'on'
+
+    page_store = args.get('page_store')     # checked for valid values by argparse
+    if page_store:
+        page_store = page_store[0] == 'on'
+
+    page_store_size = args.get('page_store_size')    # checked for type=int by argparse
+    if page_store_size:
+        page_store_size = page_store_size[0]
+        if page_store_size < 1:
+            print("*** Input Error: page store size must be a positive number: '{}'".format(page_store_size))
+            return (None)
+
+    cache_size = args.get('cache_size')    # checked for type=int by argparse
+    if cache_size:
+        cache_size = cache_size[0]
+        if cache_size < 1:
+            print("*** Input Error: cache size must be a positive number: '{}'".format(cache_size))
+            return (None)
+
 
     font_name = args.get('font_name')
     if font_name:
@@ -297,6 +537,18 @@ def validate_parsed_defalt_cmd(line, **args):
     width = args.get('width')   # checked for type=int by argparse
     if width:
         width = width[0]
+    segment_pages = args.get('segment_pages')   # checked for type=int by argparse
+    if segment_pages:
+        segment_pages = segment_pages[0]
+        if segment_pages < 0:
+            print("*** Input Error: segment pages must not be negative: '{}'".format(segment_pages))
+            return (None)
+    buffer_size = args.get('buffer_size')   # checked for type=int by argparse
+    if buffer_size:
+        buffer_size = buffer_size[0]
+        if buffer_size < 0:
+            print("*** Input Error: buffer size must not be negative: '{}'".format(buffer_size))
+            return (None)
 
 
     training_dir = args.get('training_dir')
@@ -319,6 +571,15 @@ def validate_parsed_defalt_cmd(line, **args):
     oem = args.get('oem')       # checked for valid values by argparse
     if oem :
         oem = oem[0]
+    jobs = args.get('jobs')     # checked for type=int by argparse
+    if jobs:
+        jobs = jobs[0]
+        if jobs < 1:
+            print("*** Input Error: no. of jobs must be a positive number: '{}'".format(jobs))
+            return (None)
+    engine = args.get('engine')     # checked for valid values by argparse
+    if engine:
+        engine = engine[0]
 
     # check if training directory contains valid training file
     # file name should be lang.traineddata
@@ -342,19 +603,34 @@ def validate_parsed_defalt_cmd(line, **args):
             'input_dir_def_img': input_directory_img,
             'input_dir_def_pdf': input_directory_pdf,
             'output_dir_def': output_directory,
-            'output_mode_def': output_mode},
+            'output_mode_def': output_mode,
+            'pdf_chunk_size_def': pdf_chunk_size,
+            'dpi_def': dpi,
+            'preprocess_def': preprocess,
+            'cache_def': cache,
+            'pipeline_def': pipeline,
+            'crop_def': crop,
+            'page_store_def': page_store,
+            'page_store_size_def': page_store_size,
+            'cache_size_def': cache_size},
 
         'tesseract_dict': {
             'training_dir_def': training_dir,
             'lang_def': lang,
             'psm_def': psm,
-            'oem_def': oem},
+            'oem_def': oem,
+            'jobs_def': jobs,
+            'engine_def': engine},
 
         'write_dict': {
             'font_name_def': font_name,
             'font_path_def': font_path,
             'height_def': height,
-            'width_def': width}
+            'width_def': width,
+            'txt_buffer_size_def': buffer_size,
+            'segment_pages_def': segment_pages},
+
+        'reset': args.get('reset')
         }
 
     return (result)
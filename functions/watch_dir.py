@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Module containing the watch (hot folder) mode, which keeps OCR'ing image or
+pdf files as they are added to an input directory, until stopped with
+Ctrl-C.
+
+New files are noticed through inotify if the optional `inotify_simple`
+package is installed (and the directory can be watched), else by listing
+the directory every `POLL_SECONDS`. A file is taken only once its size and
+modification time did not change for `SETTLE_SECONDS`, so files still
+being written (or copied) by a scanner are not OCR'ed part way.
+
+Each file is OCR'ed to its own output file, by one warm OCR engine (or
+pool of worker processes) kept running between files. Processed files are
+recorded in a manifest in the input directory, so files processed before a
+restart are not OCR'ed again (unless they are replaced).
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from . import defaults_dict, ocr_pages
+from .ocr_image import ocr_image
+from .ocr_pdf import ocr_pdf
+from .tesseract_config import config_tesseract
+from .tesseract_engine import get_engine
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# seconds a file's size and modification time must stay unchanged before it is OCR'ed
+SETTLE_SECONDS = 2.0
+# seconds between listings of the input directory, if it is polled
+POLL_SECONDS = 2.0
+# name of manifest file of processed files (in input directory)
+MANIFEST_NAME = '.ocr_watch_manifest.jsonl'
+
+
+def is_input_file(name, input_file_type):
+    """Checks if a file name has an extension of `input_file_type`."""
+    extension = name.split('.')[-1]
+    if input_file_type == 'pdf':
+        return (extension == 'pdf')
+    return (extension in defaults_dict.get('image_extensions'))
+
+
+def file_state(file_path):
+    """Returns (size, modification time) of a file, or None if it is gone."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return (None)
+    return ((stat.st_size, stat.st_mtime_ns))
+
+
+class WatchManifest:
+    """
+    Append-only json lines manifest of files processed in a watched
+    directory. A file is processed if it is recorded with its current size
+    and modification time.
+    """
+
+    def __init__(self, input_directory):
+        """Loads files processed by previous runs.
+
+        Args:
+            input_directory (str): the watched directory.
+        """
+        self.manifest_path = os.path.join(input_directory, MANIFEST_NAME)
+        self.files = {}     # {file name: [size, modification time]}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue    # last line of a killed run may be partial
+                    self.files[record.get('file')] = [record.get('size'), record.get('mtime')]
+        except OSError:
+            pass
+
+    def processed(self, name, state):
+        """Checks if a file was processed in its current state."""
+        return (self.files.get(name) == list(state))
+
+    def record(self, name, state):
+        """Records a processed file and syncs the manifest to disk."""
+        self.files[name] = list(state)
+        with open(self.manifest_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'file': name, 'size': state[0], 'mtime': state[1],
+                                   'time': time.time()}, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class DirectoryWatcher:
+    """
+    Source of names of files that may have been added or changed in a
+    directory: inotify events if available, else listings of the directory.
+    """
+
+    def __init__(self, input_directory):
+        """
+        Args:
+            input_directory (str): the directory to watch.
+        """
+        self.input_directory = input_directory
+        self.inotify = None
+        if INotify is not None:
+            try:
+                self.inotify = INotify()
+                self.inotify.add_watch(input_directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY)
+            except OSError as e:
+                print('*** Watch Error: could not watch directory with inotify ({}), polling it'.format(e))
+                self.close()
+        self.kind = 'inotify' if self.inotify else 'polling every {:g}s'.format(POLL_SECONDS)
+
+    def listing(self):
+        """Returns names of all files in the directory."""
+        try:
+            return ([entry.name for entry in os.scandir(self.input_directory) if entry.is_file()])
+        except OSError:
+            return ([])
+
+    def wait(self, timeout):
+        """Waits up to `timeout` seconds for files to change.
+
+        Returns:
+            list: names of files that may have been added or changed.
+        """
+        if not self.inotify:
+            time.sleep(timeout)
+            return (self.listing())
+        return ([event.name for event in self.inotify.read(timeout=int(timeout * 1000))])
+
+    def close(self):
+        """Stops watching."""
+        if self.inotify:
+            self.inotify.close()
+            self.inotify = None
+
+
+def warm_engine(args):
+    """Initializes a worker process (or the main process): loads the OCR
+    engine for the watch job's tesseract options, so the first file does
+    not pay its start up time."""
+    get_engine(config_tesseract(**args), **args)
+
+
+def start_warm_pool(**args):
+    """Starts the pool of worker processes kept running between files, if
+    more than one job is requested, and loads OCR engines in it.
+
+    Returns:
+        ProcessPoolExecutor: the warm pool, or None if pages are OCR'ed in
+            the main process.
+    """
+    warm_engine(args)
+    jobs = args.get('jobs')
+    if not jobs or jobs < 2:
+        return (None)
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=warm_engine, initargs=(args,))
+    for future in [executor.submit(warm_engine, args) for _ in range(jobs)]:
+        future.result()
+    return (executor)
+
+
+def watch_directory(**args):
+    """
+    Watches the input directory and OCRs image or pdf files added to it
+    (and files not yet processed by previous runs), each to its own output
+    file, until stopped with Ctrl-C.
+
+    Args:
+        **args (dict): a keyword dictionary generated from parsed and
+            validated user command line input (with `watch` set).
+    """
+    input_directory = args.get('input_directory')
+    input_file_type = args.get('input_file_type')
+    ocr = ocr_image if input_file_type == 'image' else ocr_pdf
+
+    manifest = WatchManifest(input_directory)
+    watcher = DirectoryWatcher(input_directory)
+    pending = {}    # {file name: (state, time state was first seen)} of files settling
+    failed = {}     # {file name: state} of files that failed, retried once changed
+    processed = 0
+
+    ocr_pages.warm_executor = start_warm_pool(**args)
+    print("Watching '{}' for {} files ({}). Press Ctrl-C to stop"
+          .format(input_directory, input_file_type, watcher.kind))
+    try:
+        names = watcher.listing()
+        while True:
+            now = time.monotonic()
+            for name in names:
+                if is_input_file(name, input_file_type) and name not in pending:
+                    pending[name] = (None, now)
+
+            # take files whose size and modification time settled, in name order
+            ready = []
+            for name in sorted(pending):
+                state = file_state(os.path.join(input_directory, name))
+                if state is None or manifest.processed(name, state) or failed.get(name) == state:
+                    del pending[name]
+                elif state != pending[name][0]:
+                    pending[name] = (state, now)
+                elif now - pending[name][1] >= SETTLE_SECONDS:
+                    del pending[name]
+                    ready.append((name, state))
+
+            for name, state in ready:
+                print("=== New {} file: '{}'".format(input_file_type, name))
+                try:
+                    failed_pages = ocr(**dict(args, input_files=[name], watch=False))
+                except BrokenProcessPool as e:
+                    print('*** Job Error: {}: {} (restarting worker processes)'.format(type(e).__name__, e))
+                    ocr_pages.warm_executor = start_warm_pool(**args)
+                    failed[name] = state
+                    continue
+                except Exception as e:
+                    print('*** Job Error: {}: {}'.format(type(e).__name__, e))
+                    failed[name] = state
+                    continue
+                # a file with failed pages is retried once changed, like a file that failed
+                if failed_pages:
+                    failed[name] = state
+                    continue
+                manifest.record(name, state)
+                failed.pop(name, None)
+                processed += 1
+
+            # check settling files again soon, else wait for changes
+            names = watcher.wait(SETTLE_SECONDS / 2 if pending else POLL_SECONDS)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        watcher.close()
+        if ocr_pages.warm_executor:
+            ocr_pages.warm_executor.shutdown()
+            ocr_pages.warm_executor = None
+    print('Stopped watching: {} file(s) processed, {} failed'.format(processed, len(failed)))
@@ -4,15 +4,19 @@ Command line interface for Ethiopic Script OCR app
 """
 import cmd
 import os
+import sys
 from functions import defaults_dict, tesseract_dict, write_dict
+from functions.batch import run_batch
+from functions.config import CONFIG_PATH
+from functions.ocr_server import run_server
 from functions.ocr_image import ocr_image
 from functions.ocr_pdf import ocr_pdf
-from functions.parse_input_cmd import parse_ocr_cmd, parse_default_cmd
+from functions.parse_input_cmd import add_input_type_prefix, parse_ocr_cmd, parse_default_cmd
 from functions.set_defaults import set_defaults
 from functions.validate_input_cmd import validate_parsed_ocr_cmd
 from functions.validate_input_cmd import validate_parsed_defalt_cmd
+from functions.watch_dir import watch_directory
 from pprint import pprint
-from shlex import split
 
 
 class OCRCommand(cmd.Cmd):
@@ -54,18 +58,7 @@ class OCRCommand(cmd.Cmd):
         """Hook method executed just before the command line is
         interpreted, but after the input prompt is generated and issued."""
         # add image/pdf prefix depending on input file extension
-        if line and split(line)[0] not in ['image', 'pdf']:
-            file_ext = ''
-            for i in split(line):
-                if not i.startswith('-'):
-                    file_ext = i.split('.')[-1]
-                    break
-            if (file_ext in ['png', 'jpeg', 'jpg']):
-                line = 'image ' + line
-            elif (file_ext == 'pdf'):
-                line = 'pdf ' + line
-
-        return line
+        return add_input_type_prefix(line)
 
     def default(self, line):
         """Called on an input line when the command prefix is not recognized.
@@ -91,7 +84,9 @@ class OCRCommand(cmd.Cmd):
         validated_args = validate_parsed_ocr_cmd('image ' + arg, **args)
 
         if validated_args:
-            ocr_image(**validated_args)
+            # keep OCR'ing images added to input directory if --watch
+            ocr = watch_directory if validated_args.get('watch') else ocr_image
+            ocr(**validated_args)
 
     def do_pdf(self, arg):
         """Performs an OCR on pdfs."""
@@ -105,12 +100,14 @@ class OCRCommand(cmd.Cmd):
         validated_args = validate_parsed_ocr_cmd('pdf ' + arg, **args)
 
         if validated_args:
-            ocr_pdf(**validated_args)
+            # keep OCR'ing pdfs added to input directory if --watch
+            ocr = watch_directory if validated_args.get('watch') else ocr_pdf
+            ocr(**validated_args)
 
     def do_default(self, arg):
         """Sets default params or prints default parameters."""
-        # TODO add defaults reseter feature
         if not arg:
+            print("\nDefaults are saved in '{}'".format(CONFIG_PATH))
             print('\n============ Input and Output Defaults ============\n')
             pprint(defaults_dict)
             print('\n============ Tesseract Params Defaults ============\n')
@@ -162,6 +159,19 @@ Mandatory arguments to long options are mandatory for short options too.
                                       the -o option for OUTPUT_FILE.
 -s, --src-dir=INPUT_DIRECTORY       specify INPUT_FILE/s' directory. Must
                                       use the -o option for OUTPUT_FILE.
+-r, --recursive                     with -s and no INPUT_FILE/s, also OCR
+                                      files in sub directories. Files are
+                                      found as they are OCR'ed.
+    --include=GLOB...               with -s, OCR only files matching a GLOB
+                                      (quoted, e.g. '2019/*' or 'scan_*').
+                                      GLOBs with '/' match paths relative to
+                                      INPUT_DIRECTORY, others file names.
+    --exclude=GLOB...               with -s, skip files and sub directories
+                                      matching a GLOB.
+    --min-size=KB, --max-size=KB    with -s, skip files smaller or larger
+                                      than KB kilobytes.
+    --newer=DATE, --older=DATE      with -s, OCR only files modified after
+                                      or before DATE (YYYY-MM-DD[THH:MM]).
 -o, --output-file=OUTPUT_FILE       save output with provided file name.
                                       Implies the -j option.
 -d, --dest-dir=OUTPUT_DIRECTORY     save output file/s in the specified
@@ -172,6 +182,69 @@ Mandatory arguments to long options are mandatory for short options too.
                                       'txt' for plain text,
                                       'docx' for MS word and 'pdf' for pdf.
 -c, --confidence                    display average OCR confidence level.
+                                      With -v, also display confidence
+                                      statistics and low confidence words
+                                      of each page.
+-J, --jobs=N                        OCR N pages in parallel using N worker
+                                      processes.
+-p, --preprocess=PRESET|STAGES      preprocess pages with a PRESET: 'simple'
+                                      (default), 'otsu', 'adaptive', 'clean',
+                                      'scan' or 'detailed', or with comma
+                                      separated STAGES from 'gray', 'resize',
+                                      'threshold', 'otsu', 'adaptive',
+                                      'denoise', 'smooth', 'deskew' and
+                                      'orient' (e.g. 'deskew,otsu').
+                                      'orient' (in 'scan') also turns pages
+                                      rotated by 90 or 180 degrees upright
+                                      (180 with tesseract's orientation
+                                      detection, which needs osd.traineddata
+                                      in its default training data folder,
+                                      or 'osd_dir_def' in config).
+                                      With -v display measured angles.
+    --force-ocr                     OCR pdf pages even if they have an
+                                      Ethiopic text layer (by default text
+                                      of such pages is taken from the pdf).
+    --dpi={DPI|'auto'}              render pdf pages at DPI (default 200), or
+                                      'auto' to choose DPI for each page from
+                                      its scan resolution or glyph size.
+    --cache, --no-cache             use (or do not use) cached OCR results
+                                      of previously OCR'ed pages, kept in
+                                      ~/.cache/ethiopic-ocr/ (or under
+                                      $XDG_CACHE_HOME).
+    --pipeline                      overlap rendering, preprocessing, OCR
+                                      and writing of pages. With -v display
+                                      no. of pages waiting at each stage.
+    --crop                          OCR only text regions of pages (cropping
+                                      margins, specks and pictures), and
+                                      merge them in reading order. With -v
+                                      display share of page pixels OCR'ed.
+    --page-store, --no-page-store   read rendered pdf pages from (or do not
+                                      use) the page store, where rendered
+                                      pages are kept for later runs, in
+                                      ~/.cache/ethiopic-ocr/ (or under
+                                      $XDG_CACHE_HOME).
+    --segment-pages=N               with -j and 'docx' mode, spill output
+                                      to disk every N pages and assemble
+                                      OUTPUT_FILE at the end.
+    --resume                        continue a failed run from the job
+                                      journal of OUTPUT_FILE, OCR'ing only
+                                      pages not completed (or failed) before.
+    --watch                         keep OCR'ing files added to INPUT_DIRECTORY,
+                                      each to its own output file, until
+                                      stopped with Ctrl-C. Files processed
+                                      before a restart are skipped. Can not
+                                      be used with -r, --include, --exclude,
+                                      --min-size, --max-size, --newer or
+                                      --older.
+    --profile                       display time taken by each stage (pdf
+                                      render, threshold, tesseract, writer
+                                      ...) for each page and in total.
+    --profile-output=FILE           with --profile, also write profile to
+                                      FILE as json.
+    --profile-format={'json'|'trace'}
+                                      format of --profile-output: summary
+                                      and events ('json', default), or
+                                      Chrome trace format ('trace').
 -v, --verbose                       display detailed process information.
 
 Use `default` command to display or change default values for:
@@ -192,17 +265,33 @@ Without options:
     - input directory for pdf files
     - output directory for image and pdf files
     - output mode (output file type)
+    - no. of pdf pages rendered at a time
+    - pdf rendering DPI
+    - preprocessing preset or stages
+    - use and size limit of OCR results cache
+    - use of staged page pipeline
+    - cropping of pages to text regions
+    - use and size limit of rendered pdf page store
     - tesseract training data directory
     - tesseract language
     - tesseract page segmentation mode
     - tesseract OCR engine mode
+    - no. of pages OCR'ed in parallel
+    - OCR engine
     - path and name of font for MS word and pdf outputs
     - line width and height for pdf outputs
+    - buffer size for txt outputs
+    - pages per segment for joined docx outputs
 
-With options change default values for the above parameters.
+With options change default values for the above parameters. Changed
+defaults are saved to `ocr_config.json` (or the file in the OCR_CONFIG
+environment variable), and loaded at start up.
 
 Mandatory arguments to long options are mandatory for short options too.
 
+-rs, --reset                        reset all defaults to built-in values
+                                      (before applying other options).
+
 For input and output
 ====================
 -ii, --in-dir-image=INPUT_DIR       set default image file input directory.
@@ -212,6 +301,21 @@ For input and output
                                       'print' for stdout (default),
                                       'txt' for plain text,
                                       'docx' for MS word and 'pdf' for pdf.
+-pc, --pdf-chunk=PAGES              set default no. of pdf pages rendered
+                                      (held in memory) at a time.
+-dp, --dpi={DPI|'auto'}             set default pdf rendering DPI.
+-pp, --preprocess=PRESET|STAGES     set default preprocessing preset or stages.
+-ca, --cache={'on'|'off'}           set default use of OCR results cache.
+-pl, --pipeline={'on'|'off'}        set default use of staged page pipeline.
+-cr, --crop={'on'|'off'}            set default cropping of pages to text
+                                      regions.
+-ps, --page-store={'on'|'off'}      set default use of rendered pdf page
+                                      store.
+-ss, --store-size=MB                set rendered pdf page store size limit.
+                                      Least recently used documents are
+                                      removed.
+-cs, --cache-size=MB                set OCR results cache size limit. Least
+                                      recently used results are removed.
 
 For tesseract
 =============
@@ -222,6 +326,14 @@ For tesseract
                                       'eng' for English.
 -tp, --psm                          set default page segmentation mode.
 -to, --oem                          set default OCR engine mode.
+-tj, --jobs                         set default no. of pages OCR'ed in
+                                      parallel.
+-te, --engine={'auto'|'tesserocr'|'subprocess'}    set default OCR engine.
+                                      'tesserocr' keeps tesseract loaded in
+                                      memory (needs tesserocr package),
+                                      'subprocess' runs tesseract command
+                                      for each page, 'auto' (default) uses
+                                      tesserocr if installed.
 
 For writing to output file
 ==========================
@@ -229,9 +341,20 @@ For writing to output file
 -fn, --font-name                    set default name of font.
  -w, --width                        set line width for output file.
  -h, --height                       set line heigh for output file.
+-bs, --buffer-size=BYTES            set no. of bytes of text buffered before
+                                      writing to txt output file.
+-sp, --segment-pages=N              set default no. of pages per segment
+                                      spilled to disk for joined docx
+                                      outputs. 0 keeps all in memory.
 """
         print(usage)
 
 
 if __name__ == '__main__':
+    # non-interactive batch mode: ./ocr.py batch [MANIFEST]
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        sys.exit(run_batch(sys.argv[2:]))
+    # HTTP service mode: ./ocr.py serve [--port PORT] ...
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        sys.exit(run_server(sys.argv[2:]))
     OCRCommand().cmdloop()
@@ -0,0 +1,49 @@
+"""
+Tests of OCR confidence summaries of tesseract's `image_to_data` output.
+"""
+import pytest
+from functions.confidence import PERCENTILES, ocr_confidence
+
+
+def data(words):
+    """Returns an `image_to_data` dict of a block, paragraph and line
+    (empty text, conf -1) followed by (word, conf) pairs."""
+    return ({'text': ['', '', ''] + [word for word, _ in words],
+             'conf': [-1, -1, -1] + [conf for _, conf in words]})
+
+
+def test_summary():
+    conf = ocr_confidence(data([('ሰላም', 90), ('ዓለም', 80), ('ሁለተኛ', 70), ('መስመር', 60)]))
+    assert conf['words'] == 4
+    assert conf['mean'] == 75.0
+    # sample standard deviation
+    assert conf['stdev'] == pytest.approx(12.91, abs=0.01)
+    assert list(conf['percentiles']) == list(PERCENTILES)
+    assert conf['percentiles'][50] == 75.0
+    assert conf['percentiles'][10] == 63.0
+    assert conf['percentiles'][90] == 87.0
+
+
+def test_low_confidence_words():
+    words = [('ሰላም', 95), ('ዓለም', 94), ('ሁለተኛ', 96), ('መስመር', 95), ('ሶስተኛ', 94), ('ቃል', 20)]
+    conf = ocr_confidence(data(words))
+    assert conf['threshold'] == pytest.approx(conf['mean'] - 2 * conf['stdev'], abs=0.02)
+    assert conf['low_conf_words'] == [('ቃል', 20.0)]
+
+
+def test_empty_and_unrecognized_entries_are_left_out():
+    conf = ocr_confidence(data([('ሰላም', 90), ('', 95), ('ዓለም', -1), ('መስመር', 70)]))
+    assert conf['words'] == 2
+    assert conf['mean'] == 80.0
+    assert conf['low_conf_words'] == []
+
+
+def test_single_word():
+    conf = ocr_confidence(data([('ሰላም', 90)]))
+    assert conf['stdev'] == 0.0
+    assert conf['low_conf_words'] == []
+
+
+@pytest.mark.parametrize('words', [[], [('', 95)], [(' ', -1)]])
+def test_page_without_words_has_no_summary(words):
+    assert ocr_confidence(data(words)) is None
@@ -0,0 +1,50 @@
+"""
+Tests of the on-disk OCR results cache.
+"""
+import os
+import shutil
+import numpy as np
+from functions import defaults_dict
+from functions import ocr_cache, tesseract_engine
+
+
+def test_key_depends_on_engine(monkeypatch):
+    # as if tesserocr was installed, so it is not replaced by subprocess engine
+    monkeypatch.setattr(tesseract_engine, 'tesserocr', object())
+    page = np.zeros((10, 10), np.uint8)
+    keys = {ocr_cache.page_key(page, '-l amh', engine=engine) for engine in ['subprocess', 'tesserocr']}
+    assert len(keys) == 2
+
+
+def test_eviction_skips_results_removed_meanwhile(tmp_path, monkeypatch):
+    monkeypatch.setitem(defaults_dict, 'cache_dir_def', str(tmp_path))
+    for key in ['aa01', 'aa02', 'bb01']:
+        ocr_cache.cache_put(key, 'text ' * 100)
+
+    # another process evicting at the same time removes results (and a sub
+    # directory) while this one lists them
+    scandir = os.scandir
+
+    class Listing(list):
+        def __enter__(self):
+            return (self)
+
+        def __exit__(self, *exc_info):
+            pass
+
+    def racing_scandir(path):
+        if not isinstance(path, str):   # called by rmtree
+            return (scandir(path))
+        if path == str(tmp_path):
+            return (Listing(scandir(path)))
+        if path.endswith('bb'):
+            shutil.rmtree(path)
+            raise FileNotFoundError(path)
+        entries = Listing(scandir(path))
+        for entry in entries:
+            os.remove(entry.path)
+        return (entries)
+
+    monkeypatch.setattr(os, 'scandir', racing_scandir)
+    ocr_cache.evict_cache(0)
+    assert not os.path.exists(os.path.join(tmp_path, 'aa', 'aa01.json'))
@@ -0,0 +1,36 @@
+"""
+Tests of OCR summaries of image jobs. Tesseract is replaced by a fake
+returning one confident word for each image.
+"""
+import shutil
+import pytest
+import pytesseract
+from functions import tesseract_dict
+from functions.config import job_config
+from functions.ocr_image import ocr_image
+
+
+def fake_image_to_data(image, config='', output_type=None, **kwargs):
+    return ({'block_num': [1], 'par_num': [1], 'line_num': [1], 'text': ['ሰላም'], 'conf': [90.0]})
+
+
+@pytest.fixture(autouse=True)
+def fake_tesseract(monkeypatch):
+    monkeypatch.setattr(pytesseract, 'image_to_data', fake_image_to_data)
+    monkeypatch.setitem(tesseract_dict, 'engine_def', 'subprocess')
+
+
+def test_failed_image_after_confident_one(tmp_path, capsys):
+    shutil.copy('test_files/images/desta_1.jpg', str(tmp_path / 'a.jpg'))
+    (tmp_path / 'b.jpg').write_bytes(b'not an image at all')
+
+    failed = ocr_image(**job_config(
+        input_files=['a.jpg', 'b.jpg'], input_directory=str(tmp_path), input_file_type='image',
+        output_mode='txt', output_directory=str(tmp_path), join=False,
+        display_confidence=True, cache=False, pipeline=False, jobs=1))
+
+    assert failed == 1
+    out = capsys.readouterr().out
+    assert "a.jpg' with an average confidence of 90.0%" in out
+    # the failed image's summary has no confidence
+    assert "OCR'ed 0 of 1 images (1 failed) and wrote to" in out
@@ -0,0 +1,52 @@
+"""
+Tests of OCR'ed text reconstructed from tesseract's `image_to_data` output,
+which replaces a separate `image_to_string` call when confidence is shown.
+"""
+from functions.ocr_pages import data_to_text
+
+# (level, block, paragraph, line, word, conf, text) entries of a page with
+# two blocks: two paragraphs (of two lines and one line) and one paragraph
+ENTRIES = [
+    (1, 0, 0, 0, 0, -1, ''),        # page
+    (2, 1, 0, 0, 0, -1, ''),        # block 1
+    (3, 1, 1, 0, 0, -1, ''),        # paragraph 1
+    (4, 1, 1, 1, 0, -1, ''),        # line 1
+    (5, 1, 1, 1, 1, 95.5, 'ሰላም'),
+    (5, 1, 1, 1, 2, 90.1, 'ዓለም'),
+    (4, 1, 1, 2, 0, -1, ''),        # line 2
+    (5, 1, 1, 2, 1, 40.0, 'ሁለተኛ'),
+    (5, 1, 1, 2, 2, 95.0, ' '),     # blank word
+    (5, 1, 1, 2, 3, 88.0, 'መስመር'),
+    (3, 1, 2, 0, 0, -1, ''),        # paragraph 2
+    (4, 1, 2, 1, 0, -1, ''),
+    (5, 1, 2, 1, 1, 91.0, 'አንቀጽ'),
+    (2, 2, 0, 0, 0, -1, ''),        # block 2
+    (3, 2, 1, 0, 0, -1, ''),
+    (4, 2, 1, 1, 0, -1, ''),
+    (5, 2, 1, 1, 1, 89.0, 'ክፍል'),
+    (5, 2, 1, 1, 2, -1, ''),        # empty word
+    (5, 2, 1, 1, 3, 85.0, 'ሁለት'),
+]
+FIELDS = ['level', 'block_num', 'par_num', 'line_num', 'word_num', 'conf', 'text']
+
+
+def data(entries):
+    """Returns an `image_to_data` dict of entries."""
+    return ({field: [entry[i] for entry in entries] for i, field in enumerate(FIELDS)})
+
+
+def test_layout_of_lines_paragraphs_and_blocks():
+    assert data_to_text(data(ENTRIES)) == ('ሰላም ዓለም\n'
+                                           'ሁለተኛ መስመር\n'
+                                           '\n'
+                                           'አንቀጽ\n'
+                                           '\n'
+                                           'ክፍል ሁለት\n'
+                                           '\n'
+                                           '\f')
+
+
+def test_page_without_words():
+    # only page, block, paragraph and line entries (as for a blank page)
+    assert data_to_text(data(ENTRIES[:4])) == '\f'
+    assert data_to_text(data([])) == '\f'
@@ -0,0 +1,62 @@
+"""
+Tests of OCR summaries of pdf jobs. Poppler and tesseract are replaced by
+fakes: each pdf has the pages listed in `PDFS`, rendered blank, or taken
+from its text layer.
+"""
+import numpy as np
+import pytest
+import pytesseract
+from functions import ocr_pdf as ocr_pdf_module
+from functions import tesseract_dict
+from functions.config import job_config
+from functions.ocr_pdf import ocr_pdf
+
+# no. of pages, and if their text is in a text layer, of each fake pdf
+PDFS = {'a.pdf': (2, False), 'layer.pdf': (2, True), 'empty.pdf': (0, False)}
+
+
+def fake_image_to_data(image, config='', output_type=None, **kwargs):
+    return ({'block_num': [1], 'par_num': [1], 'line_num': [1], 'text': ['ሰላም'], 'conf': [90.0]})
+
+
+def fake_iter_pdf_pages(pdf_file_path, page_count, skip_pages=(), **args):
+    for page_no in range(1, page_count + 1):
+        if page_no not in skip_pages:
+            yield (np.full((100, 100), 255, np.uint8))
+
+
+def fake_text_layer_pages(pdf_file_path, first_page, last_page):
+    page_count, layer = PDFS[pdf_file_path.rsplit('/', 1)[-1]]
+    return ({page_no: 'ሰላም' for page_no in range(1, page_count + 1)} if layer else {})
+
+
+@pytest.fixture(autouse=True)
+def fake_tools(monkeypatch):
+    monkeypatch.setattr(pytesseract, 'image_to_data', fake_image_to_data)
+    monkeypatch.setitem(tesseract_dict, 'engine_def', 'subprocess')
+    monkeypatch.setattr(ocr_pdf_module, 'pdf_page_count', lambda path: PDFS[path.rsplit('/', 1)[-1]][0])
+    monkeypatch.setattr(ocr_pdf_module, 'iter_pdf_pages', fake_iter_pdf_pages)
+    monkeypatch.setattr(ocr_pdf_module, 'text_layer_pages', fake_text_layer_pages)
+
+
+def run_job(tmp_path, input_files, **params):
+    return (ocr_pdf(**job_config(
+        input_files=input_files, input_directory=str(tmp_path), input_file_type='pdf',
+        output_mode='txt', output_directory=str(tmp_path), display_confidence=True,
+        cache=False, pipeline=False, jobs=1, **params)))
+
+
+def test_pdf_without_ocr_confidence_after_one_with(tmp_path, capsys):
+    assert run_job(tmp_path, ['a.pdf', 'layer.pdf', 'empty.pdf'], join=False) == 0
+    out = capsys.readouterr().out
+    assert 'with an average confidence of 90.0%' in out
+    # text layer pages have no confidence, and an empty pdf no output
+    assert "Successfuly OCR'ed 2 no. of pages and wrote to '{}'".format(tmp_path / 'layer-output.txt') in out
+    assert "pdf file '{}' has no pages".format(tmp_path / 'empty.pdf') in out
+    assert not (tmp_path / 'empty-output.txt').exists()
+
+
+def test_joined_output_saved_after_empty_last_pdf(tmp_path, capsys):
+    assert run_job(tmp_path, ['a.pdf', 'empty.pdf'], join=True, output_file='joined.txt') == 0
+    assert "Successfuly OCR'ed 2 no. of pages" in capsys.readouterr().out
+    assert (tmp_path / 'joined.txt').read_text(encoding='utf-8').count('--- Page') == 2
@@ -0,0 +1,130 @@
+"""
+Tests of the local HTTP OCR service. Tesseract is replaced by a fake
+returning its config string as the page text (worker processes are forked
+after it is patched), so the tests need neither tesseract nor poppler.
+"""
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+import numpy as np
+import pytest
+import pytesseract
+from functions import defaults_dict, tesseract_dict
+from functions import ocr_server
+from functions.journal import PageError
+
+IMAGE_PATH = 'test_files/images/desta_1.jpg'
+# content of a fake two page pdf, the second page of which fails to render
+FAKE_PDF = b'%PDF-1.4 fake'
+real_pdf_page_count = ocr_server.pdf_page_count
+
+
+def fake_image_to_string(image, config='', **kwargs):
+    return (config)
+
+
+def fake_image_to_data(image, config='', output_type=None, **kwargs):
+    return ({'block_num': [1, 1], 'par_num': [1, 1], 'line_num': [1, 1],
+             'text': [config.strip(), 'ሰላም'], 'conf': [95.0, 90.0]})
+
+
+def fake_pdf_page_count(pdf_file_path):
+    with open(pdf_file_path, 'rb') as file:
+        if file.read() == FAKE_PDF:
+            return (2)
+    return (real_pdf_page_count(pdf_file_path))
+
+
+def fake_iter_pdf_pages(pdf_file_path, page_count=None, **args):
+    """Yields a good page and a page that failed to render."""
+    yield (np.full((100, 100), 255, np.uint8))
+    yield (PageError('could not render page 2: poppler crashed'))
+
+
+@pytest.fixture
+def server_url(monkeypatch):
+    monkeypatch.setattr(pytesseract, 'image_to_string', fake_image_to_string)
+    monkeypatch.setattr(pytesseract, 'image_to_data', fake_image_to_data)
+    monkeypatch.setitem(tesseract_dict, 'engine_def', 'subprocess')
+    monkeypatch.setitem(defaults_dict, 'cache_def', False)
+    monkeypatch.setattr(ocr_server, 'pdf_page_count', fake_pdf_page_count)
+    monkeypatch.setattr(ocr_server, 'iter_pdf_pages', fake_iter_pdf_pages)
+
+    server = ocr_server.OCRServer(('127.0.0.1', 0), workers=1, queue_size=1, max_upload=10 * 1024 * 1024)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield ('http://127.0.0.1:{}'.format(server.server_address[1]))
+    server.shutdown()
+    server.server_close()
+    server.executor.shutdown()
+
+
+def post(url, data, content_type='application/octet-stream'):
+    """POSTs data and returns (status, json response)."""
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return (response.status, json.loads(response.read()))
+    except urllib.error.HTTPError as e:
+        return (e.code, json.loads(e.read()))
+
+
+def test_ocr_image(server_url):
+    with open(IMAGE_PATH, 'rb') as file:
+        status, result = post(server_url + '/ocr?psm=6&oem=1&lang=tir&confidence=1', file.read(), 'image/jpeg')
+    assert status == 200
+    assert result['failed'] == 0
+    assert len(result['pages']) == 1
+    # options reach tesseract as separate, converted values
+    assert '-l tir --psm 6 --oem 1' in result['text']
+    assert result['pages'][0]['confidence'] is not None
+
+
+def test_pdf_with_failed_page(server_url):
+    status, result = post(server_url + '/ocr?type=pdf&mode=docx', FAKE_PDF)
+    assert status == 200
+    assert result['failed'] == 1
+    assert 'text' in result['pages'][0]
+    assert 'poppler crashed' in result['pages'][1]['error']
+    assert result['document']
+
+
+def test_unreadable_upload(server_url):
+    status, result = post(server_url + '/ocr?type=pdf', b'not a pdf at all')
+    assert status == 400
+    assert 'could not read pdf' in result['error']
+    status, result = post(server_url + '/ocr?type=image', b'not an image at all')
+    assert status == 400
+    assert 'could not decode image' in result['error']
+
+
+@pytest.mark.parametrize('query', [
+    'lang=amh%20-c%20x%3D1',
+    'lang=deu',
+    'psm=abc',
+    'psm=14',
+    'oem=-1',
+    'oem=1.5',
+])
+def test_invalid_query(server_url, query):
+    with open(IMAGE_PATH, 'rb') as file:
+        status, result = post(server_url + '/ocr?' + query, file.read(), 'image/jpeg')
+    assert status == 400
+    assert 'must be one of' in result['error']
+
+
+@pytest.mark.parametrize('length', [None, 'abc', '-5'])
+def test_invalid_content_length(server_url, length):
+    url = urlparse(server_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+    connection.putrequest('POST', '/ocr')
+    if length is not None:
+        connection.putheader('Content-Length', length)
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 400
+    assert 'Content-Length' in json.loads(response.read())['error']
+    connection.close()
@@ -0,0 +1,37 @@
+"""
+Tests of the rendered pdf page store.
+"""
+import os
+from functions import defaults_dict
+from functions import page_store
+
+
+def test_eviction_skips_documents_removed_meanwhile(tmp_path, monkeypatch):
+    monkeypatch.setitem(defaults_dict, 'page_store_dir_def', str(tmp_path))
+    for key in ['doc1', 'doc2', 'doc3']:
+        (tmp_path / (key + '.pages')).write_bytes(b'\0' * 1000)
+        (tmp_path / (key + '.json')).write_text('{}')
+    # doc2 is the least recently used
+    os.utime(str(tmp_path / 'doc2.json'), (0, 0))
+
+    # another process evicting at the same time removes documents while
+    # this one lists (doc1) and removes (doc2) them
+    scandir = os.scandir
+    remove = os.remove
+
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        remove(str(tmp_path / 'doc1.pages'))
+        remove(str(tmp_path / 'doc1.json'))
+        return (entries)
+
+    def racing_remove(path):
+        if 'doc2' in path:
+            raise FileNotFoundError(path)
+        remove(path)
+
+    monkeypatch.setattr(os, 'scandir', racing_scandir)
+    monkeypatch.setattr(os, 'remove', racing_remove)
+    page_store.evict_store(1500)
+    # doc2 was removed by the other process, which brought the store under its limit
+    assert (tmp_path / 'doc3.pages').exists()
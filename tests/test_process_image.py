@@ -0,0 +1,59 @@
+"""
+Tests of upside down page detection of the `orient` preprocessing stage.
+Tesseract's orientation detection is replaced by a fake, counting its calls.
+"""
+import numpy as np
+import pytest
+import pytesseract
+from functions import tesseract_dict
+from functions import tesseract_engine
+from functions.process_image import is_upside_down
+
+osd_calls = []
+
+
+@pytest.fixture(autouse=True)
+def fake_osd(monkeypatch):
+    monkeypatch.setitem(tesseract_dict, 'engine_def', 'subprocess')
+    monkeypatch.setattr(tesseract_engine, '_engines', {})
+    osd_calls.clear()
+
+
+def page():
+    """Returns a grayscale page with some ink."""
+    image = np.full((600, 800), 255, np.uint8)
+    image[100:500:40, 50:750] = 0
+    return (image)
+
+
+def test_upside_down_with_one_osd_call(monkeypatch):
+    def fake_image_to_osd(image, config='', output_type=None, **kwargs):
+        osd_calls.append(config)
+        return ({'rotate': 180, 'orientation_conf': 9.5})
+
+    monkeypatch.setattr(pytesseract, 'image_to_osd', fake_image_to_osd)
+    assert is_upside_down(page())
+    assert osd_calls == ['--psm 0']
+
+
+@pytest.mark.parametrize('osd', [
+    {'rotate': 0, 'orientation_conf': 12.0},
+    {'rotate': 180, 'orientation_conf': 0.5},   # not confident
+    None,                                       # too few characters
+])
+def test_not_upside_down(monkeypatch, osd):
+    def fake_image_to_osd(image, config='', output_type=None, **kwargs):
+        osd_calls.append(config)
+        if osd is None:
+            raise pytesseract.TesseractError(1, 'Too few characters. Skipping this page')
+        return (osd)
+
+    monkeypatch.setattr(pytesseract, 'image_to_osd', fake_image_to_osd)
+    assert not is_upside_down(page())
+    assert len(osd_calls) == 1
+
+
+def test_blank_page_is_not_checked(monkeypatch):
+    monkeypatch.setattr(pytesseract, 'image_to_osd', lambda *fargs, **kwargs: osd_calls.append(fargs))
+    assert not is_upside_down(np.full((600, 800), 255, np.uint8))
+    assert not osd_calls
@@ -0,0 +1,37 @@
+"""
+Tests of profiles of jobs running at the same time in one process.
+"""
+import threading
+from functions import profiler
+
+
+def in_thread(function, *fargs, **kwargs):
+    thread = threading.Thread(target=function, args=fargs, kwargs=kwargs)
+    thread.start()
+    thread.join()
+
+
+def test_other_jobs_keep_profile():
+    profiler.start_profile(profile=True)
+    try:
+        with profiler.timer('render', page=False):
+            pass
+
+        # an unprofiled job, and a job asking for a profile, in other threads
+        in_thread(profiler.start_profile)
+        in_thread(profiler.stop_profile)
+        in_thread(profiler.start_profile, profile=True)
+        in_thread(profiler.finish_profile, profile=True)
+
+        assert profiler.profile_enabled()
+        assert [event['stage'] for event in profiler._events] == ['render']
+    finally:
+        profiler.stop_profile()
+    assert not profiler.profile_enabled()
+
+
+def test_page_labels_are_per_job():
+    assert profiler.page_label('a.jpg', 0) == 'a.jpg'
+    page = object()
+    assert profiler.page_label(page, 1, ('a.pdf', [2, 5])) == 'a.pdf page 5'
+    assert profiler.page_label(page, 0, ('b.pdf', [7])) == 'b.pdf page 7'
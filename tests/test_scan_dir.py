@@ -0,0 +1,33 @@
+"""
+Tests of lazy scans of input directories.
+"""
+import os
+import pickle
+from functions import scan_dir
+from functions.scan_dir import DirectoryScan
+
+IMAGES = ['desta_1.jpg', 'desta_2.jpg', 'kidane_1.jpg', 'kidane_2.jpg']
+
+
+def test_scan_started_by_first_goes_on(monkeypatch):
+    listed = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        listed.append(path)
+        return (scandir(path))
+
+    monkeypatch.setattr(scan_dir.os, 'scandir', counting_scandir)
+    inputs = DirectoryScan('test_files/images', 'image')
+    assert inputs.first() == IMAGES[0]
+    assert list(inputs) == IMAGES
+    # the directory was listed once, for validation and job together
+    assert len(listed) == 1
+    # later iterations scan anew
+    assert list(inputs) == IMAGES
+
+
+def test_started_scan_is_not_pickled():
+    inputs = DirectoryScan('test_files/images', 'image')
+    inputs.first()
+    assert list(pickle.loads(pickle.dumps(inputs))) == IMAGES
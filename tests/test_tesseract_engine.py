@@ -0,0 +1,81 @@
+"""
+Tests of OCR jobs with different training data (models) running at the
+same time in one process. Tesseract is replaced by a fake returning its
+config string as the page text, so each output shows the options its pages
+were OCR'ed with.
+"""
+import os
+import sys
+import threading
+import pytest
+import pytesseract
+from functions import tesseract_dict
+from functions.config import job_config
+from functions.ocr_image import ocr_image
+from functions.tesseract_config import config_tesseract
+
+IMAGES = ['desta_1.jpg', 'desta_2.jpg', 'kidane_1.jpg']
+MODELS = {'fast': 'training_data/fast/', 'best': 'training_data/best/'}
+
+# makes OCR calls of both jobs wait for each other, so the jobs overlap
+barrier = None
+
+
+def fake_image_to_string(image, config='', **kwargs):
+    if barrier:
+        try:
+            barrier.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+    return (config)
+
+
+@pytest.fixture(autouse=True)
+def fake_tesseract(monkeypatch):
+    monkeypatch.setattr(pytesseract, 'image_to_string', fake_image_to_string)
+    monkeypatch.setitem(tesseract_dict, 'engine_def', 'subprocess')
+    monkeypatch.delenv('TESSDATA_PREFIX', raising=False)
+
+
+def run_job(output_directory, model, jobs):
+    """OCRs test images with a model to `<model>.txt`."""
+    ocr_image(**job_config(
+        input_files=IMAGES, input_directory='test_files/images', input_file_type='image',
+        output_mode='txt', output_file=model + '.txt', output_directory=str(output_directory),
+        join=True, training_folder=MODELS[model], jobs=jobs, cache=False, pipeline=False))
+
+
+def test_options_include_tessdata_dir():
+    assert '--tessdata-dir training_data/best/ -l tir' in config_tesseract(
+        training_folder='training_data/best/', lang='tir')
+    # folders are quoted for the command line
+    assert "--tessdata-dir 'my models/best'" in config_tesseract(training_folder='my models/best')
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_mixed_model_jobs(tmp_path, monkeypatch, jobs):
+    # in worker processes (jobs > 1) calls of the two jobs can not meet at a barrier
+    monkeypatch.setattr(sys.modules[__name__], 'barrier', threading.Barrier(len(MODELS)) if jobs == 1 else None)
+
+    errors = []
+
+    def job(model):
+        try:
+            run_job(tmp_path, model, jobs)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=job, args=(model,)) for model in MODELS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+
+    assert not errors
+    for model, folder in MODELS.items():
+        with open(os.path.join(tmp_path, model + '.txt'), encoding='utf-8') as file:
+            text = file.read()
+        # every page of a job was OCR'ed with its own model only
+        assert text.count('--tessdata-dir ' + folder) == len(IMAGES)
+        assert text.count('--tessdata-dir') == len(IMAGES)
+    assert 'TESSDATA_PREFIX' not in os.environ
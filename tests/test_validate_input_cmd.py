@@ -0,0 +1,28 @@
+"""
+Tests of validation of ocr commands.
+"""
+import pytest
+from functions.parse_input_cmd import parse_ocr_cmd
+from functions.validate_input_cmd import validate_parsed_ocr_cmd
+
+
+def validate(line):
+    return (validate_parsed_ocr_cmd(line, **parse_ocr_cmd(line)))
+
+
+@pytest.mark.parametrize('option', [
+    '-r',
+    '--include "desta*"',
+    '--exclude "desta*"',
+    '--min-size 1',
+    '--max-size 100',
+    '--newer 2020-01-01',
+    '--older 2030-01-01',
+])
+def test_scan_filters_rejected_with_watch(option, capsys):
+    assert validate('image -s test_files/images --watch ' + option) is None
+    assert 'can not be used with --watch' in capsys.readouterr().out
+
+
+def test_watch_without_filters(tmp_path):
+    assert validate('image -s test_files/images --watch -d {}/'.format(tmp_path)) is not None